@@ -2,4 +2,5 @@
 
 from . import controllers
 from . import models
-from . import report
\ No newline at end of file
+from . import report
+from . import populate
\ No newline at end of file
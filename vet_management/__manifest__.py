@@ -75,6 +75,21 @@ Incluye visitas, vacunas, cirugías, recetas y más.
         # Menús
         'views/animals_menus.xml',
         'views/statistics_views.xml',
+        'views/sync_views.xml',
+        'views/campaign_views.xml',
+        'views/document_cache_views.xml',
+        'views/lab_results_views.xml',
+        'views/export_views.xml',
+        'views/sterilization_outcome_views.xml',
+        'views/animal_merge_views.xml',
+        'views/vitals_views.xml',
+        'views/hospitalization_views.xml',
+        'views/contraindication_views.xml',
+        'views/protocol_views.xml',
+        'views/appointment_views.xml',
+        'views/cold_chain_views.xml',
+        'views/stock_views.xml',
+        'views/stock_valuation_views.xml',
 
         # Secuencias/otros
         'views/visit_sequence.xml',
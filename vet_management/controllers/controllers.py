@@ -1,22 +1,467 @@
 # -*- coding: utf-8 -*-
-# from odoo import http
+"""
+API HTTP/JSON para integraciones de la clínica (sitio de reservas, laboratorio).
 
+    GET  /vet/api/v1/<recurso>?fields=a,b&limit=100&cursor=<token>
+    GET  /vet/api/v1/<recurso>/<id>?fields=a,b
+    POST /vet/api/v1/<recurso>/batch   {"create": [{...}], "write": [{"id": 1, "values": {...}}]}
+    GET  /vet/api/v1/search?q=parvovirus&in=visits,surgeries&animal_id=7&limit=20
+    GET  /vet/api/v1/animals/<id>/lab-trends?analytes=CREA,BUN&from=2023-01-01&to=2024-12-31
+    POST /vet/api/v1/sterilizations/intake     {"records": [{...}, ...]}
+    POST /vet/api/v1/sterilizations/outcomes   {"updates": [{"id": 1, "status": "exito"}, ...]}
+    POST /vet/api/v1/vitals/batch   {"series": [{"animal_id": 7, "metric": "hr", "points": [["2024-05-02 10:00:15", 82], ...]}]}
+    GET  /vet/api/v1/animals/<id>/vitals?metric=hr&surgery_record_id=3&from=...&to=...&points=300
+    POST /vet/api/v1/tickets/transition   {"action": "start", "tickets": [{"id": 1, "version": 3}, ...]}
+    POST /vet/api/v1/fridges/readings   {"series": [{"fridge": "HEL-01", "points": [["2024-05-02 10:00:00", 4.2], ...]}]}
+    GET  /vet/api/v1/fridges/<id>/temperatures?from=...&to=...&points=300
+    GET  /vet/api/v1/availability?from=2024-05-06 00:00:00&to=2024-05-13 00:00:00&doctor_ids=1,2&duration=30
 
-# class Vet(http.Controller):
-#     @http.route('/vet/vet', auth='public')
-#     def index(self, **kw):
-#         return "Hello, world"
+Las listas se paginan por (write_date, id) y devuelven ``next_cursor``.
+Las respuestas GET llevan ETag calculado desde write_date; si el cliente envía
+``If-None-Match`` con el mismo valor se responde 304 sin leer los registros.
+"""
+import hashlib
+from datetime import datetime, time
 
-#     @http.route('/vet/vet/objects', auth='public')
-#     def list(self, **kw):
-#         return http.request.render('vet.listing', {
-#             'root': '/vet/vet',
-#             'objects': http.request.env['vet.vet'].search([]),
-#         })
+from odoo import fields, http
+from odoo.addons.vet_management.models.clinical_search import SEARCH_MODELS
+from odoo.addons.vet_management.models.concurrency import ConcurrentUpdateError
+from odoo.addons.vet_management.models.waiting_room import TICKET_TRANSITIONS
+from odoo.addons.vet_management.models.keyset_mixin import decode_cursor, encode_cursor
+from odoo.exceptions import AccessError, MissingError, UserError, ValidationError
+from odoo.http import request
 
-#     @http.route('/vet/vet/objects/<model("vet.vet"):obj>', auth='public')
-#     def object(self, obj, **kw):
-#         return http.request.render('vet.object', {
-#             'object': obj
-#         })
+API_ROOT = '/vet/api/v1'
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
 
+# recurso -> modelo, campos por defecto, campos legibles y campos escribibles
+RESOURCES = {
+    'animals': {
+        'model': 'animal',
+        'default': ['identification', 'name', 'species', 'breed', 'owner', 'sex', 'microchip_number'],
+        'readable': [
+            'identification', 'name', 'species', 'breed', 'owner', 'sex', 'birthdate', 'age',
+            'microchip_number', 'weight', 'height', 'size', 'reproductive_status', 'treating_doctor', 'active',
+        ],
+        'writable': [
+            'name', 'species', 'breed', 'owner', 'sex', 'birthdate', 'microchip_number', 'weight',
+            'height', 'size', 'reproductive_status', 'treating_doctor', 'internal_notes',
+        ],
+    },
+    'visits': {
+        'model': 'animal.visit',
+        'default': ['sequence', 'animal_id', 'date', 'doctor', 'consultation_reason'],
+        'readable': [
+            'sequence', 'animal_id', 'date', 'doctor', 'consultation_reason', 'anamnesis',
+            'clinical_exam', 'prediagnoses', 'treatment', 'rp', 'follow_up',
+        ],
+        'writable': [
+            'animal_id', 'date', 'doctor', 'consultation_reason', 'anamnesis', 'clinical_exam',
+            'prediagnoses', 'treatment', 'rp', 'follow_up',
+        ],
+    },
+    'vaccinations': {
+        'model': 'animal.vaccination',
+        'default': ['animal_id', 'vaccine_id', 'date', 'next_date', 'doctor'],
+        'readable': [
+            'animal_id', 'vaccine_id', 'date', 'next_date', 'route', 'doctor', 'applied_doses',
+            'lot_number', 'lot_expiration', 'consume_stock', 'notes',
+        ],
+        'writable': [
+            'animal_id', 'vaccine_id', 'date', 'next_date', 'route', 'doctor', 'applied_doses',
+            'lot_number', 'lot_expiration', 'consume_stock', 'notes',
+        ],
+    },
+    'tickets': {
+        'model': 'vet.waiting.ticket',
+        'default': ['sequence', 'animal_id', 'arrival_time', 'priority', 'state', 'doctor', 'room'],
+        'readable': [
+            'sequence', 'animal_id', 'arrival_time', 'called_time', 'start_time', 'end_time',
+            'reason', 'doctor', 'room', 'priority', 'state', 'visit_id', 'version',
+        ],
+        'writable': ['animal_id', 'arrival_time', 'reason', 'doctor', 'room', 'priority', 'notes'],
+    },
+    'appointments': {
+        'model': 'vet.appointment',
+        'default': ['sequence', 'animal_id', 'doctor_id', 'start', 'stop', 'state'],
+        'readable': [
+            'sequence', 'animal_id', 'owner_id', 'doctor_id', 'room', 'start', 'duration_min', 'stop',
+            'reason', 'priority', 'state',
+        ],
+        'writable': ['animal_id', 'doctor_id', 'room', 'start', 'duration_min', 'reason', 'priority'],
+    },
+    'doctors': {
+        'model': 'vet.doctor',
+        'default': ['name', 'room', 'slot_minutes'],
+        'readable': ['name', 'room', 'slot_minutes'],
+        'writable': [],
+    },
+    # === Niveles de stock (solo lectura) ===
+    'vaccines': {
+        'model': 'animal.vaccine',
+        'default': ['name', 'stock_total_doses'],
+        'readable': ['name', 'vials_per_box', 'doses_per_vial', 'stock_boxes', 'stock_vials', 'stock_doses', 'stock_total_doses'],
+        'writable': [],
+    },
+    'medicines': {
+        'model': 'animal.medicine',
+        'default': ['name', 'stock_total_units'],
+        'readable': ['name', 'packs_per_box', 'units_per_pack', 'stock_boxes', 'stock_packs', 'stock_units', 'stock_total_units'],
+        'writable': [],
+    },
+    'dewormers': {
+        'model': 'animal.dewormer',
+        'default': ['name', 'stock_total_units'],
+        'readable': ['name', 'packs_per_box', 'units_per_pack', 'stock_boxes', 'stock_packs', 'stock_units', 'stock_total_units'],
+        'writable': [],
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def compute_etag(resource, field_names, rows):
+    """ETag débil a partir de (id, write_date) de las filas y de los campos pedidos."""
+    digest = hashlib.sha1(repr((resource, field_names, [
+        (res_id, write_date.isoformat() if write_date else None) for res_id, write_date in rows
+    ])).encode()).hexdigest()
+    return 'W/"%s"' % digest
+
+
+class VetApi(http.Controller):
+
+    # === Helpers ===
+    def _get_resource(self, resource):
+        spec = RESOURCES.get(resource)
+        if not spec:
+            raise ApiError("Recurso desconocido: %s" % resource, status=404)
+        return spec, request.env[spec['model']]
+
+    def _get_fields(self, spec, fields_param):
+        if not fields_param:
+            return list(spec['default'])
+        field_names = [name.strip() for name in fields_param.split(',') if name.strip()]
+        invalid = set(field_names) - set(spec['readable'])
+        if invalid:
+            raise ApiError("Campos no permitidos: %s" % ', '.join(sorted(invalid)))
+        return field_names
+
+    def _get_limit(self, limit_param):
+        try:
+            limit = int(limit_param or DEFAULT_LIMIT)
+        except ValueError:
+            raise ApiError("'limit' debe ser un entero.")
+        return max(1, min(limit, MAX_LIMIT))
+
+    def _not_modified(self, etag):
+        header = request.httprequest.headers.get('If-None-Match') or ''
+        return etag in [tag.strip() for tag in header.split(',')]
+
+    def _json(self, data, status=200, etag=None):
+        headers = [('Cache-Control', 'private, no-cache')]
+        if etag:
+            headers.append(('ETag', etag))
+        return request.make_json_response(data, headers=headers, status=status)
+
+    def _error(self, error):
+        status = getattr(error, 'status', 400)
+        if isinstance(error, ConcurrentUpdateError):
+            status = 409
+        elif isinstance(error, AccessError):
+            status = 403
+        elif isinstance(error, MissingError):
+            status = 404
+        return self._json({'error': str(error)}, status=status)
+
+    def _check_values(self, spec, values):
+        if not isinstance(values, dict):
+            raise ApiError("Cada registro debe ser un objeto JSON.")
+        invalid = set(values) - set(spec['writable'])
+        if invalid:
+            raise ApiError("Campos no escribibles: %s" % ', '.join(sorted(invalid)))
+        return values
+
+    # === Endpoints ===
+    @http.route(API_ROOT + '/search', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_search(self, q=None, limit=None, animal_id=None, **kw):
+        """Búsqueda de texto completo en narrativas clínicas, ordenada por relevancia."""
+        try:
+            if not q or not q.strip():
+                raise ApiError("Falta el parámetro 'q'.")
+            resources = [name.strip() for name in (kw.get('in') or '').split(',') if name.strip()] or None
+            invalid = set(resources or []) - set(SEARCH_MODELS)
+            if invalid:
+                raise ApiError("Recursos no buscables: %s" % ', '.join(sorted(invalid)))
+            try:
+                animal_id = int(animal_id) if animal_id else None
+            except ValueError:
+                raise ApiError("'animal_id' debe ser un entero.")
+            hits = request.env['vet.clinical.search'].search_narratives(
+                q, resources=resources, animal_id=animal_id, limit=self._get_limit(limit),
+            )
+            return self._json({'data': hits})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/<string:resource>', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_list(self, resource, fields=None, limit=None, cursor=None, **kw):
+        try:
+            spec, Model = self._get_resource(resource)
+            field_names = self._get_fields(spec, fields)
+            limit = self._get_limit(limit)
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except ValueError:
+                raise ApiError("Cursor inválido: %s" % cursor)
+
+            # Primero solo (id, write_date): basta para el ETag y el siguiente cursor.
+            rows = Model._keyset_search(after=after, limit=limit)
+            etag = compute_etag(resource, field_names, rows)
+            if self._not_modified(etag):
+                return request.make_response('', headers=[('ETag', etag)], status=304)
+
+            records = Model.browse([res_id for res_id, _write_date in rows])
+            data = records.read(field_names + ['write_date'])
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+            return self._json({'data': data, 'next_cursor': next_cursor}, etag=etag)
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/<string:resource>/<int:res_id>', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_read(self, resource, res_id, fields=None, **kw):
+        try:
+            spec, Model = self._get_resource(resource)
+            field_names = self._get_fields(spec, fields)
+            Model.check_access_rights('read')
+            record = Model.browse(res_id).exists()
+            if not record:
+                raise ApiError("Registro no encontrado.", status=404)
+            record.check_access_rule('read')
+            etag = compute_etag(resource, field_names, [(record.id, record.write_date)])
+            if self._not_modified(etag):
+                return request.make_response('', headers=[('ETag', etag)], status=304)
+            return self._json({'data': record.read(field_names + ['write_date'])[0]}, etag=etag)
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/animals/<int:animal_id>/lab-trends', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_lab_trends(self, animal_id, analytes=None, **kw):
+        """Series de tiempo de resultados de laboratorio por analito."""
+        try:
+            codes = [code.strip() for code in (analytes or '').split(',') if code.strip()] or None
+            try:
+                date_from = kw.get('from') and fields.Date.to_date(kw['from'])
+                date_to = kw.get('to') and fields.Date.to_date(kw['to'])
+            except ValueError:
+                raise ApiError("'from' y 'to' deben tener formato AAAA-MM-DD.")
+            if date_to:
+                date_to = datetime.combine(date_to, time.max)
+            trends = request.env['animal.lab.result'].get_trends(
+                animal_id, analyte_codes=codes, date_from=date_from, date_to=date_to,
+            )
+            return self._json({'data': trends})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/sterilizations/intake', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_sterilization_intake(self, **kw):
+        """Ingreso masivo de un operativo de esterilización (responsables por RUT, sin duplicar)."""
+        try:
+            payload = request.get_json_data()
+            records = payload.get('records') if isinstance(payload, dict) else None
+            if not isinstance(records, list) or not all(isinstance(values, dict) for values in records):
+                raise ApiError("Se esperaba {\"records\": [{...}, ...]}.")
+            Sterilization = request.env['animal.sterilization']
+            invalid = {
+                name for values in records for name in values
+                if name not in Sterilization._fields or Sterilization._fields[name].compute
+            }
+            if invalid:
+                raise ApiError("Campos no escribibles: %s" % ', '.join(sorted(invalid)))
+            with request.env.cr.savepoint():
+                created = Sterilization.intake(records)
+            return self._json({'created': [
+                {'id': rec.id, 'owner_id': rec.owner_id.id} for rec in created
+            ]})
+        except (ApiError, AccessError, UserError, ValidationError, ValueError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/sterilizations/outcomes', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_sterilization_outcomes(self, **kw):
+        """Resultados (estado/defunción) de muchas esterilizaciones a la vez."""
+        try:
+            payload = request.get_json_data()
+            updates = payload.get('updates') if isinstance(payload, dict) else None
+            if not isinstance(updates, list) or not all(isinstance(update, dict) for update in updates):
+                raise ApiError("Se esperaba {\"updates\": [{\"id\": 1, \"status\": \"exito\"}, ...]}.")
+            with request.env.cr.savepoint():
+                updated = request.env['animal.sterilization'].update_outcomes(updates)
+            return self._json({'updated': updated.ids})
+        except (ApiError, AccessError, UserError, ValidationError, ValueError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/vitals/batch', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_vitals_batch(self, **kw):
+        """Muestras de monitoreo en lote; las ya recibidas (mismo animal, medición e instante) se ignoran."""
+        try:
+            payload = request.get_json_data()
+            series = payload.get('series') if isinstance(payload, dict) else None
+            if not isinstance(series, list) or not all(
+                isinstance(serie, dict) and isinstance(serie.get('points'), list) for serie in series
+            ):
+                raise ApiError("Se esperaba {\"series\": [{\"animal_id\": 1, \"metric\": \"hr\", \"points\": [[t, v], ...]}]}.")
+            with request.env.cr.savepoint():
+                inserted = request.env['animal.vital.sample'].ingest(series)
+            return self._json({'inserted': inserted})
+        except (ApiError, AccessError, UserError, ValidationError, ValueError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/animals/<int:animal_id>/vitals', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_vitals(self, animal_id, metric=None, surgery_record_id=None, points=None, **kw):
+        """Serie reducida (promedio/mín/máx por intervalo) de una medición del animal."""
+        try:
+            if not metric:
+                raise ApiError("Falta el parámetro 'metric'.")
+            try:
+                date_from = kw.get('from') and fields.Datetime.to_datetime(kw['from'])
+                date_to = kw.get('to') and fields.Datetime.to_datetime(kw['to'])
+                surgery_record_id = surgery_record_id and int(surgery_record_id)
+                points = points and int(points)
+            except ValueError:
+                raise ApiError("Parámetros inválidos: 'from'/'to' son fechas y 'surgery_record_id'/'points' enteros.")
+            request.env['animal'].browse(animal_id).check_access_rule('read')
+            series = request.env['animal.vital.sample'].get_series(
+                animal_id, metric, date_from=date_from, date_to=date_to,
+                surgery_record_id=surgery_record_id, points=points and min(points, MAX_LIMIT),
+            )
+            return self._json({'metric': metric, 'data': series})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/tickets/transition', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_ticket_transition(self, **kw):
+        """
+        Cambia el estado de varios tickets a la vez. Si se envía la `version` leída
+        y otro cliente hizo una transición después, responde 409 sin cambiar nada.
+        """
+        try:
+            payload = request.get_json_data()
+            action = payload.get('action') if isinstance(payload, dict) else None
+            items = payload.get('tickets') if isinstance(payload, dict) else None
+            if action not in TICKET_TRANSITIONS or not isinstance(items, list) or not all(
+                isinstance(item, dict) and isinstance(item.get('id'), int) for item in items
+            ):
+                raise ApiError("Se esperaba {\"action\": \"%s\", \"tickets\": [{\"id\": 1, \"version\": 3}]}."
+                               % "|".join(TICKET_TRANSITIONS))
+            tickets = request.env['vet.waiting.ticket'].browse([item['id'] for item in items])
+            if len(tickets.exists()) != len(tickets):
+                raise ApiError("Tickets inexistentes: %s" % sorted(set(tickets.ids) - set(tickets.exists().ids)), status=404)
+            versions = {item['id']: item['version'] for item in items if isinstance(item.get('version'), int)}
+            with request.env.cr.savepoint():
+                if action == 'start':
+                    tickets.action_start_consultation(versions=versions)
+                else:
+                    tickets._transition(action, versions)
+            return self._json({'data': tickets.read(['state', 'version', 'visit_id'])})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/availability', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_availability(self, doctor_ids=None, duration=None, **kw):
+        """Turnos libres por médico (UTC) entre 'from' y 'to'; para reservar, POST /appointments/batch."""
+        try:
+            try:
+                date_from = fields.Datetime.to_datetime(kw.get('from'))
+                date_to = fields.Datetime.to_datetime(kw.get('to'))
+                doctor_ids = [int(doctor_id) for doctor_id in (doctor_ids or '').split(',') if doctor_id.strip()]
+                duration = duration and int(duration)
+            except ValueError:
+                raise ApiError("Parámetros inválidos: 'from'/'to' son fechas y 'doctor_ids'/'duration' enteros.")
+            doctors = request.env['vet.doctor'].browse(doctor_ids)
+            if len(doctors.exists()) != len(doctors):
+                raise ApiError("Médicos inexistentes: %s" % sorted(set(doctor_ids) - set(doctors.exists().ids)), status=404)
+            availability = doctors.get_availability(date_from, date_to, duration_min=duration)
+            return self._json({'data': {
+                doctor_id: [[fields.Datetime.to_string(start), fields.Datetime.to_string(stop)] for start, stop in slots]
+                for doctor_id, slots in availability.items()
+            }})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/fridges/readings', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_fridge_readings(self, **kw):
+        """Lecturas de temperatura en lote; las ya recibidas (misma heladera e instante) se ignoran."""
+        try:
+            payload = request.get_json_data()
+            series = payload.get('series') if isinstance(payload, dict) else None
+            if not isinstance(series, list) or not all(
+                isinstance(serie, dict) and isinstance(serie.get('points'), list) for serie in series
+            ):
+                raise ApiError("Se esperaba {\"series\": [{\"fridge\": \"HEL-01\", \"points\": [[t, °C], ...]}]}.")
+            with request.env.cr.savepoint():
+                result = request.env['vet.fridge.reading'].ingest(series)
+            return self._json(result)
+        except (ApiError, AccessError, UserError, ValidationError, ValueError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/fridges/<int:fridge_id>/temperatures', type='http', auth='user', methods=['GET'], csrf=False)
+    def api_fridge_temperatures(self, fridge_id, points=None, **kw):
+        """Serie reducida (media/mín/máx por intervalo) de una heladera, con sus límites."""
+        try:
+            try:
+                date_from = kw.get('from') and fields.Datetime.to_datetime(kw['from'])
+                date_to = kw.get('to') and fields.Datetime.to_datetime(kw['to'])
+                points = points and int(points)
+            except ValueError:
+                raise ApiError("Parámetros inválidos: 'from'/'to' son fechas y 'points' un entero.")
+            fridge = request.env['vet.fridge'].browse(fridge_id).exists()
+            if not fridge:
+                raise ApiError("Heladera inexistente: %s" % fridge_id, status=404)
+            series = request.env['vet.fridge.reading'].get_series(
+                fridge.id, date_from=date_from, date_to=date_to, points=points and min(points, MAX_LIMIT),
+            )
+            return self._json({'fridge': fridge.code, 'min_temp': fridge.min_temp, 'max_temp': fridge.max_temp,
+                               'data': series})
+        except (ApiError, AccessError, UserError, ValidationError) as e:
+            return self._error(e)
+
+    @http.route(API_ROOT + '/<string:resource>/batch', type='http', auth='user', methods=['POST'], csrf=False)
+    def api_batch(self, resource, **kw):
+        """
+        Crea en un solo `create` multi-registro y agrupa las escrituras con
+        valores idénticos en un solo `write`. Todo o nada (savepoint).
+        """
+        try:
+            spec, Model = self._get_resource(resource)
+            if not spec['writable']:
+                raise ApiError("El recurso '%s' es de solo lectura." % resource, status=405)
+            payload = request.get_json_data()
+            if not isinstance(payload, dict):
+                raise ApiError("Se esperaba un objeto JSON.")
+            to_create = [self._check_values(spec, values) for values in payload.get('create') or []]
+
+            writes = {}
+            for item in payload.get('write') or []:
+                if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+                    raise ApiError("Cada escritura debe tener 'id' entero y 'values'.")
+                values = self._check_values(spec, item.get('values') or {})
+                key = tuple(sorted((name, repr(value)) for name, value in values.items()))
+                writes.setdefault(key, (values, []))[1].append(item['id'])
+
+            with request.env.cr.savepoint():
+                created = Model.create(to_create) if to_create else Model
+                written = Model
+                for values, ids in writes.values():
+                    records = Model.browse(ids)
+                    if len(records.exists()) != len(records):
+                        raise ApiError("Registros inexistentes: %s" % sorted(set(ids) - set(records.exists().ids)), status=404)
+                    records.write(values)
+                    written |= records
+            return self._json({'created': created.ids, 'written': written.ids})
+        except (ApiError, AccessError, UserError, ValidationError, ValueError) as e:
+            return self._error(e)
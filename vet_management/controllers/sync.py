@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Sincronización delta para dispositivos offline (campañas en terreno).
+
+    POST /vet/sync/v1/pull  {"device": "<uid>", "cursors": {...}, "limit": 500}
+    POST /vet/sync/v1/push  {"device": "<uid>", "payload": {"animal.vaccination": [...], ...}}
+
+Ver `vet.sync.device.sync_pull` / `sync_push` para el formato de los datos.
+"""
+from odoo import http
+from odoo.http import request
+
+SYNC_ROOT = '/vet/sync/v1'
+MAX_LIMIT = 2000
+
+
+class VetSync(http.Controller):
+
+    @http.route(SYNC_ROOT + '/pull', type='json', auth='user', methods=['POST'])
+    def sync_pull(self, device, cursors=None, limit=500, name=None, **kw):
+        device = request.env['vet.sync.device']._get_device(device, name=name)
+        return device.sync_pull(cursors=cursors, limit=max(1, min(int(limit), MAX_LIMIT)))
+
+    @http.route(SYNC_ROOT + '/push', type='json', auth='user', methods=['POST'])
+    def sync_push(self, device, payload=None, name=None, **kw):
+        device = request.env['vet.sync.device']._get_device(device, name=name)
+        return device.sync_push(payload or {})
@@ -1,7 +1,27 @@
 # -*- coding: utf-8 -*-
 
+from . import keyset_mixin
+from . import concurrency
+from . import stock_locations
+from . import stock_valuation
+from . import sync
+from . import document_cache
+from . import patient_context
+from . import clinical_search
 from . import animals, allergies, diseases, insurances, medicines, species, surgeries, tag, vaccines, dewormings, visits, breeds, partner_pet, exam_orders
 from . import sterilizations
 from . import consents
 from . import prescriptions
 from . import waiting_room
+from . import campaign
+from . import lab_results
+from . import export
+from . import sterilization_outcome
+from . import animal_merge
+from . import vitals
+from . import hospitalization
+from . import contraindications
+from . import protocols
+from . import appointments
+from . import waiting_room_stats
+from . import cold_chain
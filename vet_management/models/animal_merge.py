@@ -0,0 +1,276 @@
+import logging
+
+import psycopg2
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Similitud mínima (pg_trgm) entre nombres del mismo dueño y especie.
+NAME_SIMILARITY = 0.6
+
+# Nombre comparable: minúsculas, sin espacios extremos ni tildes.
+NORMALIZED_NAME = "translate(lower(trim({col})), 'áéíóúüñ', 'aeiouun')"
+NORMALIZED_CHIP = "regexp_replace(upper({col}), '[^0-9A-Z]', '', 'g')"
+
+# Tablas propias de la detección de duplicados e índices derivados (se recalculan):
+# sus filas se eliminan con el animal fusionado.
+SKIP_TABLES = {'animal_duplicate', 'animal_contraindication', 'animal_protocol_due'}
+
+# Referencias genéricas (modelo, id, condición extra) que no son claves foráneas.
+# Los adjuntos con res_field son el contenido de campos binarios (p. ej. la foto)
+# y se eliminan junto con el origen.
+GENERIC_REFERENCES = [
+    ('mail_message', 'model', 'res_id', ''),
+    ('mail_activity', 'res_model', 'res_id', ''),
+    ('ir_attachment', 'res_model', 'res_id', ' AND res_field IS NULL'),
+]
+
+
+class Animal(models.Model):
+    _inherit = "animal"
+
+    def _merge_into(self, target):
+        """
+        Fusiona los animales de `self` en `target` dentro de la transacción actual:
+        cada clave foránea y relación Many2many hacia `animal` se reescribe con un
+        UPDATE por tabla; luego se recalculan solo los campos almacenados que
+        dependen de los registros movidos y del animal que queda.
+        """
+        target.ensure_one()
+        sources = self - target
+        if not sources:
+            return target
+        self.check_access_rights('unlink')
+        (sources | target).check_access_rule('write')
+        cr = self.env.cr
+        self.env.flush_all()
+        moved = {}
+        try:
+            with cr.savepoint():
+                for table, column in self._merge_foreign_keys():
+                    cr.execute(
+                        "SELECT column_name FROM information_schema.columns WHERE table_name = %s", [table]
+                    )
+                    columns = [row[0] for row in cr.fetchall()]
+                    if len(columns) <= 2:
+                        self._merge_relation_table(table, column, columns, sources, target)
+                        continue
+                    set_write_date = ', write_date = now() at time zone \'UTC\'' if 'write_date' in columns else ''
+                    returning = ' RETURNING id' if 'id' in columns else ''
+                    cr.execute('UPDATE "%s" SET "%s" = %%s%s WHERE "%s" IN %%s%s' % (
+                        table, column, set_write_date, column, returning,
+                    ), [target.id, tuple(sources.ids)])
+                    if returning:
+                        moved[table, column] = [row[0] for row in cr.fetchall()]
+                self._merge_generic_references(sources, target)
+        except psycopg2.IntegrityError as e:
+            raise UserError(_(
+                "No se pudo fusionar: ambos animales tienen registros que no pueden coexistir "
+                "(p. ej. la misma vacuna en la misma fecha). Corríjalos antes de fusionar.\n\n%s"
+            ) % e.pgerror)
+
+        self._merge_recompute(moved, target)
+        target.message_post(body=_("Fusionado con: %s") % ', '.join(
+            '%s (%s)' % (animal.name, animal.identification) for animal in sources
+        ))
+        sources.unlink()
+        self.env['vet.patient.context']._invalidate([target.id])
+        _logger.info("animal: %s fusionado(s) en %s", sources.ids, target.id)
+        return target
+
+    @api.model
+    def _merge_foreign_keys(self):
+        """(tabla, columna) de todas las claves foráneas de una columna que apuntan a `animal`."""
+        self.env.cr.execute("""
+            SELECT cl1.relname, att1.attname
+              FROM pg_constraint con
+              JOIN pg_class cl1 ON con.conrelid = cl1.oid
+              JOIN pg_class cl2 ON con.confrelid = cl2.oid
+              JOIN pg_attribute att1 ON att1.attrelid = cl1.oid AND att1.attnum = con.conkey[1]
+             WHERE con.contype = 'f' AND cl2.relname = %s AND array_length(con.conkey, 1) = 1
+          ORDER BY 1, 2
+        """, [self._table])
+        return [
+            (table, column) for table, column in self.env.cr.fetchall()
+            if table != self._table and table not in SKIP_TABLES
+        ]
+
+    @api.model
+    def _merge_relation_table(self, table, column, columns, sources, target):
+        """Many2many: mueve las filas que el destino no tiene y elimina el resto."""
+        cr = self.env.cr
+        others = [name for name in columns if name != column]
+        if others:
+            other = others[0]
+            cr.execute("""
+                UPDATE "{table}" rel SET "{column}" = %s
+                 WHERE rel."{column}" IN %s
+                   AND NOT EXISTS (
+                       SELECT 1 FROM "{table}" t WHERE t."{column}" = %s AND t."{other}" = rel."{other}"
+                   )
+            """.format(table=table, column=column, other=other), [target.id, tuple(sources.ids), target.id])
+        cr.execute('DELETE FROM "%s" WHERE "%s" IN %%s' % (table, column), [tuple(sources.ids)])
+
+    @api.model
+    def _merge_generic_references(self, sources, target):
+        cr = self.env.cr
+        for table, model_column, id_column, extra in GENERIC_REFERENCES:
+            cr.execute('UPDATE "%s" SET "%s" = %%s WHERE "%s" = %%s AND "%s" IN %%s%s' % (
+                table, id_column, model_column, id_column, extra,
+            ), [target.id, self._name, tuple(sources.ids)])
+        # Seguidores: uno por contacto que el destino no tenga, aunque lo sigan
+        # varios orígenes (los demás se borran con el origen).
+        cr.execute("""
+            UPDATE mail_followers f SET res_id = %s
+             WHERE f.id IN (
+                   SELECT DISTINCT ON (s.partner_id) s.id
+                     FROM mail_followers s
+                    WHERE s.res_model = %s AND s.res_id IN %s
+                      AND NOT EXISTS (
+                          SELECT 1 FROM mail_followers t
+                           WHERE t.res_model = s.res_model AND t.res_id = %s AND t.partner_id = s.partner_id
+                      )
+                 ORDER BY s.partner_id, s.id
+             )
+        """, [target.id, self._name, tuple(sources.ids), target.id])
+
+    @api.model
+    def _merge_recompute(self, moved, target):
+        """Recalcula los campos relacionados/almacenados de los registros movidos y del destino."""
+        models_by_table = {
+            Model._table: Model for Model in (self.env[name] for name in self.env.registry)
+            if not Model._abstract and Model._auto
+        }
+        self.env.invalidate_all()
+        for (table, column), ids in moved.items():
+            Model = models_by_table.get(table)
+            if Model is None or not ids or column not in Model._fields:
+                continue
+            Model.browse(ids).modified([column])
+        for field in self._fields.values():
+            if field.store and field.compute:
+                self.env.add_to_compute(field, target)
+        self.env.flush_all()
+
+
+class AnimalDuplicate(models.Model):
+    """Pares de posibles duplicados; se regeneran con `action_find_duplicates`."""
+    _name = "animal.duplicate"
+    _description = "Posible animal duplicado"
+    _order = "score desc, id"
+
+    animal_id = fields.Many2one("animal", string="Animal (se conserva)", required=True, ondelete='cascade')
+    duplicate_id = fields.Many2one("animal", string="Posible duplicado", required=True, ondelete='cascade')
+    reason = fields.Selection([
+        ('microchip', 'Mismo microchip'),
+        ('name', 'Mismo nombre, dueño y especie'),
+        ('similar', 'Nombre similar, mismo dueño y especie'),
+    ], string="Motivo", required=True)
+    score = fields.Float(string="Similitud", digits=(3, 2))
+    owner_id = fields.Many2one(related="animal_id.owner", string="Dueño")
+    specie_id = fields.Many2one(related="animal_id.species", string="Especie")
+
+    @api.model
+    def action_find_duplicates(self):
+        """
+        Busca duplicados por claves de bloque (microchip normalizado; dueño +
+        especie) y, dentro de cada bloque, nombre igual o similar por trigramas.
+        Reemplaza la lista anterior.
+        """
+        cr = self.env.cr
+        self.env['animal'].flush_model(['name', 'microchip_number', 'owner', 'species', 'active'])
+        pairs = {}
+
+        cr.execute("""
+            SELECT array_agg(id ORDER BY id)
+              FROM animal
+             WHERE active AND coalesce(microchip_number, '') <> ''
+          GROUP BY {chip}
+            HAVING count(*) > 1
+        """.format(chip=NORMALIZED_CHIP.format(col='microchip_number')))
+        for (ids,) in cr.fetchall():
+            for duplicate_id in ids[1:]:
+                pairs[ids[0], duplicate_id] = ('microchip', 1.0)
+
+        if self.env.registry.has_trigram:
+            cr.execute("""
+                SELECT a.id, b.id, similarity({name_a}, {name_b})
+                  FROM animal a
+                  JOIN animal b ON b.owner = a.owner AND b.species = a.species AND b.id > a.id
+                 WHERE a.active AND b.active AND similarity({name_a}, {name_b}) >= %s
+            """.format(
+                name_a=NORMALIZED_NAME.format(col='a.name'),
+                name_b=NORMALIZED_NAME.format(col='b.name'),
+            ), [NAME_SIMILARITY])
+        else:
+            # Sin pg_trgm: solo nombres idénticos una vez normalizados.
+            cr.execute("""
+                SELECT a.id, b.id, 1.0
+                  FROM animal a
+                  JOIN animal b ON b.owner = a.owner AND b.species = a.species AND b.id > a.id
+                 WHERE a.active AND b.active AND {name_a} = {name_b}
+            """.format(
+                name_a=NORMALIZED_NAME.format(col='a.name'),
+                name_b=NORMALIZED_NAME.format(col='b.name'),
+            ))
+        for animal_id, duplicate_id, score in cr.fetchall():
+            reason = 'name' if score >= 1.0 else 'similar'
+            pairs.setdefault((animal_id, duplicate_id), (reason, score))
+
+        self.search([]).unlink()
+        self.create([
+            {'animal_id': animal_id, 'duplicate_id': duplicate_id, 'reason': reason, 'score': score}
+            for (animal_id, duplicate_id), (reason, score) in pairs.items()
+        ])
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Posibles duplicados"),
+            'res_model': self._name,
+            'view_mode': 'tree',
+        }
+
+    def action_merge(self):
+        """Fusiona cada posible duplicado en el animal que se conserva."""
+        for pair in self:
+            if pair.exists() and pair.duplicate_id.exists():
+                pair.duplicate_id._merge_into(pair.animal_id)
+        return True
+
+
+class AnimalMergeWizard(models.TransientModel):
+    _name = "animal.merge.wizard"
+    _description = "Fusionar animales duplicados"
+
+    animal_ids = fields.Many2many(
+        "animal",
+        string="Animales",
+        default=lambda self: self.env.context.get('active_ids'),
+    )
+    target_id = fields.Many2one(
+        "animal",
+        string="Conservar",
+        domain="[('id', 'in', animal_ids)]",
+        help="Las visitas, vacunaciones, cirugías, etc. de los demás pasan a este animal; los demás se eliminan.",
+    )
+
+    @api.onchange('animal_ids')
+    def _onchange_animal_ids(self):
+        for wizard in self:
+            if wizard.target_id not in wizard.animal_ids:
+                wizard.target_id = wizard.animal_ids[:1]._origin
+
+    def action_merge(self):
+        self.ensure_one()
+        if len(self.animal_ids) < 2:
+            raise UserError(_("Seleccione al menos dos animales."))
+        if not self.target_id or self.target_id not in self.animal_ids:
+            raise UserError(_("Indique qué animal se conserva."))
+        self.animal_ids._merge_into(self.target_id)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'animal',
+            'res_id': self.target_id.id,
+            'view_mode': 'form',
+        }
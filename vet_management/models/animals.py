@@ -1,11 +1,49 @@
+import logging
+from datetime import timedelta
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+# Tramos etarios: (años cumplidos mínimos, clave, etiqueta), de mayor a menor.
+AGE_BANDS = [
+    (8, 'senior', 'Senior (8+ años)'),
+    (3, 'adult', 'Adulto (3-7 años)'),
+    (1, 'young', 'Joven (1-2 años)'),
+    (0, 'juvenile', 'Cachorro (< 1 año)'),
+]
+AGE_BAND_SELECTION = [(key, label) for _min_years, key, label in reversed(AGE_BANDS)]
+# Último día procesado por el cron de edades.
+AGE_REFRESH_PARAM = 'vet_management.age_refresh_date'
+
+
+def age_in_years(birthdate, on_date):
+    """Años cumplidos a `on_date` (None sin fecha de nacimiento); mismo criterio que age() de PostgreSQL."""
+    if not birthdate or not on_date:
+        return None
+    on_date = fields.Date.to_date(on_date)
+    return on_date.year - birthdate.year - ((on_date.month, on_date.day) < (birthdate.month, birthdate.day))
+
+
+def age_band(years):
+    if years is None or years < 0:
+        return False
+    return next(key for min_years, key, _label in AGE_BANDS if years >= min_years)
+
+
+def age_band_sql(years):
+    """Expresión SQL CASE del tramo etario para la expresión de años `years`."""
+    return "CASE %s END" % " ".join(
+        "WHEN %s >= %d THEN '%s'" % (years, min_years, key) for min_years, key, _label in AGE_BANDS
+    )
 
 
 class Animal(models.Model):
     _name = "animal"
     _description = "Animals table"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.sync.mixin']
     _order = "identification desc"
 
     name = fields.Char(string="Nombre", required=True)
@@ -15,7 +53,22 @@ class Animal(models.Model):
     ], string="Sexo", default="male")
     birthdate = fields.Date(string="Fecha de Nacimiento")
     # NUEVOS CAMPOS
-    age = fields.Integer(string="Edad")
+    age = fields.Integer(
+        string="Edad",
+        compute="_compute_age",
+        store=True,
+        readonly=False,
+        index=True,
+        help="Años cumplidos según la fecha de nacimiento (se actualiza a diario). "
+             "Sin fecha de nacimiento puede indicarse a mano."
+    )
+    age_band = fields.Selection(
+        AGE_BAND_SELECTION,
+        string="Tramo etario",
+        compute="_compute_age_band",
+        store=True,
+        index=True
+    )
     reproductive_status = fields.Selection([
         ('neutered', 'Esterilizado'),
         ('entire', 'Entero'),
@@ -108,12 +161,88 @@ class Animal(models.Model):
     hair_type = fields.Char(string="Tipo de pelo")
     diet = fields.Char(string="Dieta")
 
+    def init(self):
+        super().init()
+        # Cumpleaños del día para el cron de edades.
+        create_index(
+            self._cr,
+            'animal_birth_month_day_index',
+            self._table,
+            ['(extract(month FROM birthdate))', '(extract(day FROM birthdate))'],
+            where='birthdate IS NOT NULL',
+        )
+
     @api.model
     def create(self, vals):
         if vals.get('identification', 'Nuevo') == 'Nuevo':
             vals['identification'] = self.env['ir.sequence'].next_by_code('animal.identification') or 'Nuevo'
         return super(Animal, self).create(vals)
 
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['vet.patient.context']._invalidate(self.ids)
+        return res
+
+    def unlink(self):
+        self.env['vet.patient.context']._invalidate(self.ids)
+        return super().unlink()
+
+    @api.depends('birthdate')
+    def _compute_age(self):
+        today = fields.Date.context_today(self)
+        for record in self:
+            if record.birthdate:
+                record.age = max(age_in_years(record.birthdate, today), 0)
+
+    @api.depends('birthdate', 'age')
+    def _compute_age_band(self):
+        for record in self:
+            record.age_band = age_band(record.age) if record.birthdate or record.age else False
+
+    @api.model
+    def _cron_refresh_age(self):
+        """
+        Actualiza edad y tramo de los animales que cumplen años desde la última
+        ejecución (normalmente solo el día de hoy), con un UPDATE que usa el
+        índice por mes/día de nacimiento. Los nacidos un 29 de febrero cumplen
+        el 1 de marzo en los años no bisiestos.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        today = fields.Date.context_today(self)
+        last = fields.Date.to_date(ICP.get_param(AGE_REFRESH_PARAM)) or today - timedelta(days=1)
+        if last >= today:
+            return
+        days = (today - last).days
+        where, params = "birthdate IS NOT NULL", []
+        if days < 366:
+            month_days = {((last + timedelta(days=n)).month, (last + timedelta(days=n)).day) for n in range(1, days + 1)}
+            if (3, 1) in month_days:
+                month_days.add((2, 29))
+            where += " AND (extract(month FROM birthdate), extract(day FROM birthdate)) IN %s"
+            params.append(tuple(month_days))
+        self.flush_model(['birthdate', 'age', 'age_band'])
+        self.env.cr.execute("""
+            UPDATE animal a
+               SET age = sub.age, age_band = sub.age_band, write_date = now() at time zone 'UTC'
+              FROM (
+                  SELECT id, age, {band} AS age_band
+                    FROM (
+                        SELECT id, greatest(date_part('year', age(%s, birthdate))::int, 0) AS age
+                          FROM animal
+                         WHERE {where}
+                    ) ages
+              ) sub
+             WHERE a.id = sub.id
+               AND (a.age IS DISTINCT FROM sub.age OR a.age_band IS DISTINCT FROM sub.age_band)
+         RETURNING a.id
+        """.format(where=where, band=age_band_sql('age')), [today] + params)
+        animal_ids = [row[0] for row in self.env.cr.fetchall()]
+        updated = len(animal_ids)
+        self.invalidate_model(['age', 'age_band', 'write_date'])
+        self.env['vet.patient.context']._invalidate(animal_ids)
+        ICP.set_param(AGE_REFRESH_PARAM, fields.Date.to_string(today))
+        _logger.info("animal: edad actualizada en %s animales", updated)
+
     @api.depends('vaccination_ids.vaccine_id')
     def _compute_vaccines(self):
         for record in self:
@@ -0,0 +1,421 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+WEEKDAYS = [
+    ('0', 'Lunes'),
+    ('1', 'Martes'),
+    ('2', 'Miércoles'),
+    ('3', 'Jueves'),
+    ('4', 'Viernes'),
+    ('5', 'Sábado'),
+    ('6', 'Domingo'),
+]
+DEFAULT_SLOT_MINUTES = 30
+# Cirugías sin duración (ni en el registro ni en el catálogo) ocupan este tiempo en la agenda.
+DEFAULT_SURGERY_MINUTES = 60
+# Estados que ocupan la agenda.
+BUSY_STATES = ('booked', 'arrived')
+SURGERY_BUSY_STATES = ('scheduled', 'in_progress')
+# Rango máximo de una consulta de disponibilidad.
+MAX_AVAILABILITY_DAYS = 62
+
+
+def subtract_intervals(free, busy):
+    """
+    Resta los intervalos `busy` de los intervalos `free`, ambos listas de
+    (inicio, fin) ordenadas por inicio; `busy` puede tener solapes. Una pasada.
+    """
+    result = []
+    first = 0
+    for start, stop in free:
+        while first < len(busy) and busy[first][1] <= start:
+            first += 1
+        cursor = start
+        index = first
+        while index < len(busy) and busy[index][0] < stop:
+            busy_start, busy_stop = busy[index]
+            if busy_start > cursor:
+                result.append((cursor, busy_start))
+            cursor = max(cursor, busy_stop)
+            index += 1
+        if cursor < stop:
+            result.append((cursor, stop))
+    return result
+
+
+class Doctor(models.Model):
+    """
+    Médico/a con agenda. El nombre coincide con los campos de texto "Dr/Dra" y
+    "Cirujano/a" del resto del módulo, que es como se cruzan tickets y cirugías.
+    """
+    _name = "vet.doctor"
+    _description = "Médico/a veterinario/a"
+    _order = "name"
+
+    name = fields.Char(string="Nombre", required=True)
+    user_id = fields.Many2one("res.users", string="Usuario", ondelete='set null')
+    room = fields.Char(string="Box habitual", help="Las reservas de otros médicos en este box también lo ocupan.")
+    stock_location_id = fields.Many2one(
+        "vet.stock.location",
+        string="Ubicación de stock",
+        ondelete='set null',
+        help="Desde dónde se descuentan sus aplicaciones; vacío = ubicación principal.",
+    )
+    slot_minutes = fields.Integer(string="Duración del turno (min)", default=DEFAULT_SLOT_MINUTES)
+    shift_ids = fields.One2many("vet.doctor.shift", "doctor_id", string="Horario de atención")
+    color = fields.Integer(string="Color")
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', 'Ya existe un médico con ese nombre.'),
+        ('slot_minutes_positive', 'CHECK(slot_minutes > 0)', 'La duración del turno debe ser positiva.'),
+    ]
+
+    def _get_tz(self):
+        return pytz.timezone(self.env.context.get('tz') or self.env.user.tz or 'UTC')
+
+    def _working_intervals(self, date_from, date_to):
+        """{médico: [(inicio, fin)]} de atención en UTC dentro de [date_from, date_to), según los turnos semanales."""
+        tz = self._get_tz()
+        local_from = pytz.utc.localize(date_from).astimezone(tz).date()
+        local_to = pytz.utc.localize(date_to).astimezone(tz).date()
+        days = [local_from + timedelta(days=n) for n in range((local_to - local_from).days + 1)]
+        intervals = {}
+        for doctor in self:
+            shifts_by_weekday = defaultdict(list)
+            for shift in doctor.shift_ids:
+                shifts_by_weekday[int(shift.weekday)].append((shift.hour_from, shift.hour_to))
+            result = []
+            for day in days:
+                midnight = datetime.combine(day, time())
+                for hour_from, hour_to in sorted(shifts_by_weekday.get(day.weekday(), [])):
+                    start = tz.localize(midnight + timedelta(hours=hour_from)).astimezone(pytz.utc).replace(tzinfo=None)
+                    stop = tz.localize(midnight + timedelta(hours=hour_to)).astimezone(pytz.utc).replace(tzinfo=None)
+                    start, stop = max(start, date_from), min(stop, date_to)
+                    if start < stop:
+                        result.append((start, stop))
+            intervals[doctor] = result
+        return intervals
+
+    def _busy_intervals(self, date_from, date_to):
+        """
+        {id de médico: [(inicio, fin)]} ordenados, en una sola consulta: sus turnos
+        reservados, las reservas de otros médicos en su box y sus cirugías.
+        """
+        self.env['vet.appointment'].flush_model(['doctor_id', 'room', 'start', 'stop', 'state'])
+        self.env['animal.surgery.record'].flush_model(['surgeon', 'date', 'duration_min', 'surgery_id', 'state'])
+        self.env['animal.surgery'].flush_model(['default_duration_min'])
+        self.flush_model(['name', 'room'])
+        self.env.cr.execute("""
+            SELECT doctor_id, start, stop
+              FROM vet_appointment
+             WHERE doctor_id IN %(doctors)s AND state IN %(states)s
+               AND start < %(to)s AND stop > %(from)s
+             UNION ALL
+            SELECT d.id, a.start, a.stop
+              FROM vet_doctor d
+              JOIN vet_appointment a ON a.room = d.room AND a.doctor_id <> d.id
+             WHERE d.id IN %(doctors)s AND coalesce(d.room, '') <> '' AND a.state IN %(states)s
+               AND a.start < %(to)s AND a.stop > %(from)s
+             UNION ALL
+            SELECT d.id, s.date,
+                   s.date + make_interval(mins => coalesce(nullif(s.duration_min, 0),
+                                                           nullif(c.default_duration_min, 0), %(surgery_minutes)s))
+              FROM vet_doctor d
+              JOIN animal_surgery_record s ON s.surgeon = d.name
+              JOIN animal_surgery c ON c.id = s.surgery_id
+             WHERE d.id IN %(doctors)s AND s.state IN %(surgery_states)s
+               AND s.date < %(to)s AND s.date > %(from)s - interval '1 day'
+          ORDER BY 1, 2
+        """, {
+            'doctors': tuple(self.ids),
+            'states': BUSY_STATES,
+            'surgery_states': SURGERY_BUSY_STATES,
+            'surgery_minutes': DEFAULT_SURGERY_MINUTES,
+            'from': date_from,
+            'to': date_to,
+        })
+        busy = defaultdict(list)
+        for doctor_id, start, stop in self.env.cr.fetchall():
+            if stop > date_from:
+                busy[doctor_id].append((start, stop))
+        return busy
+
+    def get_availability(self, date_from, date_to, duration_min=None):
+        """
+        Turnos libres de los médicos (todos los activos si `self` está vacío)
+        entre `date_from` y `date_to` (UTC): {id de médico: [(inicio, fin)]}.
+        Horario de atención menos lo ocupado, cortado en turnos de
+        `duration_min` (por defecto, la duración de turno de cada médico).
+        """
+        doctors = self or self.search([])
+        date_from = fields.Datetime.to_datetime(date_from)
+        date_to = fields.Datetime.to_datetime(date_to)
+        if not date_from or not date_to or date_from >= date_to:
+            raise UserError(_("Indique un rango de fechas válido."))
+        if (date_to - date_from).days > MAX_AVAILABILITY_DAYS:
+            raise UserError(_("El rango de disponibilidad no puede superar %s días.") % MAX_AVAILABILITY_DAYS)
+        if not doctors:
+            return {}
+        working = doctors._working_intervals(date_from, date_to)
+        busy = doctors._busy_intervals(date_from, date_to)
+        availability = {}
+        for doctor in doctors:
+            step = timedelta(minutes=doctor.slot_minutes)
+            length = timedelta(minutes=duration_min or doctor.slot_minutes)
+            slots = []
+            for start, stop in subtract_intervals(working[doctor], busy.get(doctor.id, [])):
+                while start + length <= stop:
+                    slots.append((start, start + length))
+                    start += step
+            availability[doctor.id] = slots
+        return availability
+
+
+class DoctorShift(models.Model):
+    _name = "vet.doctor.shift"
+    _description = "Horario de atención"
+    _order = "doctor_id, weekday, hour_from"
+
+    doctor_id = fields.Many2one("vet.doctor", string="Médico/a", required=True, ondelete='cascade', index=True)
+    weekday = fields.Selection(WEEKDAYS, string="Día", required=True, default='0')
+    hour_from = fields.Float(string="Desde", required=True, default=9.0)
+    hour_to = fields.Float(string="Hasta", required=True, default=18.0)
+
+    _sql_constraints = [
+        ('hours_valid', 'CHECK(hour_from >= 0 AND hour_to <= 24 AND hour_from < hour_to)',
+         'El horario debe estar dentro del día y "Desde" debe ser anterior a "Hasta".'),
+    ]
+
+
+class Appointment(models.Model):
+    """Turno reservado con un médico; al llegar el paciente se convierte en ticket de la sala de espera."""
+    _name = "vet.appointment"
+    _description = "Turno"
+    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _order = "start desc, id desc"
+
+    sequence = fields.Char(
+        string="Referencia",
+        required=True,
+        copy=False,
+        readonly=True,
+        index=True,
+        default=lambda self: 'Nuevo'
+    )
+    animal_id = fields.Many2one("animal", string="Animal", required=True, ondelete='cascade', index=True, tracking=True)
+    owner_id = fields.Many2one(related="animal_id.owner", string="Dueño", store=True, readonly=True)
+    doctor_id = fields.Many2one("vet.doctor", string="Dr/Dra", required=True, ondelete='restrict', tracking=True)
+    room = fields.Char(
+        string="Box/consulta",
+        compute="_compute_room",
+        store=True,
+        readonly=False,
+        tracking=True
+    )
+    start = fields.Datetime(string="Inicio", required=True, tracking=True)
+    duration_min = fields.Integer(
+        string="Duración (min)",
+        compute="_compute_duration_min",
+        store=True,
+        readonly=False
+    )
+    stop = fields.Datetime(string="Fin", compute="_compute_stop", store=True)
+    reason = fields.Text(string="Motivo")
+    priority = fields.Selection([
+        ('0', 'Baja'),
+        ('1', 'Normal'),
+        ('2', 'Alta'),
+        ('3', 'Emergencia'),
+    ], string="Prioridad", default='1')
+    state = fields.Selection([
+        ('booked', 'Reservado'),
+        ('arrived', 'Llegó'),
+        ('cancelled', 'Cancelado'),
+        ('no_show', 'No asistió'),
+    ], string="Estado", default='booked', required=True, tracking=True, index=True)
+    ticket_ids = fields.One2many("vet.waiting.ticket", "appointment_id", string="Tickets")
+    ticket_id = fields.Many2one("vet.waiting.ticket", string="Ticket", compute="_compute_ticket_id")
+
+    _sql_constraints = [
+        ('duration_positive', 'CHECK(duration_min > 0)', 'La duración del turno debe ser positiva.'),
+        # Respaldo de _check_overlap frente a reservas concurrentes: dos transacciones
+        # no se ven entre sí, pero la segunda espera a la primera en el índice GiST.
+        ('doctor_no_overlap',
+         "EXCLUDE USING gist (doctor_id WITH =, tsrange(start, stop) WITH &&) WHERE (state IN ('booked', 'arrived'))",
+         'El/la médico/a ya tiene un turno en ese horario.'),
+        ('room_no_overlap',
+         "EXCLUDE USING gist (room WITH =, tsrange(start, stop) WITH &&) "
+         "WHERE (state IN ('booked', 'arrived') AND coalesce(room, '') <> '')",
+         'El box ya está ocupado en ese horario.'),
+    ]
+
+    def _auto_init(self):
+        # Las restricciones EXCLUDE comparan doctor_id y room con = dentro de GiST.
+        self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        return super()._auto_init()
+
+    def init(self):
+        super().init()
+        # Agenda por médico y por box: rango de fechas de los turnos que ocupan.
+        create_index(self._cr, 'vet_appointment_doctor_start_index', self._table, ['doctor_id', 'start', 'stop'],
+                     where="state IN ('booked', 'arrived')")
+        create_index(self._cr, 'vet_appointment_room_start_index', self._table, ['room', 'start', 'stop'],
+                     where="state IN ('booked', 'arrived') AND room IS NOT NULL")
+        create_index(self._cr, 'animal_surgery_record_surgeon_date_index', 'animal_surgery_record', ['surgeon', 'date'],
+                     where="surgeon IS NOT NULL")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('sequence', 'Nuevo') == 'Nuevo':
+                vals['sequence'] = self.env['ir.sequence'].next_by_code('vet.appointment.sequence') or 'Nuevo'
+        return super().create(vals_list)
+
+    def name_get(self):
+        res = []
+        for rec in self:
+            label = rec.sequence or _("Turno")
+            if rec.animal_id:
+                label = "%s - %s" % (label, rec.animal_id.name)
+            res.append((rec.id, label))
+        return res
+
+    @api.depends('doctor_id')
+    def _compute_room(self):
+        for rec in self:
+            if rec.doctor_id.room:
+                rec.room = rec.doctor_id.room
+
+    @api.depends('doctor_id')
+    def _compute_duration_min(self):
+        for rec in self:
+            rec.duration_min = rec.doctor_id.slot_minutes or DEFAULT_SLOT_MINUTES
+
+    @api.depends('start', 'duration_min')
+    def _compute_stop(self):
+        for rec in self:
+            rec.stop = rec.start and rec.start + timedelta(minutes=rec.duration_min or 0)
+
+    def _compute_ticket_id(self):
+        for rec in self:
+            rec.ticket_id = rec.ticket_ids[:1]
+
+    @api.constrains('doctor_id', 'room', 'start', 'stop', 'state')
+    def _check_overlap(self):
+        """
+        Una consulta para todo el lote: choques con otros turnos del médico o del
+        box, y con sus cirugías. Los choques entre turnos de transacciones
+        concurrentes los detienen las restricciones EXCLUDE.
+        """
+        busy = self.filtered(lambda rec: rec.state in BUSY_STATES)
+        if not busy:
+            return
+        self.flush_model(['doctor_id', 'room', 'start', 'stop', 'state'])
+        self.env['animal.surgery.record'].flush_model(['surgeon', 'date', 'duration_min', 'surgery_id', 'state'])
+        self.env['animal.surgery'].flush_model(['default_duration_min'])
+        self.env.cr.execute("""
+            SELECT a.sequence, b.sequence
+              FROM vet_appointment a
+              JOIN vet_appointment b
+                ON b.id <> a.id AND b.state IN %(states)s
+               AND b.start < a.stop AND b.stop > a.start
+               AND (b.doctor_id = a.doctor_id OR (coalesce(a.room, '') <> '' AND b.room = a.room))
+             WHERE a.id IN %(ids)s
+             UNION ALL
+            SELECT a.sequence, coalesce(s.sequence, c.name)
+              FROM vet_appointment a
+              JOIN vet_doctor d ON d.id = a.doctor_id
+              JOIN animal_surgery_record s
+                ON s.surgeon = d.name AND s.state IN %(surgery_states)s
+               AND s.date < a.stop AND s.date > a.start - interval '1 day'
+              JOIN animal_surgery c ON c.id = s.surgery_id
+             WHERE a.id IN %(ids)s
+               AND s.date + make_interval(mins => coalesce(nullif(s.duration_min, 0),
+                                                           nullif(c.default_duration_min, 0), %(surgery_minutes)s)) > a.start
+             LIMIT 10
+        """, {
+            'ids': tuple(busy.ids),
+            'states': BUSY_STATES,
+            'surgery_states': SURGERY_BUSY_STATES,
+            'surgery_minutes': DEFAULT_SURGERY_MINUTES,
+        })
+        conflicts = self.env.cr.fetchall()
+        if conflicts:
+            raise ValidationError(_("Horario no disponible:\n%s") % "\n".join(
+                "- %s choca con %s" % (appointment, other) for appointment, other in conflicts
+            ))
+
+    def action_check_in(self):
+        """
+        Registra la llegada: crea en un solo `create` los tickets de la sala de
+        espera de los turnos reservados y los marca como 'Llegó'.
+        """
+        if any(rec.state not in ('booked', 'arrived') for rec in self):
+            raise UserError(_("Solo se puede registrar la llegada de turnos reservados."))
+        booked = self.filtered(lambda rec: rec.state == 'booked')
+        now = fields.Datetime.now()
+        tickets = self.env['vet.waiting.ticket'].create([
+            {
+                'animal_id': rec.animal_id.id,
+                'appointment_id': rec.id,
+                'arrival_time': now,
+                'doctor': rec.doctor_id.name,
+                'room': rec.room,
+                'reason': rec.reason,
+                'priority': rec.priority,
+            }
+            for rec in booked
+        ])
+        booked.write({'state': 'arrived'})
+        ticket = tickets[:1] or self.ticket_id
+        if len(self) == 1 and ticket:
+            return {
+                'type': 'ir.actions.act_window',
+                'name': _('Ticket'),
+                'res_model': 'vet.waiting.ticket',
+                'view_mode': 'form',
+                'res_id': ticket.id,
+                'target': 'current',
+            }
+        _logger.info("vet.appointment: %s llegadas registradas", len(tickets))
+        return True
+
+    def action_cancel(self):
+        if any(rec.state == 'arrived' for rec in self):
+            raise UserError(_("No se puede cancelar un turno cuyo paciente ya llegó; cancele el ticket."))
+        self.write({'state': 'cancelled'})
+        return True
+
+    def action_no_show(self):
+        if any(rec.state != 'booked' for rec in self):
+            raise UserError(_("Solo los turnos reservados pueden marcarse como 'No asistió'."))
+        self.write({'state': 'no_show'})
+        return True
+
+    def action_reset_to_booked(self):
+        if any(rec.state not in ('cancelled', 'no_show') for rec in self):
+            raise UserError(_("Solo se pueden reabrir turnos cancelados o sin asistencia."))
+        self.write({'state': 'booked'})
+        return True
+
+
+class VetWaitingTicket(models.Model):
+    _inherit = "vet.waiting.ticket"
+
+    appointment_id = fields.Many2one(
+        "vet.appointment",
+        string="Turno",
+        readonly=True,
+        ondelete='set null',
+        index='btree_not_null'
+    )
@@ -0,0 +1,116 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.osv import expression
+
+
+class VaccinationCampaign(models.TransientModel):
+    """
+    Asistente de campaña masiva (refugios, operativos municipales):
+    un producto, un lote y una fecha para muchos animales a la vez.
+    """
+    _name = "animal.vaccination.campaign"
+    _description = "Campaña masiva de vacunación / desparasitación"
+
+    campaign_type = fields.Selection([
+        ('vaccination', 'Vacunación'),
+        ('deworming', 'Desparasitación'),
+    ], string="Tipo de campaña", required=True, default='vaccination')
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna")
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante")
+
+    date = fields.Date(string="Fecha de aplicación", required=True, default=fields.Date.context_today)
+    next_date = fields.Date(string="Próxima aplicación")
+    quantity = fields.Float(
+        string="Dosis/unidades por animal",
+        default=1.0,
+        help="Dosis de vacuna o unidades de desparasitante aplicadas a cada animal.",
+    )
+    route = fields.Selection(
+        selection=lambda self: self.env['animal.vaccination']._fields['route'].selection,
+        string="Vía de administración",
+    )
+    doctor = fields.Char(string="Dr/Dra (aplicó)")
+    stock_location_id = fields.Many2one(
+        "vet.stock.location",
+        string="Ubicación de stock",
+        help="Desde dónde se descuentan las dosis; vacío = la del médico o la principal.",
+    )
+    lot_number = fields.Char(string="Lote / Serie")
+    lot_expiration = fields.Date(string="Vencimiento (lote)")
+    consume_stock = fields.Boolean(string="Descontar stock", default=True)
+    notes = fields.Text(string="Notas/Observaciones")
+
+    # === Selección de animales (se suman) ===
+    tag_ids = fields.Many2many("animal.tag", string="Etiquetas")
+    owner_ids = fields.Many2many(
+        "res.partner",
+        string="Dueños / refugios",
+        help="Se incluyen todos los animales de estos dueños (p. ej. un refugio).",
+    )
+    animal_ids = fields.Many2many("animal", string="Animales")
+    specie_id = fields.Many2one("animal.specie", string="Solo especie")
+    animal_count = fields.Integer(string="Animales seleccionados", compute="_compute_animal_count")
+
+    @api.depends('tag_ids', 'owner_ids', 'animal_ids', 'specie_id')
+    def _compute_animal_count(self):
+        for wizard in self:
+            wizard.animal_count = len(wizard._get_animals())
+
+    @api.onchange('campaign_type', 'date')
+    def _onchange_suggest_next_date(self):
+        """Sugerir refuerzo anual (vacuna) o trimestral (desparasitación)."""
+        for wizard in self:
+            if wizard.date:
+                days = 365 if wizard.campaign_type == 'vaccination' else 90
+                wizard.next_date = fields.Date.add(wizard.date, days=days)
+
+    def _get_animals(self):
+        self.ensure_one()
+        animals = self.env['animal'].browse(self.animal_ids.ids)
+        domains = []
+        if self.tag_ids:
+            domains.append([('tags', 'in', self.tag_ids.ids)])
+        if self.owner_ids:
+            domains.append([('owner', 'in', self.owner_ids.ids)])
+        if domains:
+            animals |= self.env['animal'].search(expression.OR(domains))
+        if self.specie_id:
+            animals = animals.filtered(lambda a: a.species == self.specie_id)
+        return animals
+
+    def action_apply(self):
+        self.ensure_one()
+        animals = self._get_animals()
+        if not animals:
+            raise UserError(_("No hay animales seleccionados para la campaña."))
+
+        values = {
+            'route': self.route,
+            'doctor': self.doctor,
+            'next_date': self.next_date,
+            'lot_number': self.lot_number,
+            'lot_expiration': self.lot_expiration,
+            'consume_stock': self.consume_stock,
+            'notes': self.notes,
+        }
+        if self.stock_location_id:
+            values['stock_location_id'] = self.stock_location_id.id
+        if self.campaign_type == 'vaccination':
+            if not self.vaccine_id:
+                raise UserError(_("Selecciona la vacuna de la campaña."))
+            values['applied_doses'] = self.quantity
+            records = self.env['animal.vaccination'].create_campaign(self.vaccine_id, animals, self.date, values)
+        else:
+            if not self.dewormer_id:
+                raise UserError(_("Selecciona el desparasitante de la campaña."))
+            values['quantity_units'] = self.quantity
+            records = self.env['animal.deworming'].create_campaign(self.dewormer_id, animals, self.date, values)
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Registros de la campaña'),
+            'res_model': records._name,
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', records.ids)],
+            'target': 'current',
+        }
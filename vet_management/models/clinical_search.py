@@ -0,0 +1,137 @@
+import hashlib
+
+from odoo import models, api
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists, create_index
+
+# Columna tsvector generada por PostgreSQL (se recalcula sola en cada INSERT/UPDATE).
+TSV_COLUMN = 'clinical_tsv'
+TS_CONFIG = 'spanish'
+
+# Recurso de la búsqueda unificada -> modelo.
+SEARCH_MODELS = {
+    'visits': 'animal.visit',
+    'surgeries': 'animal.surgery.record',
+    'exam_orders': 'animal.exam.order',
+    'prescriptions': 'animal.prescription',
+}
+
+# Opciones de ts_headline para los fragmentos; sin etiquetas HTML porque el
+# texto clínico no viene escapado.
+HEADLINE_OPTIONS = 'StartSel=«, StopSel=», MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=" … "'
+
+
+class ClinicalSearchMixin(models.AbstractModel):
+    """
+    Índice de texto completo (configuración 'spanish', con stemming) sobre los
+    campos narrativos del modelo: columna tsvector generada + índice GIN.
+    """
+    _name = "vet.clinical.search.mixin"
+    _description = "Búsqueda de texto completo en narrativas clínicas"
+
+    # {campo: peso tsvector ('A' pesa más que 'D' en el ranking)}
+    _clinical_search_fields = {}
+
+    def _clinical_tsv_expression(self):
+        return " || ".join(
+            "setweight(to_tsvector('%s', coalesce(\"%s\", '')), '%s')" % (TS_CONFIG, name, weight)
+            for name, weight in sorted(self._clinical_search_fields.items())
+        )
+
+    def init(self):
+        super().init()
+        if self._abstract or not self._clinical_search_fields:
+            return
+        cr = self._cr
+        expression = self._clinical_tsv_expression()
+        # La firma de la expresión va en el comentario de la columna: si cambian
+        # los campos indexados se vuelve a generar la columna.
+        signature = hashlib.sha1(expression.encode()).hexdigest()
+        if column_exists(cr, self._table, TSV_COLUMN):
+            cr.execute(
+                "SELECT col_description(%s::regclass, attnum) FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s",
+                [self._table, self._table, TSV_COLUMN],
+            )
+            if cr.fetchone()[0] == signature:
+                return
+            cr.execute('ALTER TABLE "%s" DROP COLUMN "%s"' % (self._table, TSV_COLUMN))
+        cr.execute('ALTER TABLE "%s" ADD COLUMN "%s" tsvector GENERATED ALWAYS AS (%s) STORED' % (
+            self._table, TSV_COLUMN, expression))
+        cr.execute('COMMENT ON COLUMN "%s"."%s" IS %%s' % (self._table, TSV_COLUMN), [signature])
+        create_index(cr, '%s_%s_index' % (self._table, TSV_COLUMN), self._table, ['"%s"' % TSV_COLUMN], method='gin')
+
+    @api.model
+    def _clinical_search(self, text, domain=None, limit=20):
+        """
+        [(id, rank)] de los registros cuyo texto coincide con ``text`` (sintaxis
+        de buscador web: "frase exacta", -excluir, or), ordenados por relevancia.
+        Respeta permisos y reglas de registro.
+        """
+        self.check_access_rights('read')
+        self.flush_model(list(self._clinical_search_fields))
+        tsv = '"%s"."%s"' % (self._table, TSV_COLUMN)
+        tsquery = SQL("websearch_to_tsquery(%s, %s)", TS_CONFIG, text)
+        # Normalización 32 (rank / (rank + 1)): rangos comparables entre modelos.
+        rank = SQL("ts_rank_cd(%s, %s, 32)", SQL(tsv), tsquery)
+        query = self._search(domain or [], limit=limit)
+        query.add_where(SQL("%s @@ %s", SQL(tsv), tsquery))
+        query.order = SQL("%s DESC, %s DESC", rank, SQL('"%s"."id"' % self._table))
+        self.env.cr.execute(query.select(SQL('"%s"."id"' % self._table), rank))
+        return self.env.cr.fetchall()
+
+    def _clinical_snippets(self, text):
+        """{id: fragmento} con los términos encontrados marcados entre « »."""
+        if not self:
+            return {}
+        document = "concat_ws(' … ', %s)" % ", ".join('"%s"' % name for name in sorted(self._clinical_search_fields))
+        self.env.cr.execute(SQL(
+            "SELECT id, ts_headline(%s, %s, websearch_to_tsquery(%s, %s), %s) FROM %s WHERE id IN %s",
+            TS_CONFIG, SQL(document), TS_CONFIG, text, HEADLINE_OPTIONS, SQL.identifier(self._table), tuple(self.ids),
+        ))
+        return dict(self.env.cr.fetchall())
+
+
+class ClinicalSearch(models.AbstractModel):
+    _name = "vet.clinical.search"
+    _description = "Búsqueda clínica unificada"
+
+    @api.model
+    def search_narratives(self, text, resources=None, animal_id=None, limit=20):
+        """
+        Búsqueda en visitas, cirugías, órdenes de examen y recetas.
+        Devuelve una lista de resultados ordenada por relevancia, cada uno con
+        recurso, id, referencia, animal, fecha, puntaje y fragmento.
+        """
+        text = (text or '').strip()
+        if not text:
+            return []
+        domain = [('animal_id', '=', animal_id)] if animal_id else []
+        hits = []
+        for resource in resources or SEARCH_MODELS:
+            Model = self.env[SEARCH_MODELS[resource]]
+            if not Model.check_access_rights('read', raise_exception=False):
+                continue
+            hits.extend((rank, resource, res_id) for res_id, rank in Model._clinical_search(text, domain, limit))
+        hits.sort(key=lambda hit: (-hit[0], hit[1], -hit[2]))
+        hits = hits[:limit]
+
+        # Fragmentos y datos de presentación solo para los resultados que se devuelven.
+        by_resource = {}
+        for _rank, resource, res_id in hits:
+            by_resource.setdefault(resource, []).append(res_id)
+        details = {}
+        for resource, ids in by_resource.items():
+            records = self.env[SEARCH_MODELS[resource]].browse(ids)
+            snippets = records._clinical_snippets(text)
+            for record in records:
+                details[resource, record.id] = {
+                    'display_name': record.display_name,
+                    'animal_id': record.animal_id.id,
+                    'animal_name': record.animal_id.name,
+                    'date': record.date and record.date.isoformat(),
+                    'snippet': snippets.get(record.id),
+                }
+        return [
+            dict(details[resource, res_id], resource=resource, id=res_id, rank=rank)
+            for rank, resource, res_id in hits
+        ]
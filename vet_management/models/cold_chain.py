@@ -0,0 +1,530 @@
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+INSERT_CHUNK = 5000
+DEFAULT_POINTS = 300
+# Sin lecturas durante este tiempo la heladera se considera desconectada.
+OFFLINE_MINUTES = 15
+# Días de lecturas minuto a minuto que se conservan; después quedan solo los agregados por hora.
+RAW_RETENTION_PARAM = 'vet_management.cold_chain_raw_days'
+DEFAULT_RAW_RETENTION_DAYS = 90
+# Lotes "en uso" al momento de una excursión: aplicados en los últimos días antes de ella.
+LOT_LOOKBACK_DAYS = 90
+
+
+def to_utc(value):
+    """
+    Instante ISO 8601 (o datetime) a datetime UTC sin zona, como lo guarda Odoo.
+    Devuelve también si traía zona: 'Z' o un desfase (+hh:mm) se convierten a UTC.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        # fromisoformat acepta 'Z' recién desde Python 3.11.
+        value = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith(('Z', 'z')) else value)
+    elif not isinstance(value, datetime):
+        raise TypeError(value)
+    if value.tzinfo is None:
+        return value.replace(microsecond=0), False
+    return value.astimezone(timezone.utc).replace(tzinfo=None, microsecond=0), True
+
+
+class Fridge(models.Model):
+    """
+    Heladera de vacunas con sensor de temperatura. Cada sensor envía una lectura
+    por minuto; los límites (2-8 °C por defecto) definen las excursiones.
+    """
+    _name = "vet.fridge"
+    _description = "Heladera de vacunas"
+    _inherit = ['mail.thread']
+    _order = "name"
+
+    name = fields.Char(string="Heladera", required=True)
+    code = fields.Char(string="Código del sensor", required=True, copy=False,
+                       help="Identificador con el que el sensor o el concentrador envía las lecturas.")
+    location = fields.Char(string="Ubicación")
+    active = fields.Boolean(default=True)
+    min_temp = fields.Float(string="Mínima (°C)", default=2.0, digits=(16, 1), tracking=True)
+    max_temp = fields.Float(string="Máxima (°C)", default=8.0, digits=(16, 1), tracking=True)
+    excursion_min_minutes = fields.Integer(
+        string="Tolerancia (min)",
+        default=15,
+        tracking=True,
+        help="Minutos seguidos fuera de rango para registrar una excursión (evita alertas por abrir la puerta)."
+    )
+    vaccine_ids = fields.Many2many("animal.vaccine", "vet_fridge_vaccine_rel", "fridge_id", "vaccine_id",
+                                   string="Vacunas almacenadas")
+    last_reading_at = fields.Datetime(string="Última lectura", readonly=True, copy=False)
+    last_temperature = fields.Float(string="Última temperatura (°C)", digits=(16, 1), readonly=True, copy=False)
+    status = fields.Selection([
+        ('ok', 'En rango'),
+        ('out', 'Fuera de rango'),
+        ('offline', 'Sin lecturas'),
+    ], string="Estado", compute="_compute_status")
+    excursion_ids = fields.One2many("vet.fridge.excursion", "fridge_id", string="Excursiones")
+
+    _sql_constraints = [
+        ('code_unique', 'unique(code)', 'Ya existe una heladera con ese código de sensor.'),
+        ('range_valid', 'CHECK(min_temp < max_temp)', 'La temperatura mínima debe ser menor que la máxima.'),
+    ]
+
+    @api.depends('last_reading_at', 'last_temperature', 'min_temp', 'max_temp')
+    def _compute_status(self):
+        limit = fields.Datetime.now() - timedelta(minutes=OFFLINE_MINUTES)
+        for rec in self:
+            if not rec.last_reading_at or rec.last_reading_at < limit:
+                rec.status = 'offline'
+            elif rec.min_temp <= rec.last_temperature <= rec.max_temp:
+                rec.status = 'ok'
+            else:
+                rec.status = 'out'
+
+    def action_open_readings(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Temperaturas de %s') % self.name,
+            'res_model': 'vet.fridge.reading.hourly',
+            'view_mode': 'graph,tree',
+            'domain': [('fridge_id', '=', self.id)],
+            'context': {'search_default_flt_last_week': 1},
+        }
+
+
+class FridgeReading(models.Model):
+    """
+    Lectura cruda (heladera, instante, °C), sin columnas de auditoría. Se
+    inserta solo por SQL en lotes y se purga pasados los días de retención;
+    los gráficos de más de unas horas leen los agregados por hora.
+    """
+    _name = "vet.fridge.reading"
+    _description = "Lectura de temperatura"
+    _order = "measured_at desc"
+    _log_access = False
+
+    fridge_id = fields.Many2one("vet.fridge", string="Heladera", required=True, ondelete='cascade', readonly=True)
+    measured_at = fields.Datetime(string="Fecha/hora", required=True, readonly=True)
+    temperature = fields.Float(string="Temperatura (°C)", required=True, readonly=True)
+
+    _sql_constraints = [
+        # También es el índice de las series: (heladera, instante).
+        ('fridge_time_unique', 'unique(fridge_id, measured_at)', 'Ya existe una lectura de la heladera en ese instante.'),
+    ]
+
+    @api.model
+    def ingest(self, series):
+        """
+        Inserta lecturas::
+
+            [{'fridge': 'HEL-01', 'points': [['2024-05-02T10:00:00Z', 4.2], ...]}, ...]
+
+        (o 'fridge_id' en lugar del código). Las fechas con zona ('Z', '-04:00')
+        se convierten a UTC; sin zona se toman como UTC, pero una serie no puede
+        mezclar ambas formas. Reenviar las mismas lecturas no las
+        duplica. Cada lote se inserta y se suma a los agregados por hora en una
+        sola sentencia; luego se buscan excursiones solo en el tramo recibido.
+        Devuelve {'inserted': n, 'excursions': [ids nuevas o ampliadas]}.
+        """
+        self.check_access_rights('create')
+        Fridge = self.env['vet.fridge']
+        codes = {serie['fridge'] for serie in series if isinstance(serie, dict) and serie.get('fridge')}
+        fridge_by_code = {fridge.code: fridge.id for fridge in Fridge.search([('code', 'in', list(codes))])} if codes else {}
+        rows = []
+        for serie in series:
+            fridge_id = serie.get('fridge_id') or fridge_by_code.get(serie.get('fridge'))
+            if not fridge_id:
+                raise UserError(_("Heladera desconocida: %s") % (serie.get('fridge') or serie.get('fridge_id')))
+            aware = set()
+            try:
+                for measured_at, temperature in serie.get('points') or []:
+                    measured_at, has_zone = to_utc(measured_at)
+                    aware.add(has_zone)
+                    rows.append((fridge_id, measured_at, float(temperature)))
+            except (TypeError, ValueError):
+                raise UserError(_("Lecturas inválidas de la heladera %s: se esperaba [[fecha UTC, °C], ...].")
+                                % (serie.get('fridge') or fridge_id))
+            if len(aware) > 1:
+                raise UserError(_("Lecturas de la heladera %s con y sin zona horaria: envíelas todas en UTC o todas "
+                                  "con su desfase.") % (serie.get('fridge') or fridge_id))
+        if not rows:
+            return {'inserted': 0, 'excursions': []}
+        fridge_ids = {row[0] for row in rows}
+        if len(Fridge.browse(fridge_ids).exists()) != len(fridge_ids):
+            raise UserError(_("Heladeras inexistentes: %s") % sorted(fridge_ids - set(Fridge.browse(fridge_ids).exists().ids)))
+
+        Fridge.flush_model(['min_temp', 'max_temp'])
+        cr = self.env.cr
+        ranges = {}
+        inserted = 0
+        for start in range(0, len(rows), INSERT_CHUNK):
+            result = execute_values(cr._obj, """
+                WITH new AS (
+                    INSERT INTO vet_fridge_reading (fridge_id, measured_at, temperature)
+                    VALUES %s
+                    ON CONFLICT (fridge_id, measured_at) DO NOTHING
+                    RETURNING fridge_id, measured_at, temperature
+                ), hourly AS (
+                    INSERT INTO vet_fridge_reading_hourly AS h
+                           (fridge_id, hour, readings, readings_out, temp_sum, temp_min, temp_max, temp_avg)
+                    SELECT n.fridge_id, date_trunc('hour', n.measured_at), count(*),
+                           count(*) FILTER (WHERE n.temperature < f.min_temp OR n.temperature > f.max_temp),
+                           sum(n.temperature), min(n.temperature), max(n.temperature), avg(n.temperature)
+                      FROM new n
+                      JOIN vet_fridge f ON f.id = n.fridge_id
+                  GROUP BY n.fridge_id, date_trunc('hour', n.measured_at)
+                    ON CONFLICT (fridge_id, hour) DO UPDATE SET
+                           readings = h.readings + EXCLUDED.readings,
+                           readings_out = h.readings_out + EXCLUDED.readings_out,
+                           temp_sum = h.temp_sum + EXCLUDED.temp_sum,
+                           temp_min = least(h.temp_min, EXCLUDED.temp_min),
+                           temp_max = greatest(h.temp_max, EXCLUDED.temp_max),
+                           temp_avg = (h.temp_sum + EXCLUDED.temp_sum) / (h.readings + EXCLUDED.readings)
+                )
+                SELECT fridge_id, count(*), min(measured_at), max(measured_at),
+                       (array_agg(temperature ORDER BY measured_at DESC))[1]
+                  FROM new
+              GROUP BY fridge_id
+            """, rows[start:start + INSERT_CHUNK], template="(%s, %s::timestamp, %s)", page_size=INSERT_CHUNK, fetch=True)
+            for fridge_id, count, first, last, last_temperature in result:
+                inserted += count
+                previous = ranges.get(fridge_id)
+                if previous:
+                    first = min(first, previous[0])
+                    if last < previous[1]:
+                        last, last_temperature = previous[1], previous[2]
+                ranges[fridge_id] = (first, last, last_temperature)
+        if ranges:
+            execute_values(cr._obj, """
+                UPDATE vet_fridge f SET last_reading_at = v.last, last_temperature = v.temperature
+                  FROM (VALUES %s) AS v(id, last, temperature)
+                 WHERE f.id = v.id AND (f.last_reading_at IS NULL OR f.last_reading_at <= v.last)
+            """, [(fridge_id, last, temperature) for fridge_id, (_first, last, temperature) in ranges.items()],
+                template="(%s, %s::timestamp, %s)")
+            Fridge.invalidate_model(['last_reading_at', 'last_temperature'])
+        self.invalidate_model()
+        self.env['vet.fridge.reading.hourly'].invalidate_model()
+        excursions = self.env['vet.fridge.excursion']._detect(
+            {fridge_id: (first, last) for fridge_id, (first, last, _t) in ranges.items()}
+        )
+        return {'inserted': inserted, 'excursions': excursions.ids}
+
+    @api.model
+    def get_series(self, fridge_id, date_from=None, date_to=None, points=DEFAULT_POINTS):
+        """
+        Serie reducida a ~`points` intervalos: [{'t', 'avg', 'min', 'max', 'n'}].
+        Con intervalos de una hora o más se lee de los agregados por hora (rango
+        de meses sin recorrer lecturas crudas); si no, de las lecturas.
+        """
+        self.check_access_rights('read')
+        date_to = date_to or fields.Datetime.now()
+        date_from = date_from or date_to - timedelta(days=1)
+        points = max(1, int(points or DEFAULT_POINTS))
+        bucket = max(60, math.ceil((date_to - date_from).total_seconds() / points))
+        self.flush_model()
+        cr = self.env.cr
+        if bucket >= 3600:
+            bucket -= bucket % 3600
+            cr.execute("""
+                SELECT to_timestamp(floor(extract(epoch FROM hour) / %s) * %s) AT TIME ZONE 'UTC' AS t,
+                       sum(temp_sum) / sum(readings), min(temp_min), max(temp_max), sum(readings)
+                  FROM vet_fridge_reading_hourly
+                 WHERE fridge_id = %s AND hour >= date_trunc('hour', %s::timestamp) AND hour <= %s
+              GROUP BY t
+              ORDER BY t
+            """, [bucket, bucket, fridge_id, date_from, date_to])
+        else:
+            cr.execute("""
+                SELECT to_timestamp(floor(extract(epoch FROM measured_at) / %s) * %s) AT TIME ZONE 'UTC' AS t,
+                       avg(temperature), min(temperature), max(temperature), count(*)
+                  FROM vet_fridge_reading
+                 WHERE fridge_id = %s AND measured_at >= %s AND measured_at <= %s
+              GROUP BY t
+              ORDER BY t
+            """, [bucket, bucket, fridge_id, date_from, date_to])
+        return [
+            {'t': t.isoformat(), 'avg': avg, 'min': low, 'max': high, 'n': n}
+            for t, avg, low, high, n in cr.fetchall()
+        ]
+
+    @api.model
+    def _cron_purge_readings(self):
+        """Borra las lecturas crudas más antiguas que la retención; los agregados por hora se conservan."""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(RAW_RETENTION_PARAM) or DEFAULT_RAW_RETENTION_DAYS)
+        self.env.cr.execute("DELETE FROM vet_fridge_reading WHERE measured_at < %s",
+                            [fields.Datetime.now() - timedelta(days=days)])
+        _logger.info("vet.fridge.reading: %s lecturas de más de %s días eliminadas", self.env.cr.rowcount, days)
+        self.invalidate_model()
+
+
+class FridgeReadingHourly(models.Model):
+    """Resumen por (heladera, hora) que se actualiza al insertar las lecturas."""
+    _name = "vet.fridge.reading.hourly"
+    _description = "Temperatura por hora"
+    _order = "hour desc"
+    _log_access = False
+    _rec_name = "hour"
+
+    fridge_id = fields.Many2one("vet.fridge", string="Heladera", required=True, ondelete='cascade', readonly=True)
+    hour = fields.Datetime(string="Hora", required=True, readonly=True)
+    readings = fields.Integer(string="Lecturas", readonly=True)
+    readings_out = fields.Integer(string="Lecturas fuera de rango", readonly=True,
+                                  help="Según los límites vigentes al recibir cada lectura.")
+    temp_sum = fields.Float(string="Suma (°C)", readonly=True)
+    temp_min = fields.Float(string="Mínima (°C)", digits=(16, 1), readonly=True, group_operator='min')
+    temp_max = fields.Float(string="Máxima (°C)", digits=(16, 1), readonly=True, group_operator='max')
+    temp_avg = fields.Float(string="Media (°C)", digits=(16, 1), readonly=True, group_operator='avg')
+
+    _sql_constraints = [
+        ('fridge_hour_unique', 'unique(fridge_id, hour)', 'Ya existe el resumen de esa hora.'),
+    ]
+
+
+class FridgeExcursion(models.Model):
+    """
+    Tramo continuo de lecturas fuera de rango que superó la tolerancia de la
+    heladera. Al registrarse se marcan los lotes de las vacunas almacenadas
+    que estaban en uso, para decidir si se liberan o se descartan.
+    """
+    _name = "vet.fridge.excursion"
+    _description = "Excursión de temperatura"
+    _inherit = ['mail.thread']
+    _order = "start desc"
+    _rec_name = "fridge_id"
+
+    fridge_id = fields.Many2one("vet.fridge", string="Heladera", required=True, ondelete='cascade', index=True,
+                                readonly=True)
+    start = fields.Datetime(string="Inicio", required=True, readonly=True)
+    stop = fields.Datetime(string="Fin", required=True, readonly=True)
+    duration_minutes = fields.Integer(string="Duración (min)", compute="_compute_duration", store=True)
+    temp_min = fields.Float(string="Mínima (°C)", digits=(16, 1), readonly=True)
+    temp_max = fields.Float(string="Máxima (°C)", digits=(16, 1), readonly=True)
+    readings = fields.Integer(string="Lecturas", readonly=True)
+    kind = fields.Selection([
+        ('high', 'Temperatura alta'),
+        ('low', 'Temperatura baja'),
+    ], string="Tipo", readonly=True)
+    state = fields.Selection([
+        ('open', 'Pendiente de revisión'),
+        ('reviewed', 'Revisada'),
+    ], string="Estado", default='open', tracking=True)
+    notes = fields.Text(string="Notas")
+    lot_ids = fields.One2many("vet.fridge.excursion.lot", "excursion_id", string="Lotes afectados")
+
+    @api.depends('start', 'stop')
+    def _compute_duration(self):
+        for rec in self:
+            rec.duration_minutes = int((rec.stop - rec.start).total_seconds() // 60) if rec.start and rec.stop else 0
+
+    def action_mark_reviewed(self):
+        if self.lot_ids.filtered(lambda lot: lot.decision == 'pending'):
+            raise UserError(_("Indique si cada lote afectado se libera o se descarta antes de cerrar la excursión."))
+        self.write({'state': 'reviewed'})
+
+    @api.model
+    def _detect(self, ranges):
+        """
+        Busca tramos fuera de rango en {heladera: (desde, hasta)}, ampliados hasta
+        la lectura en rango anterior y la siguiente, con una consulta (islas de
+        lecturas consecutivas fuera de rango). Cada lectura cubre un intervalo de
+        muestreo (el menor del tramo), así que el fin es la última lectura fuera
+        de rango más ese intervalo: N lecturas por minuto duran N minutos. Crea
+        las excursiones nuevas y amplía las existentes que se solapan; devuelve
+        las afectadas.
+        """
+        if not ranges:
+            return self.browse()
+        cr = self.env.cr
+        cr.execute("""
+            WITH win AS (
+                SELECT w.fridge_id, f.min_temp, f.max_temp, f.excursion_min_minutes,
+                       coalesce((SELECT max(r.measured_at) FROM vet_fridge_reading r
+                                  WHERE r.fridge_id = w.fridge_id AND r.measured_at < w.date_from
+                                    AND r.temperature BETWEEN f.min_temp AND f.max_temp), w.date_from) AS date_from,
+                       coalesce((SELECT min(r.measured_at) FROM vet_fridge_reading r
+                                  WHERE r.fridge_id = w.fridge_id AND r.measured_at > w.date_to
+                                    AND r.temperature BETWEEN f.min_temp AND f.max_temp), w.date_to) AS date_to
+                  FROM (VALUES {values}) AS w(fridge_id, date_from, date_to)
+                  JOIN vet_fridge f ON f.id = w.fridge_id
+            ), marked AS (
+                SELECT r.fridge_id, r.measured_at, r.temperature, win.excursion_min_minutes,
+                       r.temperature > win.max_temp AS high,
+                       r.temperature NOT BETWEEN win.min_temp AND win.max_temp AS out,
+                       r.measured_at - lag(r.measured_at) OVER (PARTITION BY r.fridge_id ORDER BY r.measured_at) AS step,
+                       count(*) FILTER (WHERE r.temperature BETWEEN win.min_temp AND win.max_temp)
+                           OVER (PARTITION BY r.fridge_id ORDER BY r.measured_at) AS island
+                  FROM win
+                  JOIN vet_fridge_reading r
+                    ON r.fridge_id = win.fridge_id AND r.measured_at BETWEEN win.date_from AND win.date_to
+            )
+            SELECT fridge_id, min(measured_at), max(measured_at) + coalesce(min(step), interval '0'),
+                   min(temperature), max(temperature), count(*), bool_or(high), min(excursion_min_minutes)
+              FROM marked
+             WHERE out
+          GROUP BY fridge_id, island
+          ORDER BY fridge_id, min(measured_at)
+        """.format(values=", ".join(["(%s, %s::timestamp, %s::timestamp)"] * len(ranges))),
+            [value for fridge_id, (first, last) in ranges.items() for value in (fridge_id, first, last)])
+        runs = cr.fetchall()
+        if not runs:
+            return self.browse()
+        existing = self.search([
+            ('fridge_id', 'in', list({run[0] for run in runs})),
+            ('start', '<=', max(run[2] for run in runs)),
+            ('stop', '>=', min(run[1] for run in runs)),
+        ], order='start')
+        touched = self.browse()
+        to_create = []
+        for fridge_id, start, stop, low, high, count, is_high, min_minutes in runs:
+            match = existing.filtered(lambda rec: rec.fridge_id.id == fridge_id and rec.start <= stop and rec.stop >= start)[:1]
+            if match:
+                match.write({
+                    'start': min(match.start, start),
+                    'stop': max(match.stop, stop),
+                    'temp_min': min(match.temp_min, low),
+                    'temp_max': max(match.temp_max, high),
+                    'readings': max(match.readings, count),
+                })
+                touched |= match
+            elif (stop - start).total_seconds() >= (min_minutes or 0) * 60:
+                to_create.append({
+                    'fridge_id': fridge_id, 'start': start, 'stop': stop, 'temp_min': low, 'temp_max': high,
+                    'readings': count, 'kind': 'high' if is_high else 'low',
+                })
+        created = self.create(to_create)
+        for excursion in created:
+            excursion.fridge_id.message_post(body=_("Excursión de temperatura: %s desde %s (%.1f a %.1f °C).") % (
+                dict(self._fields['kind'].selection)[excursion.kind], excursion.start,
+                excursion.temp_min, excursion.temp_max,
+            ))
+        touched |= created
+        self.env['vet.fridge.excursion.lot']._flag(touched)
+        _logger.info("vet.fridge.excursion: %s nuevas, %s ampliadas", len(created), len(touched - created))
+        return touched
+
+
+class FridgeExcursionLot(models.Model):
+    """Lote de vacuna almacenado en la heladera durante una excursión."""
+    _name = "vet.fridge.excursion.lot"
+    _description = "Lote afectado por excursión"
+    _order = "excursion_id desc, vaccine_id, lot_number"
+    _rec_name = "lot_number"
+
+    excursion_id = fields.Many2one("vet.fridge.excursion", string="Excursión", required=True, ondelete='cascade',
+                                   readonly=True)
+    fridge_id = fields.Many2one(related="excursion_id.fridge_id", string="Heladera", store=True)
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", required=True, ondelete='cascade', readonly=True,
+                                 index=True)
+    lot_number = fields.Char(string="Lote / Serie", required=True, readonly=True)
+    lot_expiration = fields.Date(string="Vencimiento (lote)", readonly=True)
+    decision = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('released', 'Liberado'),
+        ('discarded', 'Descartado'),
+    ], string="Decisión", default='pending', required=True)
+    vaccination_ids = fields.One2many("animal.vaccination", "cold_chain_lot_id", string="Aplicaciones posteriores")
+
+    _sql_constraints = [
+        ('excursion_lot_unique', 'unique(excursion_id, vaccine_id, lot_number)', 'El lote ya está marcado en la excursión.'),
+    ]
+
+    @api.model
+    def _flag(self, excursions):
+        """
+        Marca, con una consulta, los lotes en uso de las vacunas de cada heladera
+        (aplicados hasta LOT_LOOKBACK_DAYS antes y no vencidos al inicio) y
+        vincula las aplicaciones de esos lotes desde el inicio de la excursión.
+        """
+        if not excursions:
+            return
+        self.env['animal.vaccination'].flush_model(['vaccine_id', 'lot_number', 'lot_expiration', 'date'])
+        excursions.flush_recordset(['start', 'stop', 'fridge_id'])
+        cr = self.env.cr
+        cr.execute("""
+            SELECT e.id, v.vaccine_id, v.lot_number, max(v.lot_expiration)
+              FROM vet_fridge_excursion e
+              JOIN vet_fridge_vaccine_rel rel ON rel.fridge_id = e.fridge_id
+              JOIN animal_vaccination v ON v.vaccine_id = rel.vaccine_id
+             WHERE e.id IN %s
+               AND coalesce(v.lot_number, '') <> ''
+               AND v.date >= e.start::date - %s
+               AND (v.lot_expiration IS NULL OR v.lot_expiration >= e.start::date)
+               AND NOT EXISTS (SELECT 1 FROM vet_fridge_excursion_lot l
+                                WHERE l.excursion_id = e.id AND l.vaccine_id = v.vaccine_id
+                                  AND l.lot_number = v.lot_number)
+          GROUP BY e.id, v.vaccine_id, v.lot_number
+        """, [tuple(excursions.ids), LOT_LOOKBACK_DAYS])
+        self.create([
+            {'excursion_id': excursion_id, 'vaccine_id': vaccine_id, 'lot_number': lot_number,
+             'lot_expiration': expiration}
+            for excursion_id, vaccine_id, lot_number, expiration in cr.fetchall()
+        ])
+        self._link_vaccinations([('e.id IN %s', tuple(excursions.ids))])
+
+    @api.model
+    def _link_vaccinations(self, conditions):
+        """Vincula al lote marcado las aplicaciones de ese lote posteriores al inicio de la excursión."""
+        self.flush_model()
+        self.env['animal.vaccination'].flush_model(['vaccine_id', 'lot_number', 'date', 'cold_chain_lot_id'])
+        where = " AND ".join(condition for condition, _param in conditions)
+        self.env.cr.execute("""
+            UPDATE animal_vaccination v SET cold_chain_lot_id = l.id
+              FROM vet_fridge_excursion_lot l
+              JOIN vet_fridge_excursion e ON e.id = l.excursion_id
+             WHERE v.vaccine_id = l.vaccine_id AND v.lot_number = l.lot_number AND v.date >= e.start::date
+               AND v.cold_chain_lot_id IS NULL AND {where}
+         RETURNING v.id
+        """.format(where=where), [param for _condition, param in conditions])
+        linked = [row[0] for row in self.env.cr.fetchall()]
+        self.env['animal.vaccination'].browse(linked).invalidate_recordset(['cold_chain_lot_id'])
+        return linked
+
+
+class Vaccine(models.Model):
+    _inherit = "animal.vaccine"
+
+    fridge_ids = fields.Many2many("vet.fridge", "vet_fridge_vaccine_rel", "vaccine_id", "fridge_id",
+                                  string="Heladeras")
+
+
+class Vaccination(models.Model):
+    _inherit = "animal.vaccination"
+
+    cold_chain_lot_id = fields.Many2one(
+        "vet.fridge.excursion.lot",
+        string="Lote con excursión",
+        readonly=True,
+        copy=False,
+        ondelete='set null',
+        index='btree_not_null',
+        help="El lote aplicado estuvo en una heladera durante una excursión de temperatura."
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._check_cold_chain()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'vaccine_id', 'lot_number', 'date'} & set(vals):
+            self._check_cold_chain()
+        return res
+
+    def _check_cold_chain(self):
+        """Vincula las aplicaciones de lotes marcados y rechaza los lotes descartados."""
+        records = self.filtered('lot_number')
+        if not records:
+            return
+        self.env['vet.fridge.excursion.lot']._link_vaccinations([('v.id IN %s', tuple(records.ids))])
+        discarded = records.cold_chain_lot_id.filtered(lambda lot: lot.decision == 'discarded')
+        if discarded:
+            raise ValidationError(_("Lotes descartados por excursión de temperatura: %s")
+                                  % ", ".join("%s (%s)" % (lot.lot_number, lot.vaccine_id.name) for lot in discarded))
@@ -0,0 +1,65 @@
+import psycopg2
+from psycopg2 import errorcodes
+
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+# Errores de PostgreSQL que indican que otra transacción tomó o cambió las filas.
+CONFLICT_CODES = (errorcodes.LOCK_NOT_AVAILABLE, errorcodes.SERIALIZATION_FAILURE)
+
+
+class ConcurrentUpdateError(UserError):
+    """Otro usuario cambió el estado del registro entre la lectura y la transición."""
+
+
+class OptimisticLockMixin(models.AbstractModel):
+    """
+    Control de concurrencia para transiciones de estado: `version` aumenta en
+    cada transición y `_claim` la reclama con un UPDATE condicional (estado y,
+    opcionalmente, versión esperada) sobre filas bloqueadas sin espera. Quien
+    pierde la carrera recibe ConcurrentUpdateError antes de crear nada.
+    """
+    _name = "vet.optimistic.lock.mixin"
+    _description = "Bloqueo optimista de transiciones"
+
+    version = fields.Integer(
+        string="Versión",
+        default=1,
+        required=True,
+        readonly=True,
+        copy=False,
+        help="Aumenta con cada cambio de estado; los clientes la envían para detectar datos desactualizados."
+    )
+
+    def _claim(self, states, versions=None):
+        """
+        Reserva `self` para una transición desde `states`. `versions` ({id:
+        versión}) es la versión que vio el cliente; si otro usuario hizo una
+        transición después, se rechaza. Devuelve {id: nueva versión}.
+        """
+        if not self:
+            return {}
+        self.flush_recordset(['state', 'version'])
+        cr = self.env.cr
+        where = 'id IN %s AND state IN %s'
+        params = [tuple(self.ids), tuple(states)]
+        if versions:
+            # Solo se exige versión a los registros para los que el cliente la envió.
+            where += ' AND (id NOT IN %s OR (id, version) IN %s)'
+            params += [tuple(versions), tuple(versions.items())]
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute('SELECT id FROM "%s" WHERE id IN %%s FOR NO KEY UPDATE NOWAIT' % self._table, [tuple(self.ids)])
+                cr.execute('UPDATE "%s" SET version = version + 1 WHERE %s RETURNING id, version' % (self._table, where), params)
+                claimed = dict(cr.fetchall())
+        except psycopg2.OperationalError as e:
+            if e.pgcode not in CONFLICT_CODES:
+                raise
+            raise ConcurrentUpdateError(_("Otro usuario está modificando %s en este momento; actualice y vuelva a intentarlo.")
+                                        % ", ".join(self.mapped('display_name')))
+        self.invalidate_recordset(['state', 'version'])
+        lost = self.filtered(lambda rec: rec.id not in claimed)
+        if lost:
+            raise ConcurrentUpdateError(_("Otro usuario ya cambió el estado de %s; actualice y vuelva a intentarlo.")
+                                        % ", ".join(lost.mapped('display_name')))
+        return claimed
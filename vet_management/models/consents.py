@@ -4,8 +4,10 @@ from odoo import models, fields, api
 class Consent(models.Model):
     _name = "animal.consent"
     _description = "Consentimientos informados"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.document.cache.mixin']
     _order = "date desc, sequence desc"
+    _document_cache_report = 'vet_management.action_report_consent'
+    _document_cache_depends = ('animal_id', 'owner_id', 'specie_id', 'breed_id')
 
     # Identificador / referencia
     sequence = fields.Char(
@@ -100,20 +102,41 @@ class Consent(models.Model):
     def create(self, vals):
         if vals.get('sequence', 'Nuevo') == 'Nuevo':
             vals['sequence'] = self.env['ir.sequence'].next_by_code('animal.consent.sequence') or 'Nuevo'
-        return super(Consent, self).create(vals)
+        records = super(Consent, self).create(vals)
+        self.env['vet.patient.context']._invalidate(records.animal_id.ids)
+        return records
+
+    def write(self, vals):
+        animal_ids = self.animal_id.ids
+        res = super().write(vals)
+        self.env['vet.patient.context']._invalidate(set(animal_ids) | set(self.animal_id.ids))
+        return res
+
+    def unlink(self):
+        animal_ids = self.animal_id.ids
+        res = super().unlink()
+        self.env['vet.patient.context']._invalidate(animal_ids)
+        return res
 
     @api.onchange('animal_id')
     def _onchange_animal_id_set_doctor(self):
         """
         Si el animal tiene 'médico tratante', sugerirlo como doctor_name.
         """
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor_name:
-                rec.doctor_name = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor_name:
+                rec.doctor_name = patient['treating_doctor']
+
+    def _document_cache_is_final(self):
+        self.ensure_one()
+        return self.state == 'signed'
 
     # Acciones de estado
     def action_confirm(self):
         self.write({'state': 'signed'})
+        self._document_cache_warm()
         return True
 
     def action_cancel(self):
@@ -0,0 +1,359 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+SEVERITIES = [
+    ("low", "Leve"),
+    ("medium", "Moderada"),
+    ("high", "Grave"),
+]
+# Alergias sin severidad se tratan como moderadas (advierten, no bloquean).
+DEFAULT_SEVERITY = 'medium'
+# A partir de esta severidad el consumo se bloquea; por debajo solo se advierte.
+BLOCKING_SEVERITIES = ('high',)
+
+# Campos de la alergia que cambian qué medicamentos quedan contraindicados.
+ALLERGY_INDEX_FIELDS = {'animal_ids', 'medicine_ids', 'ingredient_ids', 'severity'}
+
+
+class MedicineIngredient(models.Model):
+    _name = "animal.medicine.ingredient"
+    _description = "Principio activo"
+    _order = "name"
+
+    name = fields.Char(string="Principio activo", required=True)
+    active = fields.Boolean(default=True)
+    medicine_ids = fields.Many2many(
+        "animal.medicine",
+        "animal_medicine_ingredient_rel",
+        "ingredient_id",
+        "medicine_id",
+        string="Medicamentos"
+    )
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', 'El principio activo ya existe.'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records.medicine_ids:
+            self.env['animal.contraindication']._refresh(medicine_ids=records.medicine_ids.ids)
+        return records
+
+    def write(self, vals):
+        medicine_ids = set(self.medicine_ids.ids)
+        res = super().write(vals)
+        if 'medicine_ids' in vals:
+            self.env['animal.contraindication']._refresh(medicine_ids=list(medicine_ids | set(self.medicine_ids.ids)))
+        return res
+
+    def unlink(self):
+        medicine_ids = self.medicine_ids.ids
+        res = super().unlink()
+        if medicine_ids:
+            self.env['animal.contraindication']._refresh(medicine_ids=medicine_ids)
+        return res
+
+
+class Medicine(models.Model):
+    _inherit = "animal.medicine"
+
+    ingredient_ids = fields.Many2many(
+        "animal.medicine.ingredient",
+        "animal_medicine_ingredient_rel",
+        "medicine_id",
+        "ingredient_id",
+        string="Principios activos"
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records.ingredient_ids:
+            self.env['animal.contraindication']._refresh(medicine_ids=records.filtered('ingredient_ids').ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'ingredient_ids' in vals:
+            self.env['animal.contraindication']._refresh(medicine_ids=self.ids)
+        return res
+
+
+class Allergy(models.Model):
+    _inherit = "animal.allergy"
+
+    medicine_ids = fields.Many2many(
+        "animal.medicine",
+        "animal_allergy_medicine_rel",
+        "allergy_id",
+        "medicine_id",
+        string="Medicamentos contraindicados"
+    )
+    ingredient_ids = fields.Many2many(
+        "animal.medicine.ingredient",
+        "animal_allergy_ingredient_rel",
+        "allergy_id",
+        "ingredient_id",
+        string="Principios activos contraindicados",
+        help="Todo medicamento con alguno de estos principios activos queda contraindicado."
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._refresh_animals(records.animal_ids.ids)
+        return records
+
+    def write(self, vals):
+        animal_ids = set(self.animal_ids.ids)
+        res = super().write(vals)
+        if ALLERGY_INDEX_FIELDS & set(vals):
+            self._refresh_animals(animal_ids | set(self.animal_ids.ids))
+        return res
+
+    def unlink(self):
+        animal_ids = self.animal_ids.ids
+        res = super().unlink()
+        self._refresh_animals(animal_ids)
+        return res
+
+    @api.model
+    def _refresh_animals(self, animal_ids):
+        if animal_ids:
+            self.env['animal.contraindication']._refresh(animal_ids=list(animal_ids))
+            self.env['vet.patient.context']._invalidate(animal_ids)
+
+
+class Animal(models.Model):
+    _inherit = "animal"
+
+    contraindication_ids = fields.One2many("animal.contraindication", "animal_id", string="Contraindicaciones")
+
+    @api.model
+    def create(self, vals):
+        record = super().create(vals)
+        if vals.get('allergies'):
+            self.env['animal.contraindication']._refresh(animal_ids=record.ids)
+        return record
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'allergies' in vals:
+            self.env['animal.contraindication']._refresh(animal_ids=self.ids)
+        return res
+
+    def _merge_into(self, target):
+        target = super()._merge_into(target)
+        self.env['animal.contraindication']._refresh(animal_ids=target.ids)
+        return target
+
+
+class Contraindication(models.Model):
+    """
+    Índice precalculado de medicamentos contraindicados por animal: una fila
+    por (animal, medicamento) con la alergia más grave que lo causa, ya sea por
+    el medicamento o por uno de sus principios activos. Se recalcula solo para
+    los animales/medicamentos afectados cuando cambian alergias o principios
+    activos, de modo que validar un consumo es una búsqueda por clave.
+    """
+    _name = "animal.contraindication"
+    _description = "Contraindicación por alergia"
+    _order = "animal_id, medicine_id"
+    _log_access = False
+
+    animal_id = fields.Many2one("animal", string="Animal", required=True, ondelete='cascade', readonly=True)
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", required=True, ondelete='cascade',
+                                  readonly=True, index=True)
+    allergy_id = fields.Many2one("animal.allergy", string="Alergia", required=True, ondelete='cascade', readonly=True)
+    severity = fields.Selection(SEVERITIES, string="Severidad", required=True, readonly=True)
+
+    _sql_constraints = [
+        ('animal_medicine_unique', 'unique(animal_id, medicine_id)',
+         'El medicamento ya está contraindicado para el animal.'),
+    ]
+
+    @api.model
+    def _refresh(self, animal_ids=None, medicine_ids=None):
+        """Recalcula las filas de los animales y/o medicamentos dados (todo el índice si no se indica ninguno)."""
+        self.env['animal'].flush_model(['allergies'])
+        self.env['animal.allergy'].flush_model(['severity', 'medicine_ids', 'ingredient_ids', 'animal_ids'])
+        self.env['animal.medicine'].flush_model(['ingredient_ids'])
+        where, params = ["TRUE"], []
+        if animal_ids:
+            where.append("animal_id IN %s")
+            params.append(tuple(animal_ids))
+        if medicine_ids:
+            where.append("medicine_id IN %s")
+            params.append(tuple(medicine_ids))
+        where = " AND ".join(where)
+        cr = self.env.cr
+        cr.execute("DELETE FROM animal_contraindication WHERE " + where, params)
+        cr.execute("""
+            INSERT INTO animal_contraindication (animal_id, medicine_id, allergy_id, severity)
+            SELECT DISTINCT ON (animal_id, medicine_id) animal_id, medicine_id, allergy_id, severity
+              FROM (
+                  SELECT rel.animal_id, m.medicine_id, al.id AS allergy_id,
+                         coalesce(al.severity, %s) AS severity
+                    FROM animal_allergy_rel rel
+                    JOIN animal_allergy al ON al.id = rel.animal_allergy_id
+                    JOIN (
+                        SELECT allergy_id, medicine_id FROM animal_allergy_medicine_rel
+                         UNION
+                        SELECT ai.allergy_id, mi.medicine_id
+                          FROM animal_allergy_ingredient_rel ai
+                          JOIN animal_medicine_ingredient_rel mi ON mi.ingredient_id = ai.ingredient_id
+                    ) m ON m.allergy_id = al.id
+              ) candidates
+             WHERE {where}
+          ORDER BY animal_id, medicine_id,
+                   CASE severity WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END DESC, allergy_id
+        """.format(where=where), [DEFAULT_SEVERITY] + params)
+        self.invalidate_model()
+
+    @api.model
+    def _lookup(self, pairs):
+        """{(animal_id, medicine_id): (severidad, alergia)} de los pares contraindicados; una consulta por lote."""
+        pairs = {(animal_id, medicine_id) for animal_id, medicine_id in pairs if animal_id and medicine_id}
+        if not pairs:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT c.animal_id, c.medicine_id, c.severity, al.name
+              FROM animal_contraindication c
+              JOIN animal_allergy al ON al.id = c.allergy_id
+             WHERE (c.animal_id, c.medicine_id) IN %s
+        """, [tuple(pairs)])
+        return {(animal_id, medicine_id): (severity, name) for animal_id, medicine_id, severity, name in self.env.cr.fetchall()}
+
+
+class ContraindicationMixin(models.AbstractModel):
+    """
+    Valida los consumos de medicamentos contra el índice de contraindicaciones:
+    bloquea las alergias graves al crear/modificar (una consulta por lote) y
+    advierte de las demás al elegir el medicamento en el formulario.
+    `_contraindication_animal` es la ruta al animal desde el registro.
+    """
+    _name = "vet.contraindication.mixin"
+    _description = "Control de contraindicaciones por alergia"
+    _contraindication_animal = 'animal_id'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._check_contraindications()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'medicine_id', self._contraindication_animal.split('.')[0]} & set(vals):
+            self._check_contraindications()
+        return res
+
+    def _contraindication_pairs(self):
+        """{registro: (animal_id, medicine_id)}; la ruta al animal se lee una vez por tramo para todo el lote."""
+        names = self._contraindication_animal.split('.')
+        rows = self.read([names[0], 'medicine_id'], load=None)
+        targets = {row['id']: row[names[0]] for row in rows}
+        model = self.env[self._fields[names[0]].comodel_name]
+        for name in names[1:]:
+            ids = {target for target in targets.values() if target}
+            values = {row['id']: row[name] for row in model.browse(ids).read([name], load=None)}
+            targets = {rec_id: values.get(target) for rec_id, target in targets.items()}
+            model = self.env[model._fields[name].comodel_name]
+        return {
+            self.browse(row['id']): (targets[row['id']] or False, row['medicine_id'] or False)
+            for row in rows
+        }
+
+    def _check_contraindications(self):
+        if self.env.context.get('vet_skip_contraindications'):
+            return
+        pairs = self._contraindication_pairs()
+        found = self.env['animal.contraindication']._lookup(pairs.values())
+        blocked = {
+            pair: found[pair] for pair in pairs.values()
+            if pair in found and found[pair][0] in BLOCKING_SEVERITIES
+        }
+        if blocked:
+            animals = {a.id: a.name for a in self.env['animal'].browse({pair[0] for pair in blocked})}
+            medicines = {m.id: m.name for m in self.env['animal.medicine'].browse({pair[1] for pair in blocked})}
+            raise UserError(_("Medicamentos contraindicados por alergia grave:\n%s") % "\n".join(
+                "- %s: %s (alergia: %s)" % (animals[animal_id], medicines[medicine_id], allergy)
+                for (animal_id, medicine_id), (_severity, allergy) in sorted(blocked.items())
+            ))
+
+    @api.onchange('medicine_id')
+    def _onchange_medicine_id_contraindication(self):
+        for rec in self:
+            animal = rec.mapped(self._contraindication_animal)
+            if not animal or not rec.medicine_id:
+                continue
+            pair = (animal._origin.id, rec.medicine_id._origin.id)
+            found = self.env['animal.contraindication']._lookup([pair]).get(pair)
+            if found:
+                severity, allergy = found
+                return {'warning': {
+                    'title': _("Contraindicación"),
+                    'message': _("%s tiene alergia %s a %s (%s).%s") % (
+                        animal.name, dict(SEVERITIES)[severity].lower(), rec.medicine_id.name, allergy,
+                        _(" No se podrá guardar.") if severity in BLOCKING_SEVERITIES else "",
+                    ),
+                }}
+
+
+class ContraindicationParentMixin(models.AbstractModel):
+    """
+    Documento cuyas líneas consumen medicamentos: al cambiar su animal se
+    revalidan las líneas. `_contraindication_lines` es el One2many de líneas.
+    """
+    _name = "vet.contraindication.parent.mixin"
+    _description = "Revalidación de contraindicaciones al cambiar el animal"
+    _contraindication_lines = None
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'animal_id' in vals:
+            self.mapped(self._contraindication_lines)._check_contraindications()
+        return res
+
+
+class Medication(models.Model):
+    _name = "animal.medication"
+    _inherit = ["animal.medication", "vet.contraindication.mixin"]
+
+
+class SurgeryMedicationLine(models.Model):
+    _name = "animal.surgery.medication.line"
+    _inherit = ["animal.surgery.medication.line", "vet.contraindication.mixin"]
+    _contraindication_animal = 'surgery_record_id.animal_id'
+
+
+class PrescriptionLine(models.Model):
+    _name = "animal.prescription.line"
+    _inherit = ["animal.prescription.line", "vet.contraindication.mixin"]
+    _contraindication_animal = 'prescription_id.animal_id'
+
+
+class HospitalizationTreatment(models.Model):
+    _name = "animal.hospitalization.treatment"
+    _inherit = ["animal.hospitalization.treatment", "vet.contraindication.mixin"]
+
+
+class SurgeryRecord(models.Model):
+    _name = "animal.surgery.record"
+    _inherit = ["animal.surgery.record", "vet.contraindication.parent.mixin"]
+    _contraindication_lines = 'medication_line_ids'
+
+
+class Prescription(models.Model):
+    _name = "animal.prescription"
+    _inherit = ["animal.prescription", "vet.contraindication.parent.mixin"]
+    _contraindication_lines = 'line_ids'
+
+
+class Hospitalization(models.Model):
+    _name = "animal.hospitalization"
+    _inherit = ["animal.hospitalization", "vet.contraindication.parent.mixin"]
+    _contraindication_lines = 'treatment_ids'
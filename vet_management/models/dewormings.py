@@ -1,3 +1,7 @@
+import math
+from collections import defaultdict
+from datetime import datetime, time
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -5,6 +9,11 @@ from odoo.exceptions import UserError
 class Dewormer(models.Model):
     _name = "animal.dewormer"
     _description = "Catálogo de desparasitantes (antiparasitarios)"
+    _inherit = ['vet.sync.mixin', 'vet.stock.product.mixin']
+    _stock_product_type = 'dewormer'
+    _stock_total_field = 'stock_total_units'
+    _stock_loose_field = 'stock_units'
+    _stock_fields = ('stock_boxes', 'stock_packs', 'stock_units', 'packs_per_box', 'units_per_pack')
 
     # === Datos básicos ===
     name = fields.Char(string="Desparasitante", required=True)
@@ -38,6 +47,7 @@ class Dewormer(models.Model):
         store=True,
         help="Total de unidades considerando cajas, packs y sueltas.",
     )
+    quant_ids = fields.One2many("vet.stock.quant", "dewormer_id", string="Stock por ubicación")
 
     @api.depends('stock_boxes', 'stock_packs', 'stock_units', 'packs_per_box', 'units_per_pack')
     def _compute_stock_total_units(self):
@@ -94,38 +104,46 @@ class Dewormer(models.Model):
         self.stock_boxes -= how_many_boxes
         self.stock_packs += int(how_many_boxes) * int(self.packs_per_box or 0)
 
-    def _consume_units(self, units):
-        """Consume 'units' unidades del stock, fraccionando según sea necesario."""
+    def _consume_units(self, units, location=None):
+        """Consume 'units' unidades del stock de `location`, fraccionando según sea necesario."""
         self.ensure_one()
         if not units or units <= 0:
             return
 
         self._ensure_enough_units(units)
+        self._stock_post(-units, location)
+        self = self.with_context(vet_stock_engine=True)
 
+        # Se calcula de una vez cuántos packs (y cajas) abrir, en vez de uno por uno.
         deficit = units - (self.stock_units or 0.0)
-        while deficit > 0:
-            if (self.stock_packs or 0) > 0:
-                self._break_pack_to_units(1)
-            elif (self.stock_boxes or 0) > 0:
-                self._break_box_to_packs(1)
-            else:
+        if deficit > 0:
+            upp = float(self.units_per_pack or 0.0)
+            ppb = int(self.packs_per_box or 0)
+            if upp <= 0:
                 raise UserError(_("No hay stock suficiente para fraccionar en unidades."))
-            deficit = units - (self.stock_units or 0.0)
+            packs_needed = int(math.ceil(deficit / upp))
+            missing_packs = packs_needed - (self.stock_packs or 0)
+            if missing_packs > 0:
+                if ppb < 1:
+                    raise UserError(_("No hay stock suficiente para fraccionar en unidades."))
+                self._break_box_to_packs(int(math.ceil(missing_packs / ppb)))
+            self._break_pack_to_units(packs_needed)
 
         self.stock_units -= units
 
-    def _revert_units(self, units):
+    def _revert_units(self, units, location=None):
         """Devuelve 'units' al stock como unidades sueltas."""
         self.ensure_one()
         if not units or units <= 0:
             return
-        self.stock_units += units
+        self._stock_post(units, location, 'return')
+        self.with_context(vet_stock_engine=True).stock_units += units
 
 
 class Deworming(models.Model):
     _name = "animal.deworming"
     _description = "Registro de desparasitación por animal"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.sync.mixin', 'vet.stock.consumer.mixin']
     _order = "date desc, id desc"
 
     # Enlaces
@@ -176,6 +194,9 @@ class Deworming(models.Model):
         help="Si está activado, al guardar se descuenta 'Cantidad (unidades)' del stock del desparasitante.",
     )
 
+    # Identificador generado por el dispositivo offline (sincronización idempotente)
+    sync_uuid = fields.Char(string="UUID sincronización", copy=False, readonly=True, index=True)
+
     # Auxiliares de lectura
     owner_id = fields.Many2one(
         related="animal_id.owner",
@@ -193,9 +214,11 @@ class Deworming(models.Model):
     @api.onchange('animal_id')
     def _onchange_animal_id_prefill_doctor(self):
         """Si el animal tiene 'médico tratante', proponerlo como doctor."""
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor:
-                rec.doctor = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor:
+                rec.doctor = patient['treating_doctor']
 
     def name_get(self):
         res = []
@@ -218,23 +241,47 @@ class Deworming(models.Model):
             'CHECK(quantity_units >= 0)',
             'La cantidad (unidades) debe ser mayor o igual a 0.',
         ),
+        ('unique_sync_uuid', 'unique(sync_uuid)', 'El UUID de sincronización ya existe.'),
     ]
 
     # === Movimiento de stock ===
-    @api.model
-    def create(self, vals):
-        records = super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Un solo descuento por desparasitante y ubicación con el total del lote
+        units_by_dewormer = defaultdict(float)
         for rec in records:
             if rec.consume_stock and rec.dewormer_id and rec.quantity_units:
-                rec.dewormer_id._consume_units(rec.quantity_units)
+                units_by_dewormer[rec.dewormer_id, rec.stock_location_id] += rec.quantity_units
+        for (dewormer, location), units in units_by_dewormer.items():
+            dewormer._consume_units(units, location)
         return records
 
+    @api.model
+    def create_campaign(self, dewormer, animals, date, values=None):
+        """
+        Desparasitación masiva: un solo create (sin seguimiento de chatter) y un
+        solo descuento de stock. `date` es una fecha; se registra a mediodía
+        para no cambiar de día al mostrarla en hora local.
+        """
+        date = datetime.combine(fields.Date.to_date(date), time(12, 0))
+        already = self.search([
+            ('animal_id', 'in', animals.ids),
+            ('dewormer_id', '=', dewormer.id),
+            ('date', '=', date),
+        ]).animal_id
+        values = dict(values or {}, dewormer_id=dewormer.id, date=date)
+        return self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+        ).create([dict(values, animal_id=animal.id) for animal in animals - already])
+
     def write(self, vals):
         before = {
             rec.id: {
                 'dewormer_id': rec.dewormer_id.id,
                 'quantity_units': float(rec.quantity_units or 0.0),
                 'consume_stock': bool(rec.consume_stock),
+                'stock_location_id': rec.stock_location_id,
             }
             for rec in self
         }
@@ -250,28 +297,30 @@ class Deworming(models.Model):
             new_dew = rec.dewormer_id
             new_qty = float(rec.quantity_units or 0.0)
             new_consume = bool(rec.consume_stock)
+            prev_loc = prev['stock_location_id']
+            new_loc = rec.stock_location_id
 
             if prev_consume and not new_consume and prev_dew and prev_qty:
-                prev_dew._revert_units(prev_qty)
+                prev_dew._revert_units(prev_qty, prev_loc)
             elif not prev_consume and new_consume and new_dew and new_qty:
-                new_dew._consume_units(new_qty)
+                new_dew._consume_units(new_qty, new_loc)
             elif prev_consume and new_consume:
-                if prev_dew and new_dew and prev_dew.id != new_dew.id:
+                if prev_dew and new_dew and (prev_dew.id != new_dew.id or prev_loc != new_loc):
                     if prev_qty:
-                        prev_dew._revert_units(prev_qty)
+                        prev_dew._revert_units(prev_qty, prev_loc)
                     if new_qty:
-                        new_dew._consume_units(new_qty)
+                        new_dew._consume_units(new_qty, new_loc)
                 else:
                     delta = new_qty - prev_qty
                     if delta > 0:
-                        new_dew._consume_units(delta)
+                        new_dew._consume_units(delta, new_loc)
                     elif delta < 0:
-                        new_dew._revert_units(-delta)
+                        new_dew._revert_units(-delta, new_loc)
 
         return res
 
     def unlink(self):
         for rec in self:
             if rec.consume_stock and rec.dewormer_id and rec.quantity_units:
-                rec.dewormer_id._revert_units(rec.quantity_units)
+                rec.dewormer_id._revert_units(rec.quantity_units, rec.stock_location_id)
         return super().unlink()
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval, time
+
+_logger = logging.getLogger(__name__)
+
+
+class DocumentCacheMixin(models.AbstractModel):
+    """
+    Documentos clínicos que no cambian una vez finalizados (receta emitida,
+    consentimiento firmado, certificado de vacunación).
+
+    El reporte guarda el PDF como adjunto (``attachment``/``attachment_use`` de
+    ir.actions.report) con un nombre que incluye un hash del contenido impreso:
+    los campos propios del documento y el write_date de los registros
+    relacionados que muestra (animal, dueño, productos). Las reimpresiones leen
+    el adjunto y solo se vuelve a renderizar si algo de eso cambió.
+    """
+    _name = "vet.document.cache.mixin"
+    _description = "PDF cacheado de documentos finalizados"
+
+    # xmlid del reporte que se precalcula al finalizar el documento
+    _document_cache_report = None
+    # Campos propios que imprime el reporte; vacío = todo el registro (su write_date).
+    _document_cache_fields = ()
+    # Rutas a los registros relacionados que imprime el reporte (p. ej. 'line_ids.medicine_id').
+    _document_cache_depends = ()
+
+    def _document_cache_is_final(self):
+        """Sobrescribir en cada modelo: si el documento ya no cambia."""
+        self.ensure_one()
+        return True
+
+    def _document_cache_base(self, prefix):
+        self.ensure_one()
+        reference = getattr(self, 'sequence', False) or str(self.id)
+        return '%s-%s' % (prefix, reference.replace('/', '_'))
+
+    def _document_cache_name(self, prefix):
+        """Nombre del adjunto cacheado, o False si el documento aún no es definitivo."""
+        self.ensure_one()
+        if not self._document_cache_is_final():
+            return False
+        key = hashlib.sha1(repr(self._document_cache_source()).encode()).hexdigest()[:16]
+        return '%s-%s.pdf' % (self._document_cache_base(prefix), key)
+
+    def _document_cache_source(self):
+        """Valores de los que depende el PDF: los campos impresos y el write_date de lo relacionado."""
+        self.ensure_one()
+        if self._document_cache_fields:
+            own = sorted(self.read(list(self._document_cache_fields), load=None)[0].items())
+        else:
+            own = self.write_date
+        related = [
+            (path, sorted((rec.id, rec.write_date) for rec in self.mapped(path)))
+            for path in self._document_cache_depends
+        ]
+        return self._name, self.id, own, related
+
+    def _document_cache_purge_stale(self, name):
+        """Borra los PDF cacheados de versiones anteriores del registro."""
+        self.ensure_one()
+        # Escapa los comodines de LIKE del nombre base; el hash son 16 caracteres.
+        base = name.rsplit('-', 1)[0].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('name', '=like', base + '-' + '_' * 16 + '.pdf'),
+            ('name', '!=', name),
+        ]).unlink()
+
+    def _document_cache_warm(self):
+        """
+        Renderiza y guarda el PDF al finalizar; si wkhtmltopdf falla no se bloquea
+        el flujo. No cuenta como fallo en vet.report.cache.stat.
+        """
+        if not self._document_cache_report or self.env.context.get('vet_skip_document_cache'):
+            return
+        records = self.filtered(lambda r: r._document_cache_is_final())
+        if not records:
+            return
+        try:
+            self.env['ir.actions.report'].with_context(vet_document_cache_warm=True)._render_qweb_pdf(
+                self._document_cache_report, res_ids=records.ids,
+            )
+        except UserError as e:
+            _logger.warning("No se pudo precalcular el PDF de %s: %s", records, e)
+
+
+class ReportCacheStat(models.Model):
+    _name = "vet.report.cache.stat"
+    _description = "Estadística de caché de PDF por reporte"
+    _order = "report_id"
+
+    report_id = fields.Many2one("ir.actions.report", string="Reporte", required=True, ondelete="cascade")
+    hits = fields.Integer(string="Aciertos (desde caché)", readonly=True)
+    misses = fields.Integer(string="Fallos (renderizados)", readonly=True)
+    hit_ratio = fields.Float(string="Tasa de aciertos (%)", compute="_compute_hit_ratio", digits=(16, 1))
+
+    _sql_constraints = [
+        ('report_unique', 'unique(report_id)', 'Solo una estadística por reporte.'),
+    ]
+
+    @api.depends('hits', 'misses')
+    def _compute_hit_ratio(self):
+        for stat in self:
+            total = stat.hits + stat.misses
+            stat.hit_ratio = 100.0 * stat.hits / total if total else 0.0
+
+    @api.model
+    def _register(self, report, hit):
+        """Contador atómico (UPSERT): no serializa impresiones concurrentes en el ORM."""
+        self.env.cr.execute("""
+            INSERT INTO vet_report_cache_stat (report_id, hits, misses, create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (report_id) DO UPDATE
+               SET hits = vet_report_cache_stat.hits + EXCLUDED.hits,
+                   misses = vet_report_cache_stat.misses + EXCLUDED.misses,
+                   write_date = EXCLUDED.write_date
+        """, (report.id, int(hit), int(not hit), self.env.uid, self.env.uid))
+        self.invalidate_model(['hits', 'misses'])
+
+
+class IrActionsReport(models.Model):
+    _inherit = "ir.actions.report"
+
+    def _retrieve_attachment(self, record):
+        attachment = super()._retrieve_attachment(record)
+        if (self.attachment_use and isinstance(record, self.pool['vet.document.cache.mixin'])
+                and record._document_cache_is_final()):
+            if not self.env.context.get('vet_document_cache_warm'):
+                self.env['vet.report.cache.stat']._register(self, hit=bool(attachment))
+            if not attachment:
+                name = safe_eval(self.attachment, {'object': record, 'time': time})
+                if name:
+                    record._document_cache_purge_stale(name)
+        return attachment
@@ -4,8 +4,9 @@ from odoo import models, fields, api
 class ExamOrder(models.Model):
     _name = "animal.exam.order"
     _description = "Órdenes de Exámenes"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.clinical.search.mixin']
     _order = "date desc, sequence desc"
+    _clinical_search_fields = {'results': 'B'}
 
     # Identificador / referencia
     sequence = fields.Char(
@@ -97,6 +98,9 @@ class ExamOrder(models.Model):
         string="Adjuntos"
     )
 
+    # Resultados estructurados (cargados a mano o desde los archivos del laboratorio)
+    result_ids = fields.One2many('animal.lab.result', 'order_id', string="Resultados por analito")
+
     @api.model
     def create(self, vals):
         if vals.get('sequence', 'Nuevo') == 'Nuevo':
@@ -0,0 +1,403 @@
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+_logger = logging.getLogger(__name__)
+
+# Filas por lectura del cursor de servidor (y por lote de nombres relacionados).
+CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 1048575
+
+# Historial clínico: modelo -> (campos exportados, campo fecha para filtrar o None).
+CLINICAL_DATASETS = {
+    'animal': ([
+        'identification', 'name', 'species', 'breed', 'sex', 'birthdate', 'owner', 'microchip_number',
+        'weight', 'height', 'size', 'reproductive_status', 'treating_doctor', 'insurance', 'active',
+    ], None),
+    'animal.visit': ([
+        'sequence', 'animal_id', 'date', 'doctor', 'owner', 'specie', 'consultation_reason', 'anamnesis',
+        'clinical_exam', 'prediagnoses', 'treatment', 'rp', 'follow_up',
+    ], 'date'),
+    'animal.vaccination': ([
+        'animal_id', 'vaccine_id', 'date', 'next_date', 'route', 'doctor', 'applied_doses',
+        'lot_number', 'lot_expiration', 'notes',
+    ], 'date'),
+    'animal.surgery.record': ([
+        'sequence', 'animal_id', 'surgery_id', 'date', 'duration_min', 'state', 'surgeon', 'anesthetist',
+        'asa_status', 'preop_diagnosis', 'postop_diagnosis', 'procedure_details', 'complications',
+    ], 'date'),
+    'animal.prescription': ([
+        'sequence', 'animal_id', 'date', 'doctor_name', 'diagnosis', 'rp', 'indications',
+        'duration_days', 'state',
+    ], 'date'),
+}
+
+# Estadísticas: indicador -> (modelo, campo fecha, campo de agrupación).
+STATISTICS = {
+    'Visitas por especie': ('animal.visit', 'date', 'specie'),
+    'Vacunaciones por vacuna': ('animal.vaccination', 'date', 'vaccine_id'),
+    'Desparasitaciones por producto': ('animal.deworming', 'date', 'dewormer_id'),
+    'Cirugías por tipo': ('animal.surgery.record', 'date', 'surgery_id'),
+    'Esterilizaciones por especie': ('animal.sterilization', 'date', 'specie_id'),
+    'Visitas por tramo etario': ('animal.visit', 'date', 'age_band'),
+}
+STATISTICS_HEADER = ['Indicador', 'Mes', 'Grupo', 'Cantidad']
+
+# Informe del programa de esterilización: totales por región/comuna/especie/procedimiento/sexo.
+STERILIZATION_HEADER = [
+    'Región', 'Comuna', 'Especie', 'Procedimiento', 'Sexo', 'Total', 'Éxito', 'Suspendido',
+    'Rechazado', 'Fallecido', 'Sin resultado', 'Microchip implantado',
+]
+
+
+class _ZipWriter:
+    """Un archivo por conjunto de datos dentro de un ZIP, escrito a medida que llegan las filas."""
+
+    def __init__(self, path, extension):
+        self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.extension = extension
+        self.stream = self.header = self.writer = None
+
+    def start(self, name, header):
+        self._close_stream()
+        self.stream = io.TextIOWrapper(self.zip.open('%s.%s' % (name, self.extension), 'w'), encoding='utf-8', newline='')
+        self.header = header
+        if self.extension == 'csv':
+            self.writer = csv.writer(self.stream)
+            self.writer.writerow(header)
+
+    def write_rows(self, rows):
+        if self.extension == 'csv':
+            self.writer.writerows(rows)
+        else:
+            for row in rows:
+                self.stream.write(json.dumps(dict(zip(self.header, row)), ensure_ascii=False, default=str))
+                self.stream.write('\n')
+
+    def _close_stream(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+    def close(self):
+        self._close_stream()
+        self.zip.close()
+
+
+class _XlsxWriter:
+    """Una hoja por conjunto de datos; modo `constant_memory` (se escribe fila a fila)."""
+
+    def __init__(self, path):
+        if xlsxwriter is None:
+            raise UserError(_("Falta la librería 'xlsxwriter' para exportar a Excel."))
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+        self.name = self.header = self.sheet = None
+        self.row = self.part = 0
+
+    def start(self, name, header):
+        self.name, self.header, self.part = name[:28], header, 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.part += 1
+        self.sheet = self.workbook.add_worksheet(self.name if self.part == 1 else '%s %d' % (self.name[:25], self.part))
+        self.sheet.write_row(0, 0, self.header)
+        self.row = 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.row > XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.write_row(self.row, 0, [value if isinstance(value, (int, float)) else str(value) for value in row])
+            self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+
+class VetExportJob(models.Model):
+    """
+    Exportación masiva en segundo plano. Lee con un cursor de servidor por
+    bloques y escribe el archivo a medida que avanza, sin cargar los registros
+    en memoria; los nombres relacionados (dueño, especie, vacuna...) se
+    resuelven una vez por bloque.
+
+    La lectura es SQL directo: se verifican los permisos de lectura de cada
+    modelo para el usuario que creó la exportación (el módulo no define reglas
+    de registro).
+    """
+    _name = "vet.export.job"
+    _description = "Exportación de historiales y estadísticas"
+    _order = "id desc"
+
+    name = fields.Char(string="Descripción", required=True, default=lambda self: _("Exportación %s") % fields.Date.today())
+    scope = fields.Selection([
+        ('clinical', 'Historial clínico (animales, visitas, vacunaciones, cirugías, recetas)'),
+        ('statistics', 'Estadísticas mensuales'),
+        ('sterilization', 'Programa de esterilización (por comuna, región, especie y procedimiento)'),
+    ], string="Contenido", required=True, default='clinical')
+    file_format = fields.Selection([
+        ('csv', 'CSV (ZIP)'),
+        ('jsonl', 'JSON Lines (ZIP)'),
+        ('xlsx', 'Excel (XLSX)'),
+    ], string="Formato", required=True, default='csv')
+    date_from = fields.Date(string="Desde")
+    date_to = fields.Date(string="Hasta")
+    output_path = fields.Char(
+        string="Guardar en ruta",
+        help="Ruta en el servidor para exportaciones muy grandes. Si se deja vacío, el archivo queda adjunto."
+    )
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En cola'),
+        ('running', 'En proceso'),
+        ('done', 'Terminada'),
+        ('error', 'Error'),
+    ], string="Estado", default='draft', readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string="Archivo", readonly=True, ondelete='set null')
+    row_count = fields.Integer(string="Filas", readonly=True)
+    duration = fields.Float(string="Duración (s)", readonly=True, digits=(16, 1))
+    message = fields.Text(string="Detalle", readonly=True)
+
+    # === Acciones ===
+    def action_queue(self):
+        for job in self:
+            job._check_export_access()
+        self.write({'state': 'queued', 'message': False})
+        self.env.ref('vet_management.ir_cron_vet_export_jobs').sudo()._trigger()
+        return True
+
+    def action_reset_to_draft(self):
+        self.filtered(lambda job: job.state in ('done', 'error')).write({'state': 'draft'})
+        return True
+
+    @api.model
+    def _cron_run_jobs(self, auto_commit=True):
+        """Procesa las exportaciones en cola, una por transacción."""
+        for job in self.search([('state', '=', 'queued')], order='id'):
+            job.state = 'running'
+            if auto_commit:
+                self.env.cr.commit()
+            start = time.perf_counter()
+            try:
+                job.with_user(job.create_uid)._run_export()
+                job.write({'state': 'done', 'duration': time.perf_counter() - start})
+            except Exception as e:
+                if auto_commit:
+                    self.env.cr.rollback()
+                _logger.exception("vet.export: la exportación %s falló", job.id)
+                job.write({'state': 'error', 'message': str(e), 'duration': time.perf_counter() - start})
+            if auto_commit:
+                self.env.cr.commit()
+
+    # === Exportación ===
+    def _check_export_access(self):
+        self.ensure_one()
+        model_names = {
+            'clinical': list(CLINICAL_DATASETS),
+            'statistics': [spec[0] for spec in STATISTICS.values()],
+            'sterilization': ['animal.sterilization'],
+        }[self.scope]
+        for model_name in model_names:
+            self.env[model_name].check_access_rights('read')
+        if self.output_path and not self.env.user.has_group('base.group_system'):
+            raise UserError(_("Solo un administrador puede guardar exportaciones en una ruta del servidor."))
+
+    def _run_export(self):
+        self.ensure_one()
+        self._check_export_access()
+        extension = 'xlsx' if self.file_format == 'xlsx' else 'zip'
+        if self.output_path:
+            path = self.output_path
+        else:
+            fd, path = tempfile.mkstemp(prefix='vet_export_', suffix='.' + extension)
+            os.close(fd)
+        writer = _XlsxWriter(path) if self.file_format == 'xlsx' else _ZipWriter(path, self.file_format)
+        try:
+            if self.scope == 'clinical':
+                rows = sum(self._export_model(writer, model_name) for model_name in CLINICAL_DATASETS)
+            elif self.scope == 'sterilization':
+                rows = self._export_sterilization_program(writer)
+            else:
+                rows = self._export_statistics(writer)
+        finally:
+            writer.close()
+
+        values = {'row_count': rows, 'message': False}
+        if self.output_path:
+            values['message'] = _("Archivo guardado en %s") % path
+        else:
+            try:
+                with open(path, 'rb') as f:
+                    values['attachment_id'] = self.env['ir.attachment'].create({
+                        'name': '%s.%s' % (self.name, extension),
+                        'raw': f.read(),
+                        'res_model': self._name,
+                        'res_id': self.id,
+                    }).id
+            finally:
+                os.unlink(path)
+        self.write(values)
+
+    def _export_model(self, writer, model_name):
+        """Escribe un modelo completo; devuelve el número de filas."""
+        Model = self.env[model_name]
+        field_names, date_field = CLINICAL_DATASETS[model_name]
+        model_fields = [Model._fields[name] for name in field_names]
+        Model.flush_model(field_names)
+
+        where, params = self._date_where(date_field)
+        query = 'SELECT id, %s FROM "%s" %s ORDER BY id' % (
+            ', '.join('"%s"' % name for name in field_names), Model._table, where,
+        )
+
+        writer.start(model_name.replace('.', '_'), ['id'] + [field.string for field in model_fields])
+        formatters = [self._get_formatter(field) for field in model_fields]
+        names = {}
+        count = 0
+        # Cursor con nombre = cursor de servidor: PostgreSQL entrega las filas por bloques.
+        with self.env.cr._cnx.cursor('vet_export_%s' % Model._table) as server_cursor:
+            server_cursor.itersize = CHUNK_SIZE
+            server_cursor.execute(query, params)
+            while True:
+                chunk = server_cursor.fetchmany(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._resolve_names(model_fields, chunk, names)
+                writer.write_rows([
+                    [row[0]] + [format_value(value, names) for format_value, value in zip(formatters, row[1:])]
+                    for row in chunk
+                ])
+                count += len(chunk)
+        _logger.info("vet.export: %s filas de %s", count, model_name)
+        return count
+
+    def _date_where(self, date_field):
+        """Cláusula WHERE (o '') y parámetros para el rango de fechas de la exportación."""
+        where, params = [], []
+        if date_field and self.date_from:
+            where.append('"%s" >= %%s' % date_field)
+            params.append(self.date_from)
+        if date_field and self.date_to:
+            where.append('"%s" < %%s::date + 1' % date_field)
+            params.append(self.date_to)
+        return ('WHERE ' + ' AND '.join(where) if where else ''), params
+
+    def _get_formatter(self, field):
+        if field.type == 'many2one':
+            return lambda value, names: names[field.comodel_name].get(value, '') if value else ''
+        if field.type == 'selection':
+            labels = dict(field._description_selection(self.env))
+            return lambda value, names: labels.get(value, value) if value else ''
+        if field.type in ('date', 'datetime'):
+            return lambda value, names: value.isoformat() if value else ''
+        return lambda value, names: '' if value is None else value
+
+    def _resolve_names(self, model_fields, chunk, names):
+        """Nombres de los many2one del bloque: una lectura por modelo relacionado y solo de los ids nuevos."""
+        for index, field in enumerate(model_fields, start=1):
+            if field.type != 'many2one':
+                continue
+            known = names.setdefault(field.comodel_name, {})
+            missing = {row[index] for row in chunk if row[index]} - set(known)
+            if missing:
+                Comodel = self.env[field.comodel_name].with_context(active_test=False)
+                for record in Comodel.browse(missing).read(['display_name']):
+                    known[record['id']] = record['display_name']
+        # El caché del ORM no debe crecer con la exportación; los nombres quedan en `names`.
+        self.env.invalidate_all()
+
+    def _export_statistics(self, writer):
+        """Conteos mensuales por grupo, calculados en SQL."""
+        writer.start('estadisticas', STATISTICS_HEADER)
+        count = 0
+        for label, (model_name, date_field, group_field) in STATISTICS.items():
+            Model = self.env[model_name]
+            Model.flush_model([date_field, group_field])
+            where, params = self._date_where(date_field)
+            self.env.cr.execute("""
+                SELECT date_trunc('month', "{date}")::date, "{group}", count(*)
+                  FROM "{table}" {where}
+              GROUP BY 1, 2
+              ORDER BY 1, 2
+            """.format(date=date_field, group=group_field, table=Model._table, where=where), params)
+            rows = self.env.cr.fetchall()
+            field = Model._fields[group_field]
+            if field.type == 'selection':
+                group_names = dict(field._description_selection(self.env))
+            else:
+                group_names = dict(
+                    (record['id'], record['display_name'])
+                    for record in self.env[field.comodel_name].with_context(active_test=False)
+                    .browse({row[1] for row in rows if row[1]}).read(['display_name'])
+                )
+            writer.write_rows([
+                [label, month.strftime('%Y-%m') if month else '', group_names.get(group_id, _('Sin definir')), total]
+                for month, group_id, total in rows
+            ])
+            count += len(rows)
+        return count
+
+    def _export_sterilization_program(self, writer):
+        """
+        Informe periódico del programa de esterilización: la agregación se hace
+        en PostgreSQL y las filas agregadas se leen por bloques.
+        """
+        Sterilization = self.env['animal.sterilization']
+        Sterilization.flush_model()
+        procedures = dict(Sterilization._fields['procedure_type']._description_selection(self.env))
+        sexes = dict(Sterilization._fields['sex']._description_selection(self.env))
+        undefined = _('Sin definir')
+        where, params = self._date_where('date')
+        query = """
+            SELECT coalesce(nullif(initcap(trim(resp_region)), ''), %s),
+                   coalesce(nullif(initcap(trim(resp_commune)), ''), %s),
+                   specie_id, procedure_type, sex,
+                   count(*),
+                   count(*) FILTER (WHERE status = 'exito'),
+                   count(*) FILTER (WHERE status = 'suspendido'),
+                   count(*) FILTER (WHERE status = 'rechazado'),
+                   count(*) FILTER (WHERE status = 'fallecido'),
+                   count(*) FILTER (WHERE status IS NULL),
+                   count(*) FILTER (WHERE microchip_today)
+              FROM animal_sterilization
+              {where}
+          GROUP BY 1, 2, 3, 4, 5
+          ORDER BY 1, 2, 3, 4, 5
+        """.format(where=where)
+        species = {}
+        writer.start('programa_esterilizacion', STERILIZATION_HEADER)
+        count = 0
+        with self.env.cr._cnx.cursor('vet_export_sterilization') as server_cursor:
+            server_cursor.itersize = CHUNK_SIZE
+            server_cursor.execute(query, [undefined, undefined] + params)
+            while True:
+                chunk = server_cursor.fetchmany(CHUNK_SIZE)
+                if not chunk:
+                    break
+                missing = {row[2] for row in chunk if row[2]} - set(species)
+                if missing:
+                    species.update(
+                        (record['id'], record['display_name'])
+                        for record in self.env['animal.specie'].browse(missing).read(['display_name'])
+                    )
+                writer.write_rows([
+                    [region, commune, species.get(specie_id, undefined), procedures.get(procedure, undefined),
+                     sexes.get(sex, undefined)] + list(totals)
+                    for region, commune, specie_id, procedure, sex, *totals in chunk
+                ])
+                count += len(chunk)
+        return count
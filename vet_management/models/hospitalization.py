@@ -0,0 +1,405 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Horas hacia adelante que se mantienen generadas en la ronda de sala.
+DEFAULT_HORIZON_HOURS = 24
+
+# Cambios del tratamiento que invalidan las administraciones pendientes ya generadas.
+PLAN_FIELDS = {'medicine_id', 'dose_units', 'interval_hours', 'start_datetime', 'end_datetime', 'active'}
+
+
+class Hospitalization(models.Model):
+    """Internación de un animal, con su plan de tratamientos y las administraciones generadas."""
+    _name = "animal.hospitalization"
+    _description = "Hospitalización"
+    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _order = "state, admission_datetime desc, id desc"
+
+    sequence = fields.Char(
+        string="Referencia",
+        required=True,
+        copy=False,
+        readonly=True,
+        index=True,
+        default=lambda self: 'Nuevo',
+        tracking=True
+    )
+    animal_id = fields.Many2one(
+        "animal",
+        string="Animal",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        tracking=True
+    )
+    owner_id = fields.Many2one(
+        related="animal_id.owner",
+        string="Dueño",
+        store=True,
+        readonly=True
+    )
+    surgery_record_id = fields.Many2one(
+        "animal.surgery.record",
+        string="Cirugía",
+        ondelete="set null",
+        index='btree_not_null'
+    )
+    admission_datetime = fields.Datetime(string="Ingreso", required=True, default=fields.Datetime.now, tracking=True)
+    discharge_datetime = fields.Datetime(string="Alta", tracking=True, copy=False)
+    cage = fields.Char(string="Jaula / Box", tracking=True)
+    doctor = fields.Char(string="Médico/a responsable", tracking=True)
+    reason = fields.Text(string="Motivo de hospitalización")
+    notes = fields.Text(string="Notas internas")
+    state = fields.Selection([
+        ('admitted', 'Internado'),
+        ('discharged', 'De alta'),
+        ('cancelled', 'Cancelada'),
+    ], string="Estado", default='admitted', required=True, tracking=True, index=True)
+
+    treatment_ids = fields.One2many(
+        "animal.hospitalization.treatment",
+        "hospitalization_id",
+        string="Tratamientos"
+    )
+    administration_ids = fields.One2many(
+        "animal.hospitalization.administration",
+        "hospitalization_id",
+        string="Administraciones"
+    )
+    pending_count = fields.Integer(string="Pendientes", compute="_compute_pending_count")
+
+    def _compute_pending_count(self):
+        counts = {
+            hospitalization.id: count
+            for hospitalization, count in self.env['animal.hospitalization.administration']._read_group(
+                [('hospitalization_id', 'in', self.ids), ('state', '=', 'pending')],
+                ['hospitalization_id'], ['__count'],
+            )
+        }
+        for rec in self:
+            rec.pending_count = counts.get(rec.id, 0)
+
+    @api.model
+    def create(self, vals):
+        if vals.get('sequence', 'Nuevo') == 'Nuevo':
+            vals['sequence'] = self.env['ir.sequence'].next_by_code('animal.hospitalization.sequence') or 'Nuevo'
+        return super().create(vals)
+
+    def name_get(self):
+        res = []
+        for rec in self:
+            label = rec.sequence or _("Hospitalización")
+            if rec.animal_id:
+                label = "%s - %s" % (label, rec.animal_id.name)
+            res.append((rec.id, label))
+        return res
+
+    def action_discharge(self):
+        """Da de alta: se descartan las administraciones pendientes y se registra el alta en la cirugía."""
+        now = fields.Datetime.now()
+        admitted = self.filtered(lambda rec: rec.state == 'admitted')
+        admitted.write({'state': 'discharged', 'discharge_datetime': now})
+        admitted.administration_ids.filtered(lambda adm: adm.state == 'pending').unlink()
+        for rec in admitted.filtered('surgery_record_id'):
+            rec.surgery_record_id.discharge_datetime = rec.discharge_datetime
+        return True
+
+    def action_cancel(self):
+        self.filtered(lambda rec: rec.state == 'admitted').administration_ids.filtered(
+            lambda adm: adm.state == 'pending'
+        ).unlink()
+        self.write({'state': 'cancelled'})
+        return True
+
+    def action_open_round(self):
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id('vet_management.hospitalization_round_action')
+        action['domain'] = [('hospitalization_id', '=', self.id)]
+        return action
+
+
+class HospitalizationTreatment(models.Model):
+    """
+    Indicación de tratamiento durante la internación (medicamento, dosis, cada
+    cuántas horas). Las administraciones se generan por adelantado hasta el
+    horizonte configurado; `scheduled_until` marca hasta dónde se generó, así que
+    cada ejecución del cron solo extiende los planes que se están quedando cortos.
+    """
+    _name = "animal.hospitalization.treatment"
+    _description = "Tratamiento de hospitalización"
+    _order = "hospitalization_id, start_datetime, id"
+
+    hospitalization_id = fields.Many2one(
+        "animal.hospitalization",
+        string="Hospitalización",
+        required=True,
+        ondelete="cascade",
+        index=True
+    )
+    animal_id = fields.Many2one(related="hospitalization_id.animal_id", store=True, string="Animal")
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", required=True, ondelete="restrict")
+    dose_units = fields.Float(string="Dosis (unidades)", default=1.0, help="Unidades base por administración.")
+    interval_hours = fields.Float(string="Cada (horas)", default=8.0)
+    route = fields.Selection([
+        ('oral', 'Oral'),
+        ('iv', 'Intravenosa'),
+        ('im', 'Intramuscular'),
+        ('sc', 'Subcutánea'),
+        ('topical', 'Tópica'),
+        ('other', 'Otra'),
+    ], string="Vía")
+    start_datetime = fields.Datetime(string="Inicio", required=True, default=fields.Datetime.now)
+    end_datetime = fields.Datetime(string="Fin")
+    active = fields.Boolean(default=True, help="Desactivar suspende el tratamiento y elimina las administraciones pendientes.")
+    notes = fields.Char(string="Indicaciones")
+    scheduled_until = fields.Datetime(
+        string="Generado hasta",
+        readonly=True,
+        copy=False,
+        index=True,
+        help="Hora de la última administración generada."
+    )
+
+    _sql_constraints = [
+        ('interval_positive', 'CHECK(interval_hours > 0)', 'El intervalo debe ser mayor que 0.'),
+        ('dose_non_negative', 'CHECK(dose_units >= 0)', 'La dosis debe ser mayor o igual a 0.'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._expand_schedule(self._horizon())
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PLAN_FIELDS & set(vals):
+            self._reset_schedule()
+        return res
+
+    @api.model
+    def _horizon(self):
+        hours = self.env['ir.config_parameter'].sudo().get_param(
+            'vet_management.hospitalization_horizon_hours', DEFAULT_HORIZON_HOURS
+        )
+        return fields.Datetime.now() + timedelta(hours=float(hours))
+
+    def _reset_schedule(self):
+        """Elimina las administraciones pendientes y vuelve a generar solo estos tratamientos."""
+        Administration = self.env['animal.hospitalization.administration']
+        Administration.search([('treatment_id', 'in', self.ids), ('state', '=', 'pending')]).unlink()
+        last_by_treatment = dict(Administration._read_group(
+            [('treatment_id', 'in', self.ids)], ['treatment_id'], ['scheduled_at:max'],
+        ))
+        for treatment in self:
+            treatment.scheduled_until = last_by_treatment.get(treatment) or False
+        self.filtered('active')._expand_schedule(self._horizon())
+
+    def _next_times(self, horizon):
+        """Horas de administración posteriores a `scheduled_until` y hasta el horizonte."""
+        self.ensure_one()
+        step = timedelta(hours=self.interval_hours)
+        if self.scheduled_until:
+            current = self.scheduled_until + step
+        else:
+            current = self.start_datetime
+        limit = min(horizon, self.end_datetime) if self.end_datetime else horizon
+        times = []
+        while current <= limit:
+            times.append(current)
+            current += step
+        return times
+
+    def _expand_schedule(self, horizon):
+        """
+        Genera en bloque las administraciones que faltan hasta `horizon` y avanza
+        `scheduled_until`. Una administración ya existente para la misma hora no
+        se duplica.
+        """
+        treatments = self.filtered(
+            lambda t: t.active and t.hospitalization_id.state == 'admitted' and t.interval_hours > 0
+        )
+        rows = []
+        watermarks = []
+        for treatment in treatments:
+            times = treatment._next_times(horizon)
+            if not times:
+                continue
+            rows.extend(
+                (treatment.id, treatment.hospitalization_id.id, treatment.animal_id.id, treatment.medicine_id.id,
+                 scheduled_at, treatment.dose_units)
+                for scheduled_at in times
+            )
+            watermarks.append((treatment.id, times[-1]))
+        if not rows:
+            return 0
+        Administration = self.env['animal.hospitalization.administration']
+        Administration.flush_model()
+        self.flush_model()
+        cr = self.env.cr
+        execute_values(cr._obj, """
+            INSERT INTO animal_hospitalization_administration
+                   (treatment_id, hospitalization_id, animal_id, medicine_id, scheduled_at, quantity_units,
+                    state, create_uid, write_uid, create_date, write_date)
+            SELECT v.treatment_id, v.hospitalization_id, v.animal_id, v.medicine_id, v.scheduled_at, v.quantity_units,
+                   'pending', {uid}, {uid}, now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM (VALUES %s) AS v(treatment_id, hospitalization_id, animal_id, medicine_id, scheduled_at, quantity_units)
+            ON CONFLICT (treatment_id, scheduled_at) DO NOTHING
+        """.format(uid=int(self.env.uid)), rows, template="(%s, %s, %s, %s, %s::timestamp, %s::float8)")
+        execute_values(cr._obj, """
+            UPDATE animal_hospitalization_treatment t SET scheduled_until = v.until
+              FROM (VALUES %s) AS v(id, until)
+             WHERE t.id = v.id
+        """, watermarks, template="(%s, %s::timestamp)")
+        Administration.invalidate_model()
+        self.invalidate_model(['scheduled_until'])
+        return len(rows)
+
+    @api.model
+    def _cron_expand_schedules(self):
+        """Extiende solo los tratamientos cuyo plan generado no cubre el horizonte."""
+        horizon = self._horizon()
+        treatments = self.search([
+            ('active', '=', True),
+            ('hospitalization_id.state', '=', 'admitted'),
+            '|', ('scheduled_until', '=', False), ('scheduled_until', '<', horizon),
+            '|', ('end_datetime', '=', False), ('end_datetime', '>', fields.Datetime.now()),
+        ])
+        generated = treatments._expand_schedule(horizon)
+        if generated:
+            _logger.info("hospitalización: %s administraciones generadas para %s tratamientos",
+                         generated, len(treatments))
+        return generated
+
+
+class HospitalizationAdministration(models.Model):
+    """Administración programada de un tratamiento; se confirma desde la ronda de sala."""
+    _name = "animal.hospitalization.administration"
+    _description = "Administración de tratamiento (hospitalización)"
+    _order = "scheduled_at, id"
+
+    treatment_id = fields.Many2one(
+        "animal.hospitalization.treatment",
+        string="Tratamiento",
+        required=True,
+        ondelete="cascade"
+    )
+    hospitalization_id = fields.Many2one(
+        "animal.hospitalization",
+        string="Hospitalización",
+        required=True,
+        ondelete="cascade",
+        index=True
+    )
+    animal_id = fields.Many2one("animal", string="Animal", required=True, ondelete="cascade")
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", required=True, ondelete="restrict")
+    cage = fields.Char(related="hospitalization_id.cage", string="Jaula / Box")
+    route = fields.Selection(related="treatment_id.route", string="Vía")
+    scheduled_at = fields.Datetime(string="Programada", required=True)
+    quantity_units = fields.Float(string="Cantidad (unidades)")
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Administrada'),
+        ('skipped', 'Omitida'),
+    ], string="Estado", default='pending', required=True)
+    done_datetime = fields.Datetime(string="Administrada el", readonly=True)
+    done_by = fields.Many2one("res.users", string="Administrada por", readonly=True)
+    medication_id = fields.Many2one("animal.medication", string="Medicación", readonly=True, ondelete="set null")
+    notes = fields.Char(string="Observaciones")
+
+    _sql_constraints = [
+        # También sirve de índice para buscar por tratamiento.
+        ('treatment_time_unique', 'unique(treatment_id, scheduled_at)',
+         'Ya existe una administración de este tratamiento a esa hora.'),
+    ]
+
+    def init(self):
+        # Ronda de sala: pendientes por hora.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS animal_hospitalization_administration_pending_idx
+                ON animal_hospitalization_administration (scheduled_at)
+             WHERE state = 'pending'
+        """)
+
+    def action_confirm(self):
+        """
+        Confirma en bloque las administraciones pendientes seleccionadas: el stock
+        se descuenta una vez por medicamento y las medicaciones se crean en un lote.
+        """
+        pending = self.filtered(lambda adm: adm.state == 'pending')
+        if not pending:
+            raise UserError(_("No hay administraciones pendientes seleccionadas."))
+        # Cada hospitalización descuenta de la ubicación de su médico.
+        by_doctor = self.env['vet.stock.location']._for_doctors(pending.hospitalization_id.mapped('doctor'))
+        units_by_medicine = defaultdict(float)
+        for administration in pending:
+            location_id = by_doctor[administration.hospitalization_id.doctor or False]
+            units_by_medicine[administration.medicine_id.id, location_id] += administration.quantity_units
+        self.env['animal.medicine']._consume_units_grouped(units_by_medicine)
+
+        now = fields.Datetime.now()
+        medications = self.env['animal.medication'].with_context(vet_stock_consumed=True, tracking_disable=True).create([
+            {
+                'animal_id': administration.animal_id.id,
+                'medicine_id': administration.medicine_id.id,
+                'date': now,
+                'doctor': administration.hospitalization_id.doctor,
+                'quantity_units': administration.quantity_units,
+                'consume_stock': True,
+                'stock_location_id': by_doctor[administration.hospitalization_id.doctor or False],
+                'notes': _("Hospitalización %s") % administration.hospitalization_id.sequence,
+            }
+            for administration in pending
+        ])
+        pending.write({'state': 'done', 'done_datetime': now, 'done_by': self.env.uid})
+        # Enlaza cada administración con su medicación en una sola sentencia.
+        pending.flush_recordset()
+        execute_values(self.env.cr._obj, """
+            UPDATE animal_hospitalization_administration a SET medication_id = v.medication_id
+              FROM (VALUES %s) AS v(id, medication_id)
+             WHERE a.id = v.id
+        """, list(zip(pending.ids, medications.ids)))
+        pending.invalidate_recordset(['medication_id'])
+        pending.modified(['medication_id'])
+        return True
+
+    def action_skip(self):
+        self.filtered(lambda adm: adm.state == 'pending').write({
+            'state': 'skipped',
+            'done_datetime': fields.Datetime.now(),
+            'done_by': self.env.uid,
+        })
+        return True
+
+
+class SurgeryRecord(models.Model):
+    _inherit = "animal.surgery.record"
+
+    hospitalization_ids = fields.One2many("animal.hospitalization", "surgery_record_id", string="Hospitalizaciones")
+
+    def action_hospitalize(self):
+        """Abre (o crea) la hospitalización de esta cirugía."""
+        self.ensure_one()
+        hospitalization = self.hospitalization_ids.filtered(lambda rec: rec.state == 'admitted')[:1]
+        if not hospitalization:
+            hospitalization = self.env['animal.hospitalization'].create({
+                'animal_id': self.animal_id.id,
+                'surgery_record_id': self.id,
+                'doctor': self.surgeon,
+                'reason': _("Postoperatorio %s") % self.sequence,
+            })
+            self.hospitalization = True
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'animal.hospitalization',
+            'res_id': hospitalization.id,
+            'view_mode': 'form',
+        }
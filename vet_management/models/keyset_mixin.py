@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from odoo import models, api
+from odoo.tools.sql import create_index
+
+
+def encode_cursor(write_date, res_id):
+    """Cursor opaco para (write_date, id), con microsegundos."""
+    return '%s_%d' % (write_date.isoformat(), res_id)
+
+
+def decode_cursor(token):
+    """Inversa de `encode_cursor`; lanza ValueError si el cursor no es válido."""
+    write_date, res_id = token.rsplit('_', 1)
+    return datetime.fromisoformat(write_date), int(res_id)
+
+
+class KeysetMixin(models.AbstractModel):
+    """
+    Paginación por clave (write_date, id) para integraciones.
+    A diferencia de offset/limit, el costo de cada página no crece con la
+    profundidad del recorrido y las filas modificadas entre páginas no se saltan.
+    """
+    _name = "vet.keyset.mixin"
+    _description = "Paginación por (write_date, id)"
+
+    def init(self):
+        super().init()
+        if self._abstract:
+            return
+        create_index(
+            self._cr,
+            '%s_write_date_id_index' % self._table,
+            self._table,
+            ['write_date', 'id'],
+        )
+
+    @api.model
+    def _keyset_search(self, domain=None, after=None, limit=100):
+        """
+        Devuelve [(id, write_date)] ordenados por (write_date, id) estrictamente
+        posteriores a ``after`` = (write_date, id). Respeta permisos y reglas de registro.
+        """
+        self.check_access_rights('read')
+        query = self._search(domain or [], limit=limit, order='write_date, id')
+        if after:
+            query.add_where(
+                '("%s"."write_date", "%s"."id") > (%%s, %%s)' % (self._table, self._table),
+                [after[0], after[1]],
+            )
+        self.env.cr.execute(query.select('"%s"."id"' % self._table, '"%s"."write_date"' % self._table))
+        return self.env.cr.fetchall()
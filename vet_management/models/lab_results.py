@@ -0,0 +1,441 @@
+import csv
+import io
+import logging
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import psycopg2
+import pytz
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+# Carpeta local donde el laboratorio deja sus archivos (parámetro de sistema).
+INBOX_PARAM = 'vet_management.lab_inbox_path'
+PROCESSED_DIR = 'procesados'
+ERROR_DIR = 'errores'
+FILE_FORMATS = {'.csv': 'csv', '.hl7': 'hl7', '.oru': 'hl7'}
+
+# Filas por INSERT multi-valor.
+INSERT_CHUNK = 1000
+
+# CSV con encabezado (separador ',' ';' o tabulación):
+#   orden;analito;nombre;valor;unidad;ref_min;ref_max;fecha
+# solo orden, analito y valor son obligatorias.
+CSV_REQUIRED = {'orden', 'analito', 'valor'}
+
+# Fecha/hora HL7: AAAAMMDD[HHMM[SS]][.fracción][±ZZZZ]
+HL7_DATETIME = re.compile(r'(\d{8}(?:\d{4}(?:\d{2})?)?)(?:\.\d+)?([+-]\d{4})?')
+HL7_DATETIME_PATTERNS = {8: '%Y%m%d', 12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}
+
+
+def result_flag(value, ref_low, ref_high):
+    """
+    Bajo/normal/alto según el rango de referencia (sin rango o valor no
+    numérico: sin marca). Un límite en None no se controla; 0 es un límite válido.
+    """
+    if value is None or (ref_low is None and ref_high is None):
+        return None
+    if ref_low is not None and value < ref_low:
+        return 'low'
+    if ref_high is not None and value > ref_high:
+        return 'high'
+    return 'normal'
+
+
+def parse_number(text):
+    """'1,25' o '1.25' -> 1.25; None si no es numérico ('<0.5', 'negativo')."""
+    if text is None:
+        return None
+    text = str(text).strip().replace(',', '.')
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+class LabAnalyte(models.Model):
+    _name = "animal.lab.analyte"
+    _description = "Analito de laboratorio"
+    _order = "name"
+
+    name = fields.Char(string="Analito", required=True)
+    code = fields.Char(string="Código", required=True, help="Código que usa el laboratorio en sus archivos (p. ej. CREA).")
+    unit = fields.Char(string="Unidad")
+    ref_low = fields.Float(string="Referencia mín.", digits=(16, 4))
+    ref_high = fields.Float(string="Referencia máx.", digits=(16, 4))
+    active = fields.Boolean(string="Activo", default=True)
+
+    _sql_constraints = [
+        ('code_unique', 'unique(code)', 'Ya existe un analito con este código.'),
+    ]
+
+    @api.depends('name', 'code')
+    def _compute_display_name(self):
+        for rec in self:
+            rec.display_name = "[%s] %s" % (rec.code, rec.name) if rec.code else rec.name
+
+
+class LabResult(models.Model):
+    _name = "animal.lab.result"
+    _description = "Resultado de laboratorio"
+    _order = "date desc, id"
+
+    order_id = fields.Many2one('animal.exam.order', string="Orden", required=True, ondelete='cascade', index=True)
+    animal_id = fields.Many2one(related='order_id.animal_id', string="Animal", store=True, readonly=True)
+    analyte_id = fields.Many2one('animal.lab.analyte', string="Analito", required=True, ondelete='restrict')
+    date = fields.Datetime(string="Fecha", required=True, default=fields.Datetime.now)
+    value = fields.Float(string="Valor", digits=(16, 4))
+    value_text = fields.Char(string="Valor (texto)", help="Resultado no numérico, p. ej. '<0,5' o 'Negativo'.")
+    unit = fields.Char(string="Unidad")
+    ref_low = fields.Float(string="Ref. mín.", digits=(16, 4))
+    ref_high = fields.Float(string="Ref. máx.", digits=(16, 4))
+    flag = fields.Selection([
+        ('low', 'Bajo'),
+        ('normal', 'Normal'),
+        ('high', 'Alto'),
+    ], string="Marca", compute='_compute_flag', store=True)
+    source = fields.Char(string="Archivo de origen", readonly=True)
+
+    _sql_constraints = [
+        ('order_analyte_unique', 'unique(order_id, analyte_id)', 'El analito ya tiene un resultado en esta orden.'),
+    ]
+
+    def init(self):
+        super().init()
+        # Series por paciente y analito (tendencias).
+        create_index(self._cr, 'animal_lab_result_animal_analyte_date_index', self._table, ['animal_id', 'analyte_id', 'date'])
+
+    @api.depends('value', 'value_text', 'ref_low', 'ref_high')
+    def _compute_flag(self):
+        for rec in self:
+            value = None if rec.value_text else rec.value
+            # El ORM lee NULL como 0.0: ambos en 0 es "sin rango"; si hay uno, el 0 del otro es un límite.
+            no_range = not rec.ref_low and not rec.ref_high
+            rec.flag = result_flag(value, None if no_range else rec.ref_low, None if no_range else rec.ref_high)
+
+    @api.onchange('analyte_id')
+    def _onchange_analyte_id(self):
+        for rec in self:
+            if rec.analyte_id:
+                rec.unit = rec.unit or rec.analyte_id.unit
+                rec.ref_low = rec.ref_low or rec.analyte_id.ref_low
+                rec.ref_high = rec.ref_high or rec.analyte_id.ref_high
+
+    @api.model
+    def get_trends(self, animal_id, analyte_codes=None, date_from=None, date_to=None):
+        """
+        Series de tiempo por analito de un paciente::
+
+            {código: {'name', 'unit', 'ref_low', 'ref_high',
+                      'points': [{'date', 'value', 'value_text', 'flag', 'order_id'}]}}
+
+        Una sola consulta sobre el índice (animal, analito, fecha).
+        """
+        self.check_access_rights('read')
+        domain = [('animal_id', '=', animal_id)]
+        if analyte_codes:
+            domain.append(('analyte_id.code', 'in', list(analyte_codes)))
+        if date_from:
+            domain.append(('date', '>=', date_from))
+        if date_to:
+            domain.append(('date', '<=', date_to))
+        self.flush_model()
+        query = self._search(domain)
+        table = '"%s"' % self._table
+        self.env.cr.execute(query.select(*(
+            '%s."%s"' % (table, name)
+            for name in ('analyte_id', 'date', 'value', 'value_text', 'unit', 'flag', 'order_id')
+        )))
+        rows = self.env.cr.fetchall()
+
+        analytes = {
+            analyte.id: analyte
+            for analyte in self.env['animal.lab.analyte'].with_context(active_test=False).browse({row[0] for row in rows})
+        }
+        trends = {}
+        for analyte_id, date, value, value_text, unit, flag, order_id in sorted(rows, key=lambda row: (row[0], row[1])):
+            analyte = analytes[analyte_id]
+            serie = trends.setdefault(analyte.code, {
+                'name': analyte.name,
+                'unit': unit or analyte.unit,
+                'ref_low': analyte.ref_low,
+                'ref_high': analyte.ref_high,
+                'points': [],
+            })
+            serie['points'].append({
+                'date': date.isoformat(),
+                'value': value,
+                'value_text': value_text,
+                'flag': flag,
+                'order_id': order_id,
+            })
+        return trends
+
+
+class LabImport(models.Model):
+    """
+    Ingesta de archivos del laboratorio (CSV o HL7 v2 ORU^R01).
+    Los resultados se insertan por lotes con SQL (sin ORM por fila) y se
+    asocian a la orden por su referencia (`sequence`). Reenviar un archivo
+    actualiza los valores en lugar de duplicarlos.
+    """
+    _name = "animal.lab.import"
+    _description = "Importación de resultados de laboratorio"
+    _order = "id desc"
+
+    name = fields.Char(string="Archivo", required=True, readonly=True)
+    file_format = fields.Selection([('csv', 'CSV'), ('hl7', 'HL7')], string="Formato", readonly=True)
+    state = fields.Selection([
+        ('done', 'Procesado'),
+        ('partial', 'Con observaciones'),
+        ('error', 'Error'),
+    ], string="Estado", readonly=True)
+    result_count = fields.Integer(string="Resultados", readonly=True)
+    unmatched_count = fields.Integer(string="Sin orden", readonly=True)
+    order_count = fields.Integer(string="Órdenes", readonly=True)
+    duration = fields.Float(string="Duración (s)", readonly=True, digits=(16, 3))
+    message = fields.Text(string="Detalle", readonly=True)
+
+    # === Carpeta de entrada ===
+    @api.model
+    def _cron_ingest_inbox(self, max_files=200, auto_commit=True):
+        """Procesa los archivos de la carpeta configurada y los mueve a procesados/ o errores/."""
+        inbox = self.env['ir.config_parameter'].sudo().get_param(INBOX_PARAM)
+        if not inbox or not os.path.isdir(inbox):
+            return
+        filenames = sorted(
+            name for name in os.listdir(inbox)
+            if os.path.splitext(name)[1].lower() in FILE_FORMATS and os.path.isfile(os.path.join(inbox, name))
+        )
+        for filename in filenames[:max_files]:
+            path = os.path.join(inbox, filename)
+            with open(path, 'rb') as f:
+                content = f.read()
+            log = self.ingest_file(filename, content)
+            if auto_commit:
+                self.env.cr.commit()
+            target = os.path.join(inbox, ERROR_DIR if log.state == 'error' else PROCESSED_DIR)
+            os.makedirs(target, exist_ok=True)
+            shutil.move(path, os.path.join(target, filename))
+
+    @api.model
+    def ingest_file(self, filename, content):
+        """Procesa el contenido de un archivo y devuelve el registro de importación."""
+        start = time.perf_counter()
+        file_format = FILE_FORMATS.get(os.path.splitext(filename)[1].lower(), 'csv')
+        values = {'name': filename, 'file_format': file_format}
+        try:
+            text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+        except UnicodeDecodeError:
+            text = content.decode('latin-1')
+        try:
+            with self.env.cr.savepoint():
+                rows = self._parse_hl7(text) if file_format == 'hl7' else self._parse_csv(text)
+                stats = self._ingest_rows(rows, filename)
+        except (UserError, ValueError, psycopg2.Error) as e:
+            # Un error de la base (código o valor fuera de rango) también deja el archivo en errores/,
+            # en vez de abortar el cron y bloquear la carpeta en cada ejecución.
+            _logger.warning("vet.lab: no se pudo procesar %s: %s", filename, e)
+            values.update(state='error', message=str(e))
+        else:
+            values.update(
+                state='partial' if stats['unmatched'] else 'done',
+                result_count=stats['inserted'],
+                unmatched_count=len(stats['unmatched']),
+                order_count=stats['orders'],
+                message=_("Órdenes no encontradas: %s") % ', '.join(sorted(stats['unmatched'])) if stats['unmatched'] else False,
+            )
+        values['duration'] = time.perf_counter() - start
+        return self.create(values)
+
+    # === Lectura de archivos ===
+    @api.model
+    def _parse_csv(self, text):
+        try:
+            dialect = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+        header = [name.strip().lower() for name in reader.fieldnames or []]
+        missing = CSV_REQUIRED - set(header)
+        if missing:
+            raise UserError(_("Faltan columnas en el CSV: %s") % ', '.join(sorted(missing)))
+        reader.fieldnames = header
+        rows = []
+        for line in reader:
+            if not (line.get('orden') or '').strip():
+                continue
+            raw_value = (line.get('valor') or '').strip()
+            rows.append({
+                'sequence': line['orden'].strip(),
+                'code': line['analito'].strip(),
+                'name': (line.get('nombre') or '').strip() or None,
+                'value': parse_number(raw_value),
+                'raw_value': raw_value,
+                'unit': (line.get('unidad') or '').strip() or None,
+                'ref_low': parse_number(line.get('ref_min')),
+                'ref_high': parse_number(line.get('ref_max')),
+                'date': self._parse_datetime((line.get('fecha') or '').strip()),
+            })
+        return rows
+
+    @api.model
+    def _parse_hl7(self, text):
+        """
+        HL7 v2 ORU^R01: la referencia de la orden va en OBR-2 (o OBR-3) y cada
+        OBX trae analito (OBX-3), valor (OBX-5), unidad (OBX-6), rango (OBX-7) y fecha (OBX-14).
+        """
+        rows = []
+        sequence = order_date = None
+        for segment in text.replace('\r\n', '\r').replace('\n', '\r').split('\r'):
+            parts = segment.split('|')
+            if parts[0] == 'OBR':
+                parts += [''] * (8 - len(parts))
+                sequence = parts[2].split('^')[0] or parts[3].split('^')[0]
+                order_date = self._parse_datetime(parts[7])
+            elif parts[0] == 'OBX' and sequence:
+                parts += [''] * (15 - len(parts))
+                identifier = parts[3].split('^')
+                ref_low = ref_high = None
+                if '-' in parts[7]:
+                    ref_low, ref_high = (parse_number(bound) for bound in parts[7].split('-', 1))
+                raw_value = parts[5].strip()
+                rows.append({
+                    'sequence': sequence,
+                    'code': identifier[0],
+                    'name': identifier[1] if len(identifier) > 1 and identifier[1] else None,
+                    'value': parse_number(raw_value) if parts[2] in ('NM', 'SN', '') else None,
+                    'raw_value': raw_value,
+                    'unit': parts[6].split('^')[0] or None,
+                    'ref_low': ref_low,
+                    'ref_high': ref_high,
+                    'date': self._parse_datetime(parts[14]) or order_date,
+                })
+        return rows
+
+    @api.model
+    def _parse_datetime(self, text):
+        """Fecha del laboratorio a UTC: AAAAMMDD[HHMM[SS]][±ZZZZ] (HL7) o ISO; sin zona, hora local."""
+        if not text:
+            return None
+        match = HL7_DATETIME.fullmatch(text)
+        try:
+            if match:
+                digits, offset = match.group(1), match.group(2) or ''
+                pattern = HL7_DATETIME_PATTERNS[len(digits)] + ('%z' if offset else '')
+                value = datetime.strptime(digits + offset, pattern)
+            else:
+                value = datetime.fromisoformat(text)
+        except ValueError:
+            raise UserError(_("Fecha inválida en el archivo: %s") % text)
+        if value.tzinfo:
+            return value.astimezone(pytz.utc).replace(tzinfo=None)
+        tz = pytz.timezone(self.env.context.get('tz') or self.env.user.tz or 'UTC')
+        return tz.localize(value).astimezone(pytz.utc).replace(tzinfo=None)
+
+    # === Inserción por lotes ===
+    @api.model
+    def _ingest_rows(self, rows, source):
+        """
+        Inserta/actualiza los resultados con INSERT ... ON CONFLICT por lotes.
+        Devuelve {'inserted': n, 'orders': n, 'unmatched': {referencias sin orden}}.
+        """
+        stats = {'inserted': 0, 'orders': 0, 'unmatched': set()}
+        if not rows:
+            return stats
+        cr = self.env.cr
+        Order = self.env['animal.exam.order']
+        Result = self.env['animal.lab.result']
+        Order.flush_model(['sequence', 'animal_id', 'date', 'state'])
+
+        cr.execute(
+            "SELECT sequence, id, animal_id, date, state FROM animal_exam_order WHERE sequence IN %s",
+            [tuple({row['sequence'] for row in rows})],
+        )
+        orders = {sequence: (order_id, animal_id, date, state) for sequence, order_id, animal_id, date, state in cr.fetchall()}
+        analytes = self._get_analytes(rows)
+
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        values = {}
+        for row in rows:
+            order = orders.get(row['sequence'])
+            if not order:
+                stats['unmatched'].add(row['sequence'])
+                continue
+            analyte_id, unit, ref_low, ref_high = analytes[row['code']]
+            ref_low = row['ref_low'] if row['ref_low'] is not None else ref_low
+            ref_high = row['ref_high'] if row['ref_high'] is not None else ref_high
+            value_text = row['raw_value'] if row['value'] is None else None
+            # Por orden y analito vale el último resultado del archivo.
+            values[order[0], analyte_id] = (
+                order[0], order[1], analyte_id, row['date'] or order[2], row['value'], value_text,
+                row['unit'] or unit, ref_low, ref_high, result_flag(row['value'], ref_low, ref_high),
+                source, uid, now, uid, now,
+            )
+
+        values = list(values.values())
+        for start in range(0, len(values), INSERT_CHUNK):
+            execute_values(cr._obj, """
+                INSERT INTO animal_lab_result (
+                    order_id, animal_id, analyte_id, date, value, value_text,
+                    unit, ref_low, ref_high, flag, source,
+                    create_uid, create_date, write_uid, write_date
+                ) VALUES %s
+                ON CONFLICT (order_id, analyte_id) DO UPDATE SET
+                    date = EXCLUDED.date, value = EXCLUDED.value, value_text = EXCLUDED.value_text,
+                    unit = EXCLUDED.unit, ref_low = EXCLUDED.ref_low, ref_high = EXCLUDED.ref_high,
+                    flag = EXCLUDED.flag, source = EXCLUDED.source,
+                    write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+            """, values[start:start + INSERT_CHUNK])
+        Result.invalidate_model()
+        Order.invalidate_model(['result_ids'])
+        stats['inserted'] = len(values)
+
+        order_ids = {row[0] for row in values}
+        stats['orders'] = len(order_ids)
+        # Las órdenes enviadas al laboratorio pasan a completadas (una escritura por lote).
+        to_close = [order_id for order_id, _animal_id, _date, state in orders.values()
+                    if state == 'ordered' and order_id in order_ids]
+        if to_close:
+            Order.browse(to_close).action_done()
+        return stats
+
+    @api.model
+    def _get_analytes(self, rows):
+        """
+        {código: (id, unidad, ref. mín., ref. máx.)}; crea los analitos nuevos en
+        un solo `create`. Los rangos se leen por SQL para distinguir "sin límite"
+        (NULL) de un límite en 0, que el ORM lee igual.
+        """
+        Analyte = self.env['animal.lab.analyte'].with_context(active_test=False)
+        codes = {row['code'] for row in rows}
+        Analyte.flush_model(['code', 'unit', 'ref_low', 'ref_high'])
+        self.env.cr.execute("""
+            SELECT code, id, unit, ref_low, ref_high FROM animal_lab_analyte WHERE code IN %s
+        """, [tuple(codes) or (None,)])
+        analytes = {code: (analyte_id, unit, ref_low, ref_high)
+                    for code, analyte_id, unit, ref_low, ref_high in self.env.cr.fetchall()}
+        new = {}
+        for row in rows:
+            if row['code'] not in analytes and row['code'] not in new:
+                new[row['code']] = {
+                    'code': row['code'],
+                    'name': row['name'] or row['code'],
+                    'unit': row['unit'],
+                }
+                # Sin límite en el archivo, la columna queda en NULL.
+                new[row['code']].update({name: row[name] for name in ('ref_low', 'ref_high') if row[name] is not None})
+        if new:
+            for analyte in Analyte.create(list(new.values())):
+                analytes[analyte.code] = (analyte.id, analyte.unit, new[analyte.code].get('ref_low'),
+                                          new[analyte.code].get('ref_high'))
+        return analytes
@@ -1,3 +1,6 @@
+import math
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -5,6 +8,11 @@ from odoo.exceptions import UserError
 class Medicine(models.Model):
     _name = "animal.medicine"
     _description = "Animal medicines table"
+    _inherit = ['vet.keyset.mixin', 'vet.stock.product.mixin']
+    _stock_product_type = 'medicine'
+    _stock_total_field = 'stock_total_units'
+    _stock_loose_field = 'stock_units'
+    _stock_fields = ('stock_boxes', 'stock_packs', 'stock_units', 'packs_per_box', 'units_per_pack')
 
     # === Datos básicos ===
     name = fields.Char(string="Medicamento", required=True)
@@ -38,6 +46,7 @@ class Medicine(models.Model):
         store=True,
         help="Total de unidades considerando cajas, packs y sueltas."
     )
+    quant_ids = fields.One2many("vet.stock.quant", "medicine_id", string="Stock por ubicación")
 
     @api.depends('stock_boxes', 'stock_packs', 'stock_units', 'packs_per_box', 'units_per_pack')
     def _compute_stock_total_units(self):
@@ -91,37 +100,83 @@ class Medicine(models.Model):
         self.stock_boxes -= how_many_boxes
         self.stock_packs += int(how_many_boxes) * int(self.packs_per_box or 0)
 
-    def _consume_units(self, units):
+    def _consume_units(self, units, location=None):
         """
         Consume 'units' unidades del stock, fraccionando según sea necesario:
-        primero sueltas, luego packs, luego cajas.
+        primero sueltas, luego packs, luego cajas. Se descuentan de `location`
+        (por defecto la del contexto o la principal).
         """
         self.ensure_one()
         if not units or units <= 0:
             return
 
         self._ensure_enough_units(units)
+        self._stock_post(-units, location)
+        self = self.with_context(vet_stock_engine=True)
 
+        # Se calcula de una vez cuántos packs (y cajas) abrir, en vez de uno por uno.
         deficit = units - (self.stock_units or 0.0)
-        while deficit > 0:
-            if (self.stock_packs or 0) > 0:
-                self._break_pack_to_units(1)
-            elif (self.stock_boxes or 0) > 0:
-                self._break_box_to_packs(1)
-            else:
+        if deficit > 0:
+            upp = float(self.units_per_pack or 0.0)
+            ppb = int(self.packs_per_box or 0)
+            if upp <= 0:
                 raise UserError(_("No hay stock suficiente para fraccionar en unidades."))
-            deficit = units - (self.stock_units or 0.0)
+            packs_needed = int(math.ceil(deficit / upp))
+            missing_packs = packs_needed - (self.stock_packs or 0)
+            if missing_packs > 0:
+                if ppb < 1:
+                    raise UserError(_("No hay stock suficiente para fraccionar en unidades."))
+                self._break_box_to_packs(int(math.ceil(missing_packs / ppb)))
+            self._break_pack_to_units(packs_needed)
 
         self.stock_units -= units
 
-    def _revert_units(self, units):
+    @api.model
+    def _consume_units_grouped(self, units_by_medicine, location=None):
+        """
+        Consume {medicine_id: unidades} de `location`, o {(medicine_id,
+        location_id): unidades} si el lote descuenta de varias ubicaciones (p. ej.
+        la de cada médico), con una sola operación por medicamento y ubicación.
+        Las filas se bloquean en orden de id para que dos dispensaciones
+        simultáneas no descuenten sobre el mismo stock leído; si falta stock de
+        alguno no se descuenta ninguno.
+        """
+        Location = self.env['vet.stock.location']
+        default_location_id = (location or Location._current()).id
+        units_by_key = defaultdict(float)
+        for key, units in units_by_medicine.items():
+            if units > 0:
+                units_by_key[key if isinstance(key, tuple) else (key, default_location_id)] += units
+        if not units_by_key:
+            return
+        units_by_medicine = defaultdict(float)
+        for (med_id, _location_id), units in units_by_key.items():
+            units_by_medicine[med_id] += units
+        medicines = self.browse(sorted(units_by_medicine))
+        self.flush_model(['stock_boxes', 'stock_packs', 'stock_units'])
+        self.env.cr.execute(
+            "SELECT id FROM animal_medicine WHERE id IN %s ORDER BY id FOR NO KEY UPDATE",
+            [tuple(medicines.ids)],
+        )
+        medicines.invalidate_recordset(['stock_boxes', 'stock_packs', 'stock_units', 'stock_total_units'])
+        missing = [
+            "%s (requeridas %.2f, disponibles %.2f)" % (med.name, units_by_medicine[med.id], med.stock_total_units or 0.0)
+            for med in medicines if (med.stock_total_units or 0.0) < units_by_medicine[med.id]
+        ]
+        if missing:
+            raise UserError(_("Stock insuficiente:\n%s") % "\n".join(missing))
+        for med_id, location_id in sorted(units_by_key):
+            self.browse(med_id)._consume_units(units_by_key[med_id, location_id], Location.browse(location_id))
+
+    def _revert_units(self, units, location=None):
         """
         Devuelve 'units' al stock como unidades sueltas.
         """
         self.ensure_one()
         if not units or units <= 0:
             return
-        self.stock_units += units
+        self._stock_post(units, location, 'return')
+        self.with_context(vet_stock_engine=True).stock_units += units
 
 
 class Medication(models.Model):
@@ -131,7 +186,7 @@ class Medication(models.Model):
     """
     _name = "animal.medication"
     _description = "Registro de medicaciones por animal"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.stock.consumer.mixin']
     _order = "date desc, id desc"
 
     # Enlaces
@@ -177,6 +232,22 @@ class Medication(models.Model):
         help="Si está activado, al guardar se descuenta 'Cantidad (unidades)' del stock del medicamento."
     )
 
+    # Origen (dispensación de receta)
+    prescription_line_id = fields.Many2one(
+        "animal.prescription.line",
+        string="Línea de receta",
+        ondelete="set null",
+        index='btree_not_null',
+        readonly=True,
+        copy=False
+    )
+    prescription_id = fields.Many2one(
+        related="prescription_line_id.prescription_id",
+        string="Receta",
+        store=True,
+        readonly=True
+    )
+
     # Lectura
     owner_id = fields.Many2one(
         related="animal_id.owner",
@@ -193,9 +264,11 @@ class Medication(models.Model):
 
     @api.onchange('animal_id')
     def _onchange_animal_id_prefill_doctor(self):
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor:
-                rec.doctor = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor:
+                rec.doctor = patient['treating_doctor']
 
     def name_get(self):
         res = []
@@ -211,12 +284,15 @@ class Medication(models.Model):
     ]
 
     # === Movimiento de stock ===
-    @api.model
-    def create(self, vals):
-        records = super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if self.env.context.get('vet_stock_consumed'):
+            # Stock ya descontado en bloque (p. ej. dispensación de recetas).
+            return records
         for rec in records:
             if rec.consume_stock and rec.medicine_id and rec.quantity_units:
-                rec.medicine_id._consume_units(rec.quantity_units)
+                rec.medicine_id._consume_units(rec.quantity_units, rec.stock_location_id)
         return records
 
     def write(self, vals):
@@ -224,6 +300,7 @@ class Medication(models.Model):
             'medicine_id': rec.medicine_id.id,
             'quantity_units': float(rec.quantity_units or 0.0),
             'consume_stock': bool(rec.consume_stock),
+            'stock_location_id': rec.stock_location_id,
         } for rec in self}
 
         res = super().write(vals)
@@ -237,33 +314,35 @@ class Medication(models.Model):
             new_med = rec.medicine_id
             new_qty = float(rec.quantity_units or 0.0)
             new_consume = bool(rec.consume_stock)
+            prev_loc = prev['stock_location_id']
+            new_loc = rec.stock_location_id
 
             # 1) Antes consumía y ahora NO -> revertir prev_qty en prev_med
             if prev_consume and not new_consume and prev_med and prev_qty:
-                prev_med._revert_units(prev_qty)
+                prev_med._revert_units(prev_qty, prev_loc)
 
             # 2) Antes NO y ahora SÍ -> consumir new_qty en new_med
             elif not prev_consume and new_consume and new_med and new_qty:
-                new_med._consume_units(new_qty)
+                new_med._consume_units(new_qty, new_loc)
 
             # 3) Sigue consumiendo
             elif prev_consume and new_consume:
-                if prev_med and new_med and prev_med.id != new_med.id:
+                if prev_med and new_med and (prev_med.id != new_med.id or prev_loc != new_loc):
                     if prev_qty:
-                        prev_med._revert_units(prev_qty)
+                        prev_med._revert_units(prev_qty, prev_loc)
                     if new_qty:
-                        new_med._consume_units(new_qty)
+                        new_med._consume_units(new_qty, new_loc)
                 else:
                     delta = new_qty - prev_qty
                     if delta > 0:
-                        new_med._consume_units(delta)
+                        new_med._consume_units(delta, new_loc)
                     elif delta < 0:
-                        new_med._revert_units(-delta)
+                        new_med._revert_units(-delta, new_loc)
 
         return res
 
     def unlink(self):
         for rec in self:
             if rec.consume_stock and rec.medicine_id and rec.quantity_units:
-                rec.medicine_id._revert_units(rec.quantity_units)
+                rec.medicine_id._revert_units(rec.quantity_units, rec.stock_location_id)
         return super().unlink()
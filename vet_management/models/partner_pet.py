@@ -1,7 +1,98 @@
+import re
+
 from odoo import fields, models, api
 from odoo.exceptions import UserError
 
+
+def rut_check_digit(body):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT."""
+    total, factor = 0, 2
+    for digit in reversed(body):
+        total += int(digit) * factor
+        factor = 2 if factor == 7 else factor + 1
+    rest = 11 - total % 11
+    return {11: '0', 10: 'K'}.get(rest, str(rest))
+
+
+def normalize_rut(value):
+    """
+    '12.345.678-k', '12345678K' o 'CL12345678K' -> '12345678-K'.
+    Devuelve None si el valor no es un RUT válido (dígito verificador incluido).
+    """
+    if not value:
+        return None
+    value = value.strip().upper()
+    if value.startswith('CL'):
+        value = value[2:]
+    rut = re.sub(r'[^0-9K]', '', value)
+    body, digit = rut[:-1].lstrip('0'), rut[-1:]
+    if not body.isdigit() or rut_check_digit(body) != digit:
+        return None
+    return '%s-%s' % (body, digit)
+
+
 class Pet(models.Model):
     _inherit = "res.partner"
 
     pet = fields.One2many("animal", "owner", string="Pet")
+    rut_normalized = fields.Char(
+        string="RUT normalizado", compute='_compute_rut_normalized', store=True, index=True,
+        help="RUT sin puntos y con guion, para buscar responsables sin duplicarlos."
+    )
+
+    @api.depends('vat')
+    def _compute_rut_normalized(self):
+        for partner in self:
+            partner.rut_normalized = normalize_rut(partner.vat)
+
+    @api.model
+    def _find_or_create_by_rut(self, vals_by_rut):
+        """
+        {rut normalizado: valores del contacto} -> {rut normalizado: partner_id}.
+        Una búsqueda para todo el lote y un solo `create` para los que faltan.
+
+        Cada contacto creado reclama su RUT en vet.partner.rut.claim (RUT
+        único). Si otro ingreso simultáneo crea el mismo RUT, el upsert espera
+        y falla por serialización; Odoo reintenta la solicitud y el reintento
+        encuentra el contacto. No hay índice único en res.partner porque los
+        contactos hijos de una empresa comparten su RUT.
+        """
+        if not vals_by_rut:
+            return {}
+        partners = {}
+        for partner in self.with_context(active_test=False).search(
+                [('rut_normalized', 'in', list(vals_by_rut))], order='id'):
+            # Si ya hay duplicados, se usa el contacto más antiguo.
+            partners.setdefault(partner.rut_normalized, partner.id)
+        missing = [rut for rut in vals_by_rut if rut not in partners]
+        if missing:
+            created = self.create([dict(vals_by_rut[rut], vat=rut) for rut in missing])
+            partners.update(zip(missing, created.ids))
+            self.env['vet.partner.rut.claim']._claim(dict(zip(missing, created.ids)))
+        return partners
+
+
+class PartnerRutClaim(models.Model):
+    """Contacto creado por RUT desde los ingresos masivos; la unicidad evita duplicados concurrentes."""
+    _name = "vet.partner.rut.claim"
+    _description = "RUT reclamado por un contacto"
+    _log_access = False
+
+    rut = fields.Char(string="RUT", required=True)
+    partner_id = fields.Many2one("res.partner", string="Contacto", required=True, ondelete='cascade')
+
+    _sql_constraints = [
+        ('rut_unique', 'unique(rut)', 'El RUT ya fue reclamado por otro contacto.'),
+    ]
+
+    @api.model
+    def _claim(self, partner_by_rut):
+        """
+        {rut: partner_id}. Un reclamo visible y antiguo se reasigna; uno de una
+        transacción concurrente provoca un error de serialización (REPEATABLE READ).
+        """
+        self.env.cr.execute("""
+            INSERT INTO vet_partner_rut_claim (rut, partner_id)
+            SELECT * FROM unnest(%s::varchar[], %s::int[])
+            ON CONFLICT (rut) DO UPDATE SET partner_id = EXCLUDED.partner_id
+        """, [list(partner_by_rut), list(partner_by_rut.values())])
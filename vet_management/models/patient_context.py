@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+
+from odoo import models, api
+
+# Caché por worker: (base de datos, animal_id) -> {(usuario, idioma): (expira, datos)}.
+# Los datos se leen con los permisos y el idioma de quien consulta, por eso no
+# se comparten entre usuarios. Se invalida al escribir el animal o sus
+# consentimientos; el TTL corto cubre los cambios hechos en otros workers.
+CACHE_TTL = 30
+CACHE_MAX_SIZE = 5000
+_cache = {}
+_cache_lock = threading.Lock()
+
+ANIMAL_FIELDS = [
+    'name', 'treating_doctor', 'species', 'breed', 'sex', 'microchip_number', 'owner',
+    'birthdate', 'weight', 'reproductive_status', 'allergies', 'tags',
+]
+
+
+class PatientContext(models.AbstractModel):
+    """
+    Datos del paciente que usan los onchange de los formularios clínicos
+    (médico tratante, especie/raza, dueño, consentimiento firmado, alergias,
+    peso), obtenidos en una sola lectura por lote en vez de un acceso por campo.
+    """
+    _name = "vet.patient.context"
+    _description = "Contexto del paciente para autocompletar formularios"
+
+    @api.model
+    def get(self, animal_ids):
+        """
+        Devuelve {animal_id: dict} para los ids dados (usa la caché del worker).
+        Cada llamada recibe copias: modificarlas no altera lo que ven las siguientes.
+        """
+        now = time.monotonic()
+        dbname = self.env.cr.dbname
+        user_key = (self.env.uid, self.env.lang)
+        result, missing = {}, []
+        for animal_id in animal_ids:
+            entry = _cache.get((dbname, animal_id), {}).get(user_key)
+            if entry and entry[0] > now:
+                result[animal_id] = entry[1]
+            else:
+                missing.append(animal_id)
+        if missing:
+            fetched = self._fetch(missing)
+            with _cache_lock:
+                if len(_cache) + len(fetched) > CACHE_MAX_SIZE:
+                    _cache.clear()
+                for animal_id, data in fetched.items():
+                    _cache.setdefault((dbname, animal_id), {})[user_key] = (now + CACHE_TTL, data)
+            result.update(fetched)
+        return copy.deepcopy(result)
+
+    @api.model
+    def get_for(self, records):
+        """Atajo para onchange: contexto de los animales de `records` (campo animal_id)."""
+        return self.get(records.animal_id._origin.ids)
+
+    @api.model
+    def _invalidate(self, animal_ids):
+        dbname = self.env.cr.dbname
+        with _cache_lock:
+            for animal_id in animal_ids:
+                _cache.pop((dbname, animal_id), None)
+
+    @api.model
+    def _fetch(self, animal_ids):
+        animals = self.env['animal'].with_context(active_test=False).browse(animal_ids).exists()
+        if not animals:
+            return {}
+        rows = animals.read(ANIMAL_FIELDS, load=None)
+
+        # Catálogos relacionados: una lectura por modelo para todo el lote
+        breed_specie = {
+            breed['id']: breed['specie']
+            for breed in self.env['animal.breed'].browse({r['breed'] for r in rows if r['breed']}).read(['specie'], load=None)
+        }
+        tag_names = {
+            tag['id']: tag['name']
+            for tag in self.env['animal.tag'].browse({t for r in rows for t in r['tags']}).read(['name'])
+        }
+        allergies = {
+            allergy['id']: allergy
+            for allergy in self.env['animal.allergy'].browse({a for r in rows for a in r['allergies']}).read(
+                ['name', 'allergy_type', 'severity'])
+        }
+        consents = self._latest_signed_consents(animals.ids)
+        surgical_consents = self._latest_signed_consents(animals.ids, ('surgery', 'anesthesia'))
+
+        result = {}
+        for row in rows:
+            result[row['id']] = {
+                'name': row['name'],
+                'treating_doctor': row['treating_doctor'],
+                'species_id': row['species'],
+                'breed_id': row['breed'],
+                'breed_specie_id': breed_specie.get(row['breed']),
+                'sex': row['sex'],
+                'microchip_number': row['microchip_number'],
+                'owner_id': row['owner'],
+                'birthdate': row['birthdate'],
+                'weight': row['weight'],
+                'reproductive_status': row['reproductive_status'],
+                'allergies': [allergies[a] for a in row['allergies'] if a in allergies],
+                'tag_names': [tag_names[t] for t in row['tags'] if t in tag_names],
+                'consent_id': consents.get(row['id']),
+                'surgical_consent_id': surgical_consents.get(row['id']),
+            }
+        return result
+
+    @api.model
+    def _latest_signed_consents(self, animal_ids, consent_types=None):
+        """{animal_id: consent_id} con el consentimiento firmado más reciente."""
+        self.env['animal.consent'].flush_model(['animal_id', 'state', 'consent_type', 'date'])
+        query = """
+            SELECT DISTINCT ON (animal_id) animal_id, id
+              FROM animal_consent
+             WHERE animal_id IN %s AND state = 'signed'
+        """
+        params = [tuple(animal_ids)]
+        if consent_types:
+            query += " AND consent_type IN %s"
+            params.append(tuple(consent_types))
+        query += " ORDER BY animal_id, date DESC, id DESC"
+        Consent = self.env['animal.consent']
+        if not Consent.check_access_rights('read', raise_exception=False):
+            return {}
+        self.env.cr.execute(query, params)
+        latest = dict(self.env.cr.fetchall())
+        # La consulta no aplica reglas de registro: se descartan los que el usuario no puede leer.
+        readable = set(Consent.browse(latest.values())._filter_access_rules('read').ids)
+        return {animal_id: consent_id for animal_id, consent_id in latest.items() if consent_id in readable}
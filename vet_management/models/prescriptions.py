@@ -1,3 +1,6 @@
+import math
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -5,8 +8,16 @@ from odoo.exceptions import UserError
 class Prescription(models.Model):
     _name = "animal.prescription"
     _description = "Recetas veterinarias"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.document.cache.mixin', 'vet.clinical.search.mixin']
     _order = "date desc, sequence desc"
+    _clinical_search_fields = {'diagnosis': 'A'}
+    _document_cache_report = 'vet_management.action_report_prescription'
+    # Sin dispense_date: dispensar no cambia la receta impresa.
+    _document_cache_fields = (
+        'sequence', 'date', 'sex', 'microchip_number', 'doctor_name', 'doctor_rut', 'diagnosis', 'rp',
+        'indications', 'duration_days', 'next_control', 'doctor_signature', 'owner_signature',
+    )
+    _document_cache_depends = ('animal_id', 'owner_id', 'specie_id', 'breed_id', 'line_ids', 'line_ids.medicine_id')
 
     # Identificador / referencia
     sequence = fields.Char(
@@ -77,6 +88,21 @@ class Prescription(models.Model):
     next_control = fields.Date(string="Próximo control")
     notes = fields.Text(string="Notas internas")
 
+    # Medicamentos prescritos (estructurados)
+    line_ids = fields.One2many(
+        "animal.prescription.line",
+        "prescription_id",
+        string="Medicamentos",
+        copy=True
+    )
+    dispense_date = fields.Datetime(string="Dispensada", readonly=True, copy=False, tracking=True)
+    medication_ids = fields.One2many(
+        "animal.medication",
+        "prescription_id",
+        string="Medicaciones dispensadas",
+        readonly=True
+    )
+
     # Firmas
     doctor_signature = fields.Binary(string="Firma Médico/a")
     owner_signature = fields.Binary(string="Firma Propietario/a")
@@ -97,27 +123,73 @@ class Prescription(models.Model):
     @api.onchange('animal_id')
     def _onchange_animal_id_set_doctor(self):
         """Si el animal tiene 'médico tratante', sugerirlo en la receta."""
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor_name:
-                rec.doctor_name = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor_name:
+                rec.doctor_name = patient['treating_doctor']
 
     # Acciones
     def action_issue(self):
         """Marcar como emitida. (Opcional) Validar que haya contenido en Rp."""
         for rec in self:
-            if not (rec.rp or rec.indications):
-                raise UserError(_("La receta no tiene contenido. Completa 'Rp' o 'Indicaciones'."))
+            if not (rec.rp or rec.indications or rec.line_ids):
+                raise UserError(_("La receta no tiene contenido. Agrega medicamentos o completa 'Rp' o 'Indicaciones'."))
             rec.state = 'issued'
+        self._document_cache_warm()
         return True
 
     def action_cancel(self):
+        self._check_not_dispensed()
         self.write({'state': 'cancelled'})
         return True
 
     def action_reset_to_draft(self):
+        self._check_not_dispensed()
         self.write({'state': 'draft'})
         return True
 
+    def _check_not_dispensed(self):
+        dispensed = self.filtered('dispense_date')
+        if dispensed:
+            raise UserError(_("No se puede cancelar ni volver a borrador una receta ya dispensada: %s")
+                            % ', '.join(dispensed.mapped('sequence')))
+
+    def action_dispense(self):
+        """
+        Dispensa las recetas emitidas: crea un `animal.medication` por línea y
+        descuenta el stock sumando las cantidades de cada medicamento, con una
+        sola operación por medicamento aunque se dispensen muchas recetas a la vez
+        (p. ej. el cierre del día desde la lista). Las ya dispensadas se omiten.
+        """
+        pending = self.filtered(lambda rec: not rec.dispense_date)
+        not_issued = pending.filtered(lambda rec: rec.state != 'issued')
+        if not_issued:
+            raise UserError(_("Solo se pueden dispensar recetas emitidas: %s")
+                            % ', '.join(not_issued.mapped('sequence')))
+        lines = pending.line_ids.filtered(lambda line: line.quantity_units > 0)
+        if not pending or not lines:
+            raise UserError(_("No hay medicamentos pendientes de dispensar."))
+
+        # Cada receta descuenta de la ubicación de su médico.
+        by_doctor = self.env['vet.stock.location']._for_doctors(pending.mapped('doctor_name'))
+        location_by_line = {line: by_doctor[line.prescription_id.doctor_name or False] for line in lines}
+        units_by_medicine = defaultdict(float)
+        for line in lines:
+            units_by_medicine[line.medicine_id.id, location_by_line[line]] += line.quantity_units
+        self.env['animal.medicine']._consume_units_grouped(units_by_medicine)
+
+        now = fields.Datetime.now()
+        self.env['animal.medication'].with_context(vet_stock_consumed=True, tracking_disable=True).create([
+            dict(line._prepare_medication_values(now), stock_location_id=location_by_line[line]) for line in lines
+        ])
+        pending.write({'dispense_date': now})
+        return True
+
+    def _document_cache_is_final(self):
+        self.ensure_one()
+        return self.state == 'issued'
+
     def name_get(self):
         res = []
         for rec in self:
@@ -126,3 +198,68 @@ class Prescription(models.Model):
                 label = "%s - %s" % (label, rec.animal_id.name)
             res.append((rec.id, label))
         return res
+
+
+class PrescriptionLine(models.Model):
+    """
+    Medicamento prescrito: dosis por toma (en unidades base del medicamento),
+    frecuencia y duración. La cantidad total se propone a partir de ellas y es
+    lo que se descuenta del stock al dispensar.
+    """
+    _name = "animal.prescription.line"
+    _description = "Línea de receta"
+    _order = "prescription_id, sequence, id"
+
+    prescription_id = fields.Many2one(
+        "animal.prescription",
+        string="Receta",
+        required=True,
+        ondelete="cascade",
+        index=True
+    )
+    sequence = fields.Integer(string="Secuencia", default=10)
+    medicine_id = fields.Many2one(
+        "animal.medicine",
+        string="Medicamento",
+        required=True,
+        ondelete="restrict"
+    )
+    dose = fields.Float(string="Dosis (unidades)", default=1.0, help="Unidades base por toma (p. ej. tabletas, mL).")
+    frequency_hours = fields.Integer(string="Cada (horas)", default=24)
+    duration_days = fields.Integer(string="Duración (días)", default=1)
+    quantity_units = fields.Float(
+        string="Cantidad total (unidades)",
+        compute="_compute_quantity_units",
+        store=True,
+        readonly=False,
+        help="Unidades a entregar; por defecto dosis × número de tomas."
+    )
+    instructions = fields.Char(string="Indicaciones")
+
+    _sql_constraints = [
+        ('quantity_non_negative', 'CHECK(quantity_units >= 0)', 'La cantidad debe ser mayor o igual a 0.'),
+        ('frequency_positive', 'CHECK(frequency_hours > 0)', 'La frecuencia debe ser de al menos 1 hora.'),
+    ]
+
+    @api.depends('dose', 'frequency_hours', 'duration_days')
+    def _compute_quantity_units(self):
+        for line in self:
+            if line.frequency_hours > 0 and line.duration_days > 0:
+                doses = math.ceil(line.duration_days * 24 / line.frequency_hours)
+            else:
+                doses = 1
+            line.quantity_units = (line.dose or 0.0) * doses
+
+    def _prepare_medication_values(self, date):
+        self.ensure_one()
+        prescription = self.prescription_id
+        return {
+            'animal_id': prescription.animal_id.id,
+            'medicine_id': self.medicine_id.id,
+            'date': date,
+            'doctor': prescription.doctor_name,
+            'quantity_units': self.quantity_units,
+            'consume_stock': True,
+            'prescription_line_id': self.id,
+            'notes': self.instructions,
+        }
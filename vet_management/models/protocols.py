@@ -0,0 +1,262 @@
+import logging
+
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Campos del protocolo que cambian las fechas calculadas.
+PROTOCOL_SCHEDULE_FIELDS = {
+    'specie_id', 'protocol_type', 'vaccine_id', 'dewormer_id', 'first_dose_age_days',
+    'initial_doses', 'initial_interval_days', 'booster_interval_days', 'active',
+}
+# Campos de una aplicación (vacunación/desparasitación) que cambian el historial.
+APPLICATION_FIELDS = {'animal_id', 'vaccine_id', 'dewormer_id', 'date'}
+
+
+class Protocol(models.Model):
+    """
+    Protocolo preventivo por especie: primera dosis a cierta edad, serie inicial
+    de `initial_doses` dosis separadas por `initial_interval_days` y luego un
+    refuerzo cada `booster_interval_days` (0 = sin refuerzo).
+    """
+    _name = "animal.protocol"
+    _description = "Protocolo de vacunación / desparasitación"
+    _order = "specie_id, protocol_type, first_dose_age_days, id"
+
+    name = fields.Char(string="Protocolo", required=True)
+    specie_id = fields.Many2one("animal.specie", string="Especie", required=True, ondelete='cascade', index=True)
+    protocol_type = fields.Selection([
+        ('vaccination', 'Vacunación'),
+        ('deworming', 'Desparasitación'),
+    ], string="Tipo", required=True, default='vaccination')
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='restrict')
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='restrict')
+    first_dose_age_days = fields.Integer(string="Edad primera dosis (días)", default=56)
+    initial_doses = fields.Integer(string="Dosis de la serie inicial", default=1)
+    initial_interval_days = fields.Integer(string="Intervalo serie inicial (días)", default=21)
+    booster_interval_days = fields.Integer(string="Refuerzo cada (días)", default=365,
+                                           help="0 = sin refuerzo tras la serie inicial.")
+    active = fields.Boolean(default=True)
+    notes = fields.Text(string="Notas")
+
+    _sql_constraints = [
+        ('initial_doses_positive', 'CHECK(initial_doses >= 1)', 'La serie inicial debe tener al menos una dosis.'),
+        ('intervals_non_negative',
+         'CHECK(first_dose_age_days >= 0 AND initial_interval_days >= 0 AND booster_interval_days >= 0)',
+         'Edades e intervalos no pueden ser negativos.'),
+    ]
+
+    @api.constrains('protocol_type', 'vaccine_id', 'dewormer_id')
+    def _check_product(self):
+        for rec in self:
+            if rec.protocol_type == 'vaccination' and not rec.vaccine_id:
+                raise ValidationError(_("Indique la vacuna del protocolo '%s'.") % rec.name)
+            if rec.protocol_type == 'deworming' and not rec.dewormer_id:
+                raise ValidationError(_("Indique el desparasitante del protocolo '%s'.") % rec.name)
+
+    @api.onchange('protocol_type')
+    def _onchange_protocol_type(self):
+        for rec in self:
+            if rec.protocol_type == 'vaccination':
+                rec.dewormer_id = False
+            else:
+                rec.vaccine_id = False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['animal.protocol.due']._refresh(protocol_ids=records.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PROTOCOL_SCHEDULE_FIELDS & set(vals):
+            self.env['animal.protocol.due']._refresh(protocol_ids=self.ids)
+        return res
+
+    @api.model
+    def action_rebuild_due(self):
+        """Recalcula todas las fechas pendientes (p. ej. tras importar historiales)."""
+        self.env['animal.protocol.due']._refresh()
+        return True
+
+
+class ProtocolDue(models.Model):
+    """
+    Próxima dosis pendiente por (animal, protocolo). Se calcula con una sola
+    consulta para todos los animales afectados a partir de la fecha de
+    nacimiento y del historial de aplicaciones; al registrar una aplicación solo
+    se recalculan los animales involucrados.
+    """
+    _name = "animal.protocol.due"
+    _description = "Dosis preventiva pendiente"
+    _order = "due_date, id"
+    _log_access = False
+
+    animal_id = fields.Many2one("animal", string="Animal", required=True, ondelete='cascade', readonly=True)
+    protocol_id = fields.Many2one("animal.protocol", string="Protocolo", required=True, ondelete='cascade',
+                                  readonly=True, index=True)
+    protocol_type = fields.Selection(related="protocol_id.protocol_type", string="Tipo")
+    owner_id = fields.Many2one(related="animal_id.owner", string="Dueño")
+    dose_number = fields.Integer(string="Dosis N°", readonly=True)
+    last_date = fields.Date(string="Última aplicación", readonly=True)
+    due_date = fields.Date(string="Fecha prevista", required=True, readonly=True, index=True)
+    overdue = fields.Boolean(string="Atrasada", compute="_compute_overdue", search="_search_overdue")
+
+    _sql_constraints = [
+        ('animal_protocol_unique', 'unique(animal_id, protocol_id)',
+         'Ya existe una dosis pendiente de este protocolo para el animal.'),
+    ]
+
+    def _compute_overdue(self):
+        today = fields.Date.context_today(self)
+        for rec in self:
+            rec.overdue = rec.due_date < today
+
+    def _search_overdue(self, operator, value):
+        today = fields.Date.context_today(self)
+        if (operator == '=') == bool(value):
+            return [('due_date', '<', today)]
+        return [('due_date', '>=', today)]
+
+    @api.model
+    def _refresh(self, animal_ids=None, protocol_ids=None):
+        """
+        Recalcula las dosis pendientes de los animales y/o protocolos dados (toda
+        la base si no se indica ninguno) con un DELETE + INSERT ... SELECT.
+        """
+        for model, names in (
+            ('animal', ['species', 'birthdate', 'active']),
+            ('animal.protocol', list(PROTOCOL_SCHEDULE_FIELDS)),
+            ('animal.vaccination', ['animal_id', 'vaccine_id', 'date']),
+            ('animal.deworming', ['animal_id', 'dewormer_id', 'date']),
+        ):
+            self.env[model].flush_model(names)
+        where, params = ["TRUE"], []
+        history_where, history_params = "TRUE", []
+        if animal_ids:
+            where.append("animal_id IN %s")
+            params.append(tuple(animal_ids))
+            history_where = "animal_id IN %s"
+            history_params = [tuple(animal_ids)]
+        if protocol_ids:
+            where.append("protocol_id IN %s")
+            params.append(tuple(protocol_ids))
+        where = " AND ".join(where)
+        cr = self.env.cr
+        cr.execute("DELETE FROM animal_protocol_due WHERE " + where, params)
+        cr.execute("""
+            WITH history AS (
+                SELECT 'vaccination' AS kind, animal_id, vaccine_id AS product_id,
+                       count(*) AS doses, max(date) AS last_date
+                  FROM animal_vaccination
+                 WHERE {history_where}
+              GROUP BY animal_id, vaccine_id
+                 UNION ALL
+                SELECT 'deworming', animal_id, dewormer_id, count(*), max(date)::date
+                  FROM animal_deworming
+                 WHERE {history_where}
+              GROUP BY animal_id, dewormer_id
+            ),
+            schedule AS (
+                SELECT a.id AS animal_id, p.id AS protocol_id,
+                       coalesce(h.doses, 0) + 1 AS dose_number,
+                       h.last_date,
+                       CASE
+                           WHEN h.doses IS NULL THEN a.birthdate + p.first_dose_age_days
+                           WHEN h.doses < p.initial_doses THEN h.last_date + p.initial_interval_days
+                           WHEN p.booster_interval_days > 0 THEN h.last_date + p.booster_interval_days
+                       END AS due_date
+                  FROM animal a
+                  JOIN animal_protocol p ON p.specie_id = a.species AND p.active
+                  LEFT JOIN history h
+                         ON h.animal_id = a.id AND h.kind = p.protocol_type
+                        AND h.product_id = coalesce(p.vaccine_id, p.dewormer_id)
+                 WHERE a.active
+            )
+            INSERT INTO animal_protocol_due (animal_id, protocol_id, dose_number, last_date, due_date)
+            SELECT animal_id, protocol_id, dose_number, last_date, due_date
+              FROM schedule
+             WHERE due_date IS NOT NULL AND {where}
+        """.format(history_where=history_where, where=where), history_params * 2 + params)
+        _logger.debug("animal.protocol.due: %s filas recalculadas", cr.rowcount)
+        self.invalidate_model()
+
+    @api.model
+    def _fill_next_dates(self, model, records):
+        """Completa `next_date` de las aplicaciones nuevas que no la traen, según su protocolo."""
+        product = 'vaccine_id' if model == 'animal.vaccination' else 'dewormer_id'
+        records = records.filtered(lambda rec: not rec.next_date)
+        if not records:
+            return
+        self.env[model].flush_model(['next_date'])
+        self.env.cr.execute("""
+            UPDATE {table} app SET next_date = due.due_date
+              FROM animal_protocol_due due
+              JOIN animal_protocol p ON p.id = due.protocol_id
+             WHERE app.id IN %s AND app.next_date IS NULL
+               AND due.animal_id = app.animal_id AND p.{product} = app.{product}
+        """.format(table=self.env[model]._table, product=product), [tuple(records.ids)])
+        records.invalidate_recordset(['next_date'])
+
+
+class ProtocolApplicationMixin(models.AbstractModel):
+    """Mantiene al día las dosis pendientes cuando se registra, corrige o elimina una aplicación."""
+    _name = "vet.protocol.application.mixin"
+    _description = "Actualización de dosis pendientes por protocolo"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        Due = self.env['animal.protocol.due']
+        Due._refresh(animal_ids=records.animal_id.ids)
+        Due._fill_next_dates(self._name, records)
+        return records
+
+    def write(self, vals):
+        animal_ids = set(self.animal_id.ids)
+        res = super().write(vals)
+        if APPLICATION_FIELDS & set(vals):
+            self.env['animal.protocol.due']._refresh(animal_ids=list(animal_ids | set(self.animal_id.ids)))
+        return res
+
+    def unlink(self):
+        animal_ids = self.animal_id.ids
+        res = super().unlink()
+        if animal_ids:
+            self.env['animal.protocol.due']._refresh(animal_ids=animal_ids)
+        return res
+
+
+class Vaccination(models.Model):
+    _name = "animal.vaccination"
+    _inherit = ["animal.vaccination", "vet.protocol.application.mixin"]
+
+
+class Deworming(models.Model):
+    _name = "animal.deworming"
+    _inherit = ["animal.deworming", "vet.protocol.application.mixin"]
+
+
+class Animal(models.Model):
+    _inherit = "animal"
+
+    protocol_due_ids = fields.One2many("animal.protocol.due", "animal_id", string="Dosis preventivas pendientes")
+
+    @api.model
+    def create(self, vals):
+        record = super().create(vals)
+        self.env['animal.protocol.due']._refresh(animal_ids=record.ids)
+        return record
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'species', 'birthdate', 'active'} & set(vals):
+            self.env['animal.protocol.due']._refresh(animal_ids=self.ids)
+        return res
+
+    def _merge_into(self, target):
+        target = super()._merge_into(target)
+        self.env['animal.protocol.due']._refresh(animal_ids=target.ids)
+        return target
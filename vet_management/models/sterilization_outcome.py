@@ -0,0 +1,39 @@
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+
+class SterilizationOutcome(models.TransientModel):
+    """Registrar el mismo resultado para varias esterilizaciones del operativo."""
+    _name = "animal.sterilization.outcome"
+    _description = "Resultado de esterilizaciones en lote"
+
+    sterilization_ids = fields.Many2many(
+        "animal.sterilization",
+        string="Esterilizaciones",
+        default=lambda self: self.env.context.get('active_ids'),
+    )
+    status = fields.Selection(
+        selection=lambda self: self.env['animal.sterilization']._fields['status'].selection,
+        string="Estado",
+        required=True,
+    )
+    death_cause = fields.Char(string="Causa defunción")
+    death_moment = fields.Selection(
+        selection=lambda self: self.env['animal.sterilization']._fields['death_moment'].selection,
+        string="Momento de defunción",
+    )
+    death_date = fields.Date(string="Fecha defunción")
+
+    def action_apply(self):
+        self.ensure_one()
+        if not self.sterilization_ids:
+            raise UserError(_("No hay esterilizaciones seleccionadas."))
+        values = {'status': self.status}
+        if self.status == 'fallecido':
+            values.update(
+                death_cause=self.death_cause,
+                death_moment=self.death_moment,
+                death_date=self.death_date,
+            )
+        self.sterilization_ids.write(values)
+        return {'type': 'ir.actions.act_window_close'}
@@ -1,4 +1,12 @@
-from odoo import models, fields, api
+from collections import defaultdict
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from .partner_pet import normalize_rut
+
+# Campos del resultado que se pueden actualizar en lote.
+OUTCOME_FIELDS = ('status', 'death_cause', 'death_moment', 'death_date')
 
 
 class Sterilization(models.Model):
@@ -12,8 +20,11 @@ class Sterilization(models.Model):
     owner_id = fields.Many2one("res.partner", string="Responsable")
 
     # ========= Datos responsable =========
-    date = fields.Date(string="Fecha", tracking=True)
+    date = fields.Date(string="Fecha", tracking=True, index=True)
     resp_rut = fields.Char(string="RUT")
+    resp_rut_normalized = fields.Char(
+        string="RUT normalizado", compute='_compute_resp_rut_normalized', store=True, index=True
+    )
     resp_birthdate = fields.Date(string="Fecha de nacimiento (responsable)")
     resp_name = fields.Char(string="Nombre")
     resp_phone1 = fields.Char(string="Teléfono 1")
@@ -134,6 +145,68 @@ class Sterilization(models.Model):
     # ========= Utilidad / etiquetas =========
     notes = fields.Text(string="Notas")
 
+    @api.depends('resp_rut')
+    def _compute_resp_rut_normalized(self):
+        for rec in self:
+            rec.resp_rut_normalized = normalize_rut(rec.resp_rut)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._link_responsible_partners(vals_list)
+        return super().create(vals_list)
+
+    @api.model
+    def _link_responsible_partners(self, vals_list):
+        """Asigna `owner_id` desde el RUT del responsable (busca o crea el contacto, sin duplicar)."""
+        vals_by_rut = {}
+        pending = []
+        for vals in vals_list:
+            rut = not vals.get('owner_id') and normalize_rut(vals.get('resp_rut'))
+            if not rut:
+                continue
+            pending.append((vals, rut))
+            vals_by_rut.setdefault(rut, {
+                'name': vals.get('resp_name') or rut,
+                'phone': vals.get('resp_phone1') or False,
+                'mobile': vals.get('resp_phone2') or False,
+                'email': vals.get('resp_email') or False,
+                'street': vals.get('resp_address') or False,
+                'city': vals.get('resp_commune') or False,
+            })
+        partners = self.env['res.partner']._find_or_create_by_rut(vals_by_rut)
+        for vals, rut in pending:
+            vals['owner_id'] = partners[rut]
+
+    @api.model
+    def intake(self, vals_list):
+        """
+        Ingreso masivo de un operativo: un solo `create` sin seguimiento ni
+        mensajes de chatter, con los responsables resueltos por RUT en lote.
+        """
+        return self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+        ).create(vals_list)
+
+    @api.model
+    def update_outcomes(self, updates):
+        """
+        Actualiza resultados en lote: [{'id': 1, 'status': 'exito'}, ...].
+        Los registros con los mismos valores se escriben en un solo `write`.
+        """
+        groups = defaultdict(list)
+        for update in updates:
+            values = {name: update[name] for name in OUTCOME_FIELDS if name in update}
+            if not values or not update.get('id'):
+                raise UserError(_("Cada actualización debe tener 'id' y al menos un campo de resultado."))
+            groups[tuple(sorted(values.items()))].append(update['id'])
+        records = self.browse([res_id for ids in groups.values() for res_id in ids])
+        missing = set(records.ids) - set(records.exists().ids)
+        if missing:
+            raise UserError(_("Esterilizaciones inexistentes: %s") % sorted(missing))
+        for values, ids in groups.items():
+            self.browse(ids).write(dict(values))
+        return records
+
     # ====== Al elegir Animal, autocompletar DATOS PACIENTE (y sugerir Responsable) ======
     @api.onchange('animal_id')
     def _onchange_animal_id_fill_species_breed(self):
@@ -151,45 +224,39 @@ class Sterilization(models.Model):
           - already_sterilized   <- True si animal.reproductive_status == 'neutered'
         """
         sex_map = {'male': 'macho', 'female': 'hembra'}
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if not rec.animal_id:
+            patient = patients.get(rec.animal_id._origin.id)
+            if not patient:
                 # Si se deselecciona el animal, no tocamos los campos existentes.
                 continue
 
-            animal = rec.animal_id
-
             # Nombre del paciente
-            rec.patient_name = animal.name or False
+            rec.patient_name = patient['name'] or False
 
             # Especie del paciente
-            rec.specie_id = animal.species.id or False
+            rec.specie_id = patient['species_id'] or False
 
             # Raza: solo si coincide con la especie elegida
-            if animal.breed and (not rec.specie_id or animal.breed.specie.id == rec.specie_id.id):
-                rec.breed_id = animal.breed.id
+            if patient['breed_id'] and (not rec.specie_id or patient['breed_specie_id'] == rec.specie_id.id):
+                rec.breed_id = patient['breed_id']
             else:
                 rec.breed_id = False
 
             # Fecha de nacimiento
-            rec.patient_birthdate = animal.birthdate or False
+            rec.patient_birthdate = patient['birthdate'] or False
 
             # Sexo (mapeo)
-            rec.sex = sex_map.get(animal.sex, False)
+            rec.sex = sex_map.get(patient['sex'], False)
 
             # Color (unimos etiquetas por nombre si existen)
-            if animal.tags:
-                rec.color = ", ".join(animal.tags.mapped('name'))
-            else:
-                rec.color = False
+            rec.color = ", ".join(patient['tag_names']) or False
 
             # Peso
-            rec.weight = animal.weight or False
+            rec.weight = patient['weight'] or False
 
             # Sugerir responsable desde el dueño del animal (si existe)
-            rec.owner_id = animal.owner.id if animal.owner else False
+            rec.owner_id = patient['owner_id'] or False
 
             # Autocompletar si ya está esterilizado (desde estado reproductivo del animal)
-            if animal.reproductive_status:
-                rec.already_sterilized = (animal.reproductive_status == 'neutered')
-            else:
-                rec.already_sterilized = False
+            rec.already_sterilized = patient['reproductive_status'] == 'neutered'
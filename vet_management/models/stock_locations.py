@@ -0,0 +1,440 @@
+import logging
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+# Catálogo con stock -> columna que lo referencia en cantidades y movimientos.
+STOCK_PRODUCTS = {
+    'animal.vaccine': 'vaccine_id',
+    'animal.medicine': 'medicine_id',
+    'animal.dewormer': 'dewormer_id',
+}
+PRODUCT_TYPES = [
+    ('vaccine', 'Vacuna'),
+    ('medicine', 'Medicamento'),
+    ('dewormer', 'Desparasitante'),
+]
+PRODUCT_TYPE_FIELDS = {'vaccine': 'vaccine_id', 'medicine': 'medicine_id', 'dewormer': 'dewormer_id'}
+MOVE_TYPES = [
+    ('inventory', 'Stock inicial'),
+    ('receipt', 'Recepción'),
+    ('internal', 'Transferencia'),
+    ('consumption', 'Consumo'),
+    ('return', 'Devolución'),
+    ('adjustment', 'Ajuste'),
+]
+# Margen para errores de redondeo al comparar cantidades.
+QTY_TOLERANCE = 1e-6
+
+
+class StockLocation(models.Model):
+    """
+    Lugar físico con stock propio: la clínica, una farmacia de sucursal, la
+    ambulancia o el kit de una campaña. El stock total de cada producto es la
+    suma de sus ubicaciones.
+    """
+    _name = "vet.stock.location"
+    _description = "Ubicación de stock"
+    _order = "is_default desc, name"
+
+    name = fields.Char(string="Ubicación", required=True)
+    location_type = fields.Selection([
+        ('clinic', 'Clínica'),
+        ('pharmacy', 'Farmacia'),
+        ('vehicle', 'Móvil / ambulancia'),
+        ('campaign', 'Kit de campaña'),
+    ], string="Tipo", required=True, default='clinic')
+    is_default = fields.Boolean(
+        string="Ubicación principal",
+        help="Se usa cuando el registro no indica ubicación ni el médico tiene una asignada."
+    )
+    active = fields.Boolean(default=True)
+    notes = fields.Text(string="Notas")
+    quant_ids = fields.One2many("vet.stock.quant", "location_id", string="Stock")
+
+    @api.constrains('is_default')
+    def _check_single_default(self):
+        if self.search_count([('is_default', '=', True)]) > 1:
+            raise ValidationError(_("Solo puede haber una ubicación principal."))
+
+    @api.model
+    def _default_location(self):
+        location = self.search([('is_default', '=', True)], limit=1) or self.search([], limit=1)
+        if not location:
+            raise UserError(_("Configure al menos una ubicación de stock."))
+        return location
+
+    @api.model
+    def _current(self):
+        """Ubicación del contexto (`vet_stock_location_id`) o la principal."""
+        location_id = self.env.context.get('vet_stock_location_id')
+        return self.browse(location_id) if location_id else self._default_location()
+
+    @api.model
+    def _for_doctors(self, names):
+        """{nombre de médico: id de ubicación} con una consulta; sin ubicación propia, la principal."""
+        names = {name for name in names if name}
+        found = {}
+        if names:
+            self.env['vet.doctor'].flush_model(['name', 'stock_location_id'])
+            self.env.cr.execute("""
+                SELECT lower(trim(name)), stock_location_id
+                  FROM vet_doctor
+                 WHERE lower(trim(name)) IN %s AND stock_location_id IS NOT NULL
+            """, [tuple({name.strip().lower() for name in names})])
+            found = dict(self.env.cr.fetchall())
+        default = self._current().id
+        return {name: found.get((name or '').strip().lower(), default) for name in names | {False}}
+
+    @api.model
+    def _seed_quants(self):
+        """
+        Lleva a la ubicación principal el stock de los productos que todavía no
+        tienen cantidades por ubicación (instalación o productos importados por SQL).
+        """
+        location = self._default_location()
+        vals_list = []
+        for model, product_field in STOCK_PRODUCTS.items():
+            Product = self.env[model]
+            total_field = Product._stock_total_field
+            Product.flush_model([total_field])
+            self.env.cr.execute("""
+                SELECT p.id, p.{total}
+                  FROM {table} p
+                 WHERE p.{total} > 0
+                   AND NOT EXISTS (SELECT 1 FROM vet_stock_quant q WHERE q.{field} = p.id)
+            """.format(total=total_field, table=Product._table, field=product_field))
+            vals_list += [
+                Product.browse(product_id)._stock_move_vals(quantity, location, 'inventory')
+                for product_id, quantity in self.env.cr.fetchall()
+            ]
+        if vals_list:
+            self.env['vet.stock.move']._post(vals_list)
+            _logger.info("vet.stock.location: stock inicial de %s productos en %s", len(vals_list), location.name)
+
+
+class StockQuant(models.Model):
+    """
+    Stock actual por (ubicación, producto), en unidades base (dosis o
+    unidades). Cada movimiento lo actualiza con un upsert sobre el índice
+    único, de modo que consultar el stock no suma movimientos.
+    """
+    _name = "vet.stock.quant"
+    _description = "Stock por ubicación"
+    _order = "location_id, product_type, id"
+    _log_access = False
+
+    location_id = fields.Many2one("vet.stock.location", string="Ubicación", required=True, ondelete='cascade',
+                                  readonly=True)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo", required=True, readonly=True)
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='cascade', readonly=True,
+                                 index='btree_not_null')
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", ondelete='cascade', readonly=True,
+                                  index='btree_not_null')
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='cascade', readonly=True,
+                                  index='btree_not_null')
+    product_name = fields.Char(string="Producto", compute="_compute_product_name")
+    quantity = fields.Float(string="Cantidad", readonly=True, digits=(16, 2))
+
+    def init(self):
+        create_unique_index(
+            self._cr, 'vet_stock_quant_location_product_uniq', self._table,
+            ['location_id', '(coalesce(vaccine_id, 0))', '(coalesce(medicine_id, 0))', '(coalesce(dewormer_id, 0))'],
+        )
+
+    @api.depends('vaccine_id', 'medicine_id', 'dewormer_id')
+    def _compute_product_name(self):
+        for rec in self:
+            rec.product_name = (rec.vaccine_id or rec.medicine_id or rec.dewormer_id).name
+
+    @api.model
+    def _apply(self, moves):
+        """
+        Suma los movimientos a las cantidades con un solo upsert y rechaza los
+        que dejarían negativa alguna ubicación.
+        """
+        deltas = defaultdict(float)
+        for move in moves:
+            key = (move.product_type, move.vaccine_id.id or None, move.medicine_id.id or None, move.dewormer_id.id or None)
+            if move.location_id:
+                deltas[(move.location_id.id,) + key] -= move.quantity
+            if move.location_dest_id:
+                deltas[(move.location_dest_id.id,) + key] += move.quantity
+        if not deltas:
+            return
+        self.flush_model()
+        result = execute_values(self.env.cr._obj, """
+            INSERT INTO vet_stock_quant AS q (location_id, product_type, vaccine_id, medicine_id, dewormer_id, quantity)
+            VALUES %s
+            ON CONFLICT (location_id, (coalesce(vaccine_id, 0)), (coalesce(medicine_id, 0)), (coalesce(dewormer_id, 0)))
+            DO UPDATE SET quantity = q.quantity + EXCLUDED.quantity
+            RETURNING location_id, vaccine_id, medicine_id, dewormer_id, quantity
+        """, [key + (quantity,) for key, quantity in deltas.items()], page_size=len(deltas), fetch=True)
+        self.invalidate_model()
+        short = [row for row in result if row[4] < -QTY_TOLERANCE]
+        if short:
+            raise UserError(_("Stock insuficiente en la ubicación:\n%s") % "\n".join(
+                "%s en %s (faltan %.2f)" % (
+                    self._product_browse(vaccine_id, medicine_id, dewormer_id).name,
+                    self.env['vet.stock.location'].browse(location_id).name, -quantity,
+                )
+                for location_id, vaccine_id, medicine_id, dewormer_id, quantity in short
+            ))
+
+    @api.model
+    def _product_browse(self, vaccine_id, medicine_id, dewormer_id):
+        if vaccine_id:
+            return self.env['animal.vaccine'].browse(vaccine_id)
+        if medicine_id:
+            return self.env['animal.medicine'].browse(medicine_id)
+        return self.env['animal.dewormer'].browse(dewormer_id)
+
+
+class StockMove(models.Model):
+    """Entrada, salida o traslado de un producto; lo genera el motor de stock, no se edita."""
+    _name = "vet.stock.move"
+    _description = "Movimiento de stock"
+    _order = "date desc, id desc"
+
+    date = fields.Datetime(string="Fecha", required=True, default=fields.Datetime.now, readonly=True, index=True)
+    move_type = fields.Selection(MOVE_TYPES, string="Tipo de movimiento", required=True, readonly=True)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo", required=True, readonly=True)
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='cascade', readonly=True,
+                                 index='btree_not_null')
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", ondelete='cascade', readonly=True,
+                                  index='btree_not_null')
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='cascade', readonly=True,
+                                  index='btree_not_null')
+    quantity = fields.Float(string="Cantidad", required=True, readonly=True, digits=(16, 2))
+    location_id = fields.Many2one("vet.stock.location", string="Desde", ondelete='restrict', readonly=True)
+    location_dest_id = fields.Many2one("vet.stock.location", string="Hacia", ondelete='restrict', readonly=True)
+    transfer_id = fields.Many2one("vet.stock.transfer", string="Documento", ondelete='set null', readonly=True,
+                                  index='btree_not_null')
+    origin = fields.Char(string="Origen", readonly=True)
+
+    _sql_constraints = [
+        ('quantity_positive', 'CHECK(quantity > 0)', 'La cantidad del movimiento debe ser positiva.'),
+        ('has_location', 'CHECK(location_id IS NOT NULL OR location_dest_id IS NOT NULL)',
+         'El movimiento debe tener ubicación de origen o de destino.'),
+    ]
+
+    @api.model
+    def _post(self, vals_list):
+        """Crea los movimientos en un lote y actualiza las cantidades por ubicación."""
+        moves = self.create(vals_list)
+        self.env['vet.stock.quant']._apply(moves)
+        return moves
+
+
+class StockProductMixin(models.AbstractModel):
+    """
+    Stock por ubicación para los catálogos (vacunas, medicamentos,
+    desparasitantes). Los campos de stock del producto siguen siendo el total;
+    cada cambio genera movimientos que reparten ese total por ubicación.
+    """
+    _name = "vet.stock.product.mixin"
+    _description = "Producto con stock por ubicación"
+
+    # Definidos por cada catálogo.
+    _stock_product_type = None
+    _stock_total_field = None
+    _stock_loose_field = None
+    _stock_fields = ()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if not self.env.context.get('vet_stock_engine'):
+            location = self.env['vet.stock.location']._current()
+            vals_list = [rec._stock_move_vals(rec[self._stock_total_field], location, 'inventory')
+                         for rec in records if rec[self._stock_total_field] > QTY_TOLERANCE]
+            if vals_list:
+                self.env['vet.stock.move']._post(vals_list)
+        return records
+
+    def write(self, vals):
+        # Los cambios del motor (consumos, fraccionamiento) ya generan su movimiento.
+        if self.env.context.get('vet_stock_engine') or not set(self._stock_fields) & set(vals):
+            return super().write(vals)
+        before = {rec.id: rec[self._stock_total_field] for rec in self}
+        res = super().write(vals)
+        location = self.env['vet.stock.location']._current()
+        vals_list = []
+        for rec in self:
+            delta = rec[self._stock_total_field] - before[rec.id]
+            if abs(delta) > QTY_TOLERANCE:
+                vals_list.append(rec._stock_move_vals(delta, location, 'adjustment'))
+        if vals_list:
+            self.env['vet.stock.move']._post(vals_list)
+        return res
+
+    def _stock_move_vals(self, quantity, location, move_type, origin=None):
+        """Valores de un movimiento de `quantity` (positiva entra a `location`, negativa sale)."""
+        self.ensure_one()
+        return {
+            'move_type': move_type,
+            'product_type': self._stock_product_type,
+            PRODUCT_TYPE_FIELDS[self._stock_product_type]: self.id,
+            'quantity': abs(quantity),
+            'location_id' if quantity < 0 else 'location_dest_id': location.id,
+            'origin': origin,
+        }
+
+    def _stock_post(self, quantity, location=None, move_type='consumption', origin=None):
+        """Registra la entrada (+) o salida (-) en `location` (por defecto la del contexto o la principal)."""
+        self.ensure_one()
+        location = location or self.env['vet.stock.location']._current()
+        return self.env['vet.stock.move']._post([self._stock_move_vals(quantity, location, move_type, origin)])
+
+
+class StockConsumerMixin(models.AbstractModel):
+    """Ubicación de la que descuenta stock un registro: la indicada, la del médico o la principal."""
+    _name = "vet.stock.consumer.mixin"
+    _description = "Registro que consume stock de una ubicación"
+
+    stock_location_id = fields.Many2one(
+        "vet.stock.location",
+        string="Ubicación de stock",
+        ondelete='restrict',
+        help="De dónde se descuenta el stock. Si se deja vacío, la ubicación del médico o la principal."
+    )
+
+    @api.model
+    def _stock_doctors(self, vals_list):
+        """Médico responsable de cada registro a crear (por defecto, el campo `doctor`)."""
+        return [vals.get('doctor') for vals in vals_list]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        missing = [vals for vals in vals_list if not vals.get('stock_location_id')]
+        if missing and not self.env.context.get('default_stock_location_id'):
+            doctors = self._stock_doctors(missing)
+            by_doctor = self.env['vet.stock.location']._for_doctors(set(doctors))
+            for vals, doctor in zip(missing, doctors):
+                vals['stock_location_id'] = by_doctor[doctor or False]
+        return super().create(vals_list)
+
+
+class StockTransfer(models.Model):
+    """Recepción de proveedor o traslado entre ubicaciones (p. ej. cargar la ambulancia)."""
+    _name = "vet.stock.transfer"
+    _description = "Recepción / transferencia de stock"
+    _inherit = ['mail.thread']
+    _order = "date desc, id desc"
+
+    name = fields.Char(string="Número", readonly=True, copy=False, default=lambda self: _("Nuevo"))
+    transfer_type = fields.Selection([
+        ('receipt', 'Recepción'),
+        ('internal', 'Transferencia'),
+    ], string="Tipo", required=True, default='internal')
+    location_id = fields.Many2one("vet.stock.location", string="Desde", ondelete='restrict')
+    location_dest_id = fields.Many2one("vet.stock.location", string="Hacia", required=True, ondelete='restrict',
+                                       default=lambda self: self.env['vet.stock.location'].search(
+                                           [('is_default', '=', True)], limit=1))
+    date = fields.Datetime(string="Fecha", required=True, default=fields.Datetime.now)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('done', 'Realizada'),
+        ('cancelled', 'Cancelada'),
+    ], string="Estado", default='draft', required=True, tracking=True)
+    origin = fields.Char(string="Referencia", help="Factura o guía del proveedor, campaña, etc.")
+    line_ids = fields.One2many("vet.stock.transfer.line", "transfer_id", string="Productos", copy=True)
+    move_ids = fields.One2many("vet.stock.move", "transfer_id", string="Movimientos", readonly=True)
+
+    @api.constrains('transfer_type', 'location_id', 'location_dest_id')
+    def _check_locations(self):
+        for rec in self:
+            if rec.transfer_type == 'internal' and not rec.location_id:
+                raise ValidationError(_("Indique la ubicación de origen de la transferencia."))
+            if rec.location_id and rec.location_id == rec.location_dest_id:
+                raise ValidationError(_("El origen y el destino deben ser distintos."))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if not vals.get('name') or vals['name'] == _("Nuevo"):
+                vals['name'] = self.env['ir.sequence'].next_by_code('vet.stock.transfer.sequence') or _("Nuevo")
+        return super().create(vals_list)
+
+    def action_done(self):
+        """Valida las transferencias en borrador; los movimientos de todas se registran en un solo lote."""
+        records = self.filtered(lambda rec: rec.state == 'draft')
+        empty = records.filtered(lambda rec: not rec.line_ids)
+        if empty:
+            raise UserError(_("Agregue productos a %s.") % ", ".join(empty.mapped('name')))
+        vals_list = []
+        received = defaultdict(float)
+        for rec in records:
+            for line in rec.line_ids:
+                if rec.transfer_type == 'receipt':
+                    received[line._product()] += line.quantity
+                vals_list.append(line._move_vals())
+        # Lo recibido entra al total como unidades sueltas: una escritura por producto.
+        for product, quantity in received.items():
+            product = product.with_context(vet_stock_engine=True)
+            product[product._stock_loose_field] += quantity
+        self.env['vet.stock.move']._post(vals_list)
+        records.write({'state': 'done'})
+        return True
+
+    def action_cancel(self):
+        if self.filtered(lambda rec: rec.state == 'done'):
+            raise UserError(_("Una transferencia realizada no se puede cancelar; registre la inversa."))
+        self.write({'state': 'cancelled'})
+        return True
+
+
+class StockTransferLine(models.Model):
+    _name = "vet.stock.transfer.line"
+    _description = "Producto de la transferencia"
+
+    transfer_id = fields.Many2one("vet.stock.transfer", string="Transferencia", required=True, ondelete='cascade',
+                                  index=True)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo", required=True, default='vaccine')
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='restrict')
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", ondelete='restrict')
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='restrict')
+    quantity = fields.Float(string="Cantidad", required=True, default=1.0,
+                            help="En unidades base: dosis para vacunas, unidades para medicamentos y desparasitantes.")
+
+    _sql_constraints = [
+        ('quantity_positive', 'CHECK(quantity > 0)', 'La cantidad debe ser positiva.'),
+    ]
+
+    @api.constrains('product_type', 'vaccine_id', 'medicine_id', 'dewormer_id')
+    def _check_product(self):
+        for line in self:
+            if not line[PRODUCT_TYPE_FIELDS[line.product_type]]:
+                raise ValidationError(_("Indique el producto de cada línea."))
+
+    @api.onchange('product_type')
+    def _onchange_product_type(self):
+        for line in self:
+            for product_type, field_name in PRODUCT_TYPE_FIELDS.items():
+                if product_type != line.product_type:
+                    line[field_name] = False
+
+    def _product(self):
+        self.ensure_one()
+        return self[PRODUCT_TYPE_FIELDS[self.product_type]]
+
+    def _move_vals(self):
+        self.ensure_one()
+        transfer = self.transfer_id
+        return {
+            'move_type': transfer.transfer_type,
+            'product_type': self.product_type,
+            PRODUCT_TYPE_FIELDS[self.product_type]: self._product().id,
+            'quantity': self.quantity,
+            'location_id': transfer.location_id.id if transfer.transfer_type == 'internal' else False,
+            'location_dest_id': transfer.location_dest_id.id,
+            'transfer_id': transfer.id,
+            'date': transfer.date,
+            'origin': transfer.origin or transfer.name,
+        }
@@ -0,0 +1,452 @@
+import logging
+from collections import defaultdict, deque
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+from odoo.tools.sql import create_index, create_unique_index
+
+from .stock_locations import PRODUCT_TYPES, PRODUCT_TYPE_FIELDS, QTY_TOLERANCE
+
+_logger = logging.getLogger(__name__)
+
+# Clave de producto en SQL: las tres columnas, con 0 en las que no aplican.
+PRODUCT_KEY_SQL = "coalesce({alias}vaccine_id, 0), coalesce({alias}medicine_id, 0), coalesce({alias}dewormer_id, 0)"
+
+
+def product_key_sql(alias=''):
+    return PRODUCT_KEY_SQL.format(alias=alias and alias + '.')
+
+
+class StockProductMixin(models.AbstractModel):
+    _inherit = "vet.stock.product.mixin"
+
+    standard_cost = fields.Float(
+        string="Costo unitario",
+        digits=(16, 4),
+        help="Costo de la unidad base (dosis o unidad). Se actualiza con cada recepción y valoriza "
+             "devoluciones y ajustes."
+    )
+    stock_value = fields.Float(
+        string="Valor del stock",
+        compute="_compute_stock_value",
+        digits=(16, 2),
+        help="Valor FIFO de las capas de costo con saldo."
+    )
+
+    def _compute_stock_value(self):
+        field_name = PRODUCT_TYPE_FIELDS[self._stock_product_type]
+        values = dict(self.env['vet.stock.layer']._read_group(
+            [(field_name, 'in', self.ids), ('remaining_qty', '>', 0)],
+            groupby=[field_name],
+            aggregates=['remaining_value:sum'],
+        ))
+        for rec in self:
+            rec.stock_value = values.get(rec, 0.0)
+
+
+class StockMove(models.Model):
+    _inherit = "vet.stock.move"
+
+    unit_cost = fields.Float(string="Costo unitario", digits=(16, 4), readonly=True)
+    value = fields.Float(
+        string="Valor",
+        digits=(16, 2),
+        readonly=True,
+        help="Valor que entra o sale del inventario; los traslados internos no cambian el valor."
+    )
+
+    @api.model
+    def _post(self, vals_list):
+        moves = super()._post(vals_list)
+        self.env['vet.stock.layer']._apply(moves)
+        return moves
+
+    def _product(self):
+        self.ensure_one()
+        return self[PRODUCT_TYPE_FIELDS[self.product_type]]
+
+    def _product_key(self):
+        self.ensure_one()
+        return (self.product_type, self.vaccine_id.id or 0, self.medicine_id.id or 0, self.dewormer_id.id or 0)
+
+
+class StockLayer(models.Model):
+    """
+    Capa de costo FIFO: cada entrada al inventario (recepción, stock inicial,
+    devolución, ajuste) abre una con su costo unitario y cada salida consume
+    las más antiguas. El saldo de las capas es el valor del stock.
+    """
+    _name = "vet.stock.layer"
+    _description = "Capa de costo de stock"
+    _order = "date, id"
+    _log_access = False
+
+    date = fields.Datetime(string="Fecha", required=True, readonly=True)
+    move_id = fields.Many2one("vet.stock.move", string="Movimiento", ondelete='set null', readonly=True)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo", required=True, readonly=True)
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='cascade', readonly=True)
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", ondelete='cascade', readonly=True)
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='cascade', readonly=True)
+    quantity = fields.Float(string="Cantidad", readonly=True, digits=(16, 2))
+    unit_cost = fields.Float(string="Costo unitario", readonly=True, digits=(16, 4))
+    value = fields.Float(string="Valor", readonly=True, digits=(16, 2))
+    remaining_qty = fields.Float(string="Cantidad restante", readonly=True, digits=(16, 2))
+    remaining_value = fields.Float(string="Valor restante", readonly=True, digits=(16, 2))
+
+    def init(self):
+        # Capas con saldo de cada producto en orden FIFO; las agotadas quedan fuera del índice.
+        create_index(self._cr, 'vet_stock_layer_fifo_index', self._table,
+                     ['(coalesce(vaccine_id, 0))', '(coalesce(medicine_id, 0))', '(coalesce(dewormer_id, 0))',
+                      'date', 'id'],
+                     where="remaining_qty > 0")
+
+    @api.model
+    def _apply(self, moves):
+        """
+        Valoriza un lote de movimientos: las entradas abren capas, las salidas
+        consumen las más antiguas y el saldo diario de cada producto se
+        actualiza con los importes, sin recorrer movimientos anteriores.
+        """
+        incoming = moves.filtered(lambda move: not move.location_id)
+        outgoing = moves.filtered(lambda move: not move.location_dest_id)
+        if not incoming and not outgoing:
+            return
+        costs = {}
+        for move in incoming:
+            # Una recepción sin costo se valoriza al costo estándar, no a cero.
+            unit_cost = move.unit_cost if move.move_type == 'receipt' and move.unit_cost else move._product().standard_cost
+            costs[move.id] = (unit_cost, move.quantity * unit_cost)
+        self.create([{
+            'date': move.date,
+            'move_id': move.id,
+            'product_type': move.product_type,
+            PRODUCT_TYPE_FIELDS[move.product_type]: move._product().id,
+            'quantity': move.quantity,
+            'unit_cost': costs[move.id][0],
+            'value': costs[move.id][1],
+            'remaining_qty': move.quantity,
+            'remaining_value': costs[move.id][1],
+        } for move in incoming])
+        costs.update(self._consume(outgoing))
+
+        execute_values(self.env.cr._obj, """
+            UPDATE vet_stock_move m
+               SET unit_cost = v.unit_cost, value = v.value
+              FROM (VALUES %s) AS v(id, unit_cost, value)
+             WHERE m.id = v.id
+        """, [(move_id, unit_cost, value) for move_id, (unit_cost, value) in costs.items()], page_size=len(costs))
+        moves.invalidate_recordset(['unit_cost', 'value'])
+
+        deltas = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])
+        incoming_ids = set(incoming.ids)
+        for move in incoming | outgoing:
+            delta = deltas[move._product_key() + (move.date.date(),)]
+            value = costs[move.id][1]
+            if move.id in incoming_ids:
+                delta[0] += move.quantity
+                delta[2] += value
+            else:
+                delta[1] += move.quantity
+                delta[3] += value
+        self.env['vet.stock.valuation.day']._apply(deltas)
+
+    @api.model
+    def _consume(self, moves):
+        """
+        Descuenta las salidas de las capas con saldo, de la más antigua a la
+        más nueva. Las capas se leen y bloquean con una consulta para todo el
+        lote y se actualizan con otra. Devuelve {move_id: (costo unitario, valor)}.
+        """
+        if not moves:
+            return {}
+        self.flush_model()
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, {key}, remaining_qty, remaining_value
+              FROM vet_stock_layer
+             WHERE remaining_qty > 0 AND ({key}) IN %s
+          ORDER BY date, id
+               FOR UPDATE
+        """.format(key=product_key_sql()), [tuple({move._product_key()[1:] for move in moves})])
+        queues = defaultdict(deque)
+        for layer_id, vaccine_id, medicine_id, dewormer_id, qty, value in cr.fetchall():
+            queues[(vaccine_id, medicine_id, dewormer_id)].append([layer_id, qty, value])
+
+        costs = {}
+        touched = {}
+        for move in moves.sorted('id'):
+            queue = queues[move._product_key()[1:]]
+            needed = move.quantity
+            value = 0.0
+            while needed > QTY_TOLERANCE and queue:
+                layer = queue[0]
+                layer_id, qty, layer_value = layer
+                if qty <= needed + QTY_TOLERANCE:
+                    # Se agota la capa: sale con todo su valor restante, sin residuos de redondeo.
+                    taken_qty, taken_value = qty, layer_value
+                    queue.popleft()
+                else:
+                    taken_qty, taken_value = needed, layer_value * needed / qty
+                layer[1] -= taken_qty
+                layer[2] -= taken_value
+                touched[layer_id] = (max(layer[1], 0.0), max(layer[2], 0.0))
+                needed -= taken_qty
+                value += taken_value
+            if needed > QTY_TOLERANCE:
+                product = move._product()
+                _logger.warning("vet.stock.layer: faltan %.2f de %s en las capas; se valorizan al costo unitario",
+                                needed, product.display_name)
+                value += needed * product.standard_cost
+            costs[move.id] = (value / move.quantity, value)
+
+        if touched:
+            execute_values(cr._obj, """
+                UPDATE vet_stock_layer l
+                   SET remaining_qty = v.qty, remaining_value = v.value
+                  FROM (VALUES %s) AS v(id, qty, value)
+                 WHERE l.id = v.id
+            """, [(layer_id,) + remaining for layer_id, remaining in touched.items()], page_size=len(touched))
+            self.invalidate_model(['remaining_qty', 'remaining_value'])
+        return costs
+
+    @api.model
+    def _seed_layers(self):
+        """
+        Abre una capa al costo unitario del producto para el stock que todavía
+        no tiene capas (bases con stock por ubicación previo a la valorización).
+        """
+        self.env['vet.stock.quant'].flush_model()
+        self.flush_model()
+        cr = self.env.cr
+        cr.execute("""
+            SELECT q.product_type, {key}, sum(q.quantity)
+              FROM vet_stock_quant q
+             WHERE NOT EXISTS (
+                    SELECT 1 FROM vet_stock_layer l
+                     WHERE l.vaccine_id IS NOT DISTINCT FROM q.vaccine_id
+                       AND l.medicine_id IS NOT DISTINCT FROM q.medicine_id
+                       AND l.dewormer_id IS NOT DISTINCT FROM q.dewormer_id)
+          GROUP BY q.product_type, {key}
+            HAVING sum(q.quantity) > %s
+        """.format(key=product_key_sql('q')), [QTY_TOLERANCE])
+        rows = cr.fetchall()
+        if not rows:
+            return
+        now = fields.Datetime.now()
+        Quant = self.env['vet.stock.quant']
+        vals_list = []
+        deltas = {}
+        for product_type, vaccine_id, medicine_id, dewormer_id, quantity in rows:
+            product = Quant._product_browse(vaccine_id, medicine_id, dewormer_id)
+            value = quantity * product.standard_cost
+            vals_list.append({
+                'date': now,
+                'product_type': product_type,
+                PRODUCT_TYPE_FIELDS[product_type]: product.id,
+                'quantity': quantity,
+                'unit_cost': product.standard_cost,
+                'value': value,
+                'remaining_qty': quantity,
+                'remaining_value': value,
+            })
+            deltas[(product_type, vaccine_id, medicine_id, dewormer_id, now.date())] = [quantity, 0.0, value, 0.0]
+        self.create(vals_list)
+        self.env['vet.stock.valuation.day']._apply(deltas)
+        _logger.info("vet.stock.layer: capas iniciales para %s productos", len(rows))
+
+
+class StockValuationDay(models.Model):
+    """
+    Entradas, salidas y saldo acumulado (cantidad y valor) de cada producto
+    por día. Cada lote de movimientos suma su diferencia al día con un upsert;
+    el valor a una fecha es el último saldo de cada producto, sin sumar
+    movimientos ni capas.
+    """
+    _name = "vet.stock.valuation.day"
+    _description = "Valorización diaria de stock"
+    _order = "day desc, product_type, id"
+    _log_access = False
+
+    day = fields.Date(string="Día", required=True, readonly=True)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo", required=True, readonly=True)
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna", ondelete='cascade', readonly=True)
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento", ondelete='cascade', readonly=True)
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante", ondelete='cascade', readonly=True)
+    product_name = fields.Char(string="Producto", compute="_compute_product_name")
+    qty_in = fields.Float(string="Entradas", readonly=True, digits=(16, 2))
+    qty_out = fields.Float(string="Salidas", readonly=True, digits=(16, 2))
+    value_in = fields.Float(string="Valor entrado", readonly=True, digits=(16, 2))
+    value_out = fields.Float(string="Valor salido", readonly=True, digits=(16, 2))
+    balance_qty = fields.Float(string="Saldo", readonly=True, digits=(16, 2), group_operator=False)
+    balance_value = fields.Float(string="Valor del saldo", readonly=True, digits=(16, 2), group_operator=False)
+
+    def init(self):
+        # Sirve al upsert y a "último saldo de cada producto hasta una fecha".
+        create_unique_index(
+            self._cr, 'vet_stock_valuation_day_product_day_uniq', self._table,
+            ['(coalesce(vaccine_id, 0))', '(coalesce(medicine_id, 0))', '(coalesce(dewormer_id, 0))', 'day'],
+        )
+
+    @api.depends('vaccine_id', 'medicine_id', 'dewormer_id')
+    def _compute_product_name(self):
+        for rec in self:
+            rec.product_name = (rec.vaccine_id or rec.medicine_id or rec.dewormer_id).name
+
+    @api.model
+    def _apply(self, deltas):
+        """
+        Suma {(tipo, vacuna, medicamento, desparasitante, día): [entradas,
+        salidas, valor entrado, valor salido]} a los días. Un día nuevo parte
+        del saldo del día anterior; si el movimiento tiene fecha pasada, el
+        saldo de los días siguientes se corrige con un UPDATE sobre el índice.
+        """
+        if not deltas:
+            return
+        self.flush_model()
+        cr = self.env.cr
+        rows = [key + tuple(delta) for key, delta in deltas.items()]
+        execute_values(cr._obj, """
+            INSERT INTO vet_stock_valuation_day AS d
+                   (product_type, vaccine_id, medicine_id, dewormer_id, day,
+                    qty_in, qty_out, value_in, value_out, balance_qty, balance_value)
+            SELECT v.product_type, nullif(v.vaccine_id, 0), nullif(v.medicine_id, 0), nullif(v.dewormer_id, 0), v.day,
+                   v.qty_in, v.qty_out, v.value_in, v.value_out,
+                   coalesce(p.balance_qty, 0) + v.qty_in - v.qty_out,
+                   coalesce(p.balance_value, 0) + v.value_in - v.value_out
+              FROM (VALUES %s) AS v(product_type, vaccine_id, medicine_id, dewormer_id, day,
+                                    qty_in, qty_out, value_in, value_out)
+         LEFT JOIN LATERAL (
+                    SELECT b.balance_qty, b.balance_value
+                      FROM vet_stock_valuation_day b
+                     WHERE ({key}) = (v.vaccine_id, v.medicine_id, v.dewormer_id) AND b.day < v.day
+                  ORDER BY {key}, b.day DESC
+                     LIMIT 1
+                   ) p ON TRUE
+            ON CONFLICT ((coalesce(vaccine_id, 0)), (coalesce(medicine_id, 0)), (coalesce(dewormer_id, 0)), day)
+            DO UPDATE SET qty_in = d.qty_in + EXCLUDED.qty_in,
+                          qty_out = d.qty_out + EXCLUDED.qty_out,
+                          value_in = d.value_in + EXCLUDED.value_in,
+                          value_out = d.value_out + EXCLUDED.value_out,
+                          balance_qty = d.balance_qty + EXCLUDED.qty_in - EXCLUDED.qty_out,
+                          balance_value = d.balance_value + EXCLUDED.value_in - EXCLUDED.value_out
+        """.format(key=product_key_sql('b')), rows,
+            template="(%s, %s, %s, %s, %s::date, %s::float8, %s::float8, %s::float8, %s::float8)", page_size=len(rows))
+        execute_values(cr._obj, """
+            UPDATE vet_stock_valuation_day d
+               SET balance_qty = d.balance_qty + v.qty, balance_value = d.balance_value + v.value
+              FROM (VALUES %s) AS v(vaccine_id, medicine_id, dewormer_id, day, qty, value)
+             WHERE ({key}) = (v.vaccine_id, v.medicine_id, v.dewormer_id) AND d.day > v.day
+        """.format(key=product_key_sql('d')), [
+            key[1:] + (delta[0] - delta[1], delta[2] - delta[3]) for key, delta in deltas.items()
+        ], template="(%s, %s, %s, %s::date, %s::float8, %s::float8)", page_size=len(rows))
+        self.invalidate_model()
+
+    @api.model
+    def _valuation_at(self, date, product_type=None):
+        """[(tipo, vacuna, medicamento, desparasitante, cantidad, valor)] al cierre de `date`: el último saldo de cada producto."""
+        self.flush_model()
+        where = "day <= %s"
+        params = [date]
+        if product_type:
+            where += " AND product_type = %s"
+            params.append(product_type)
+        self.env.cr.execute("""
+            SELECT DISTINCT ON ({key}) product_type, vaccine_id, medicine_id, dewormer_id, balance_qty, balance_value
+              FROM vet_stock_valuation_day
+             WHERE {where}
+          ORDER BY {key}, day DESC
+        """.format(key=product_key_sql(), where=where), params)
+        return [row for row in self.env.cr.fetchall() if abs(row[4]) > QTY_TOLERANCE or abs(row[5]) > QTY_TOLERANCE]
+
+
+class StockValuationReport(models.TransientModel):
+    """Valor del inventario por producto al cierre de una fecha."""
+    _name = "vet.stock.valuation.report"
+    _description = "Valorización de stock"
+
+    date = fields.Date(string="Al día", required=True, default=fields.Date.context_today)
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo de producto")
+    line_ids = fields.One2many("vet.stock.valuation.report.line", "report_id", string="Productos", readonly=True)
+    total_value = fields.Float(string="Valor total", compute="_compute_total_value", digits=(16, 2))
+
+    @api.depends('line_ids.value')
+    def _compute_total_value(self):
+        for rec in self:
+            rec.total_value = sum(rec.line_ids.mapped('value'))
+
+    def action_compute(self):
+        self.ensure_one()
+        rows = self.env['vet.stock.valuation.day']._valuation_at(self.date, self.product_type)
+        self.line_ids = [(5, 0, 0)] + [
+            (0, 0, {
+                'product_type': product_type,
+                'vaccine_id': vaccine_id,
+                'medicine_id': medicine_id,
+                'dewormer_id': dewormer_id,
+                'quantity': quantity,
+                'value': value,
+            })
+            for product_type, vaccine_id, medicine_id, dewormer_id, quantity, value in rows
+        ]
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+
+class StockValuationReportLine(models.TransientModel):
+    _name = "vet.stock.valuation.report.line"
+    _description = "Línea de valorización de stock"
+    _order = "product_type, value desc"
+
+    report_id = fields.Many2one("vet.stock.valuation.report", required=True, ondelete='cascade')
+    product_type = fields.Selection(PRODUCT_TYPES, string="Tipo")
+    vaccine_id = fields.Many2one("animal.vaccine", string="Vacuna")
+    medicine_id = fields.Many2one("animal.medicine", string="Medicamento")
+    dewormer_id = fields.Many2one("animal.dewormer", string="Desparasitante")
+    product_name = fields.Char(string="Producto", compute="_compute_product_name")
+    quantity = fields.Float(string="Cantidad", digits=(16, 2))
+    value = fields.Float(string="Valor", digits=(16, 2))
+    unit_cost = fields.Float(string="Costo medio", compute="_compute_product_name", digits=(16, 4))
+
+    @api.depends('vaccine_id', 'medicine_id', 'dewormer_id', 'quantity', 'value')
+    def _compute_product_name(self):
+        for line in self:
+            line.product_name = (line.vaccine_id or line.medicine_id or line.dewormer_id).name
+            line.unit_cost = line.value / line.quantity if line.quantity else 0.0
+
+
+class StockTransfer(models.Model):
+    _inherit = "vet.stock.transfer"
+
+    def action_done(self):
+        receipts = self.filtered(lambda rec: rec.state == 'draft' and rec.transfer_type == 'receipt')
+        res = super().action_done()
+        # El último costo de compra valoriza devoluciones y ajustes.
+        for line in receipts.line_ids.filtered('unit_cost'):
+            line._product().standard_cost = line.unit_cost
+        return res
+
+
+class StockTransferLine(models.Model):
+    _inherit = "vet.stock.transfer.line"
+
+    unit_cost = fields.Float(string="Costo unitario", digits=(16, 4),
+                             help="Costo de compra de la unidad base; abre la capa de costo de la recepción.")
+
+    @api.onchange('vaccine_id', 'medicine_id', 'dewormer_id')
+    def _onchange_product_cost(self):
+        for line in self:
+            product = line._product()
+            if product:
+                line.unit_cost = product.standard_cost
+
+    def _move_vals(self):
+        vals = super()._move_vals()
+        if self.transfer_id.transfer_type == 'receipt':
+            vals['unit_cost'] = self.unit_cost
+        return vals
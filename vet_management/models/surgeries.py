@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -22,6 +24,49 @@ class Surgery(models.Model):
     default_duration_min = fields.Integer(string="Duración estimada (min)", help="Duración típica, solo referencial.")
     description = fields.Text(string="Descripción / Indicaciones")
     notes = fields.Text(string="Notas internas")
+    kit_line_ids = fields.One2many(
+        "animal.surgery.kit.line",
+        "surgery_id",
+        string="Kit de consumos",
+        copy=True,
+        help="Medicamentos/insumos que se cargan al aplicar el kit en un registro quirúrgico."
+    )
+
+
+class SurgeryKitLine(models.Model):
+    """
+    Línea del kit de consumos de una cirugía del catálogo (p. ej. OVH): se copia
+    como línea de consumo en cada registro quirúrgico al aplicar el kit.
+    """
+    _name = "animal.surgery.kit.line"
+    _description = "Línea de kit de cirugía"
+    _order = "surgery_id, sequence, id"
+
+    surgery_id = fields.Many2one(
+        "animal.surgery",
+        string="Cirugía",
+        required=True,
+        ondelete="cascade",
+        index=True
+    )
+    sequence = fields.Integer(string="Secuencia", default=10)
+    medicine_id = fields.Many2one(
+        "animal.medicine",
+        string="Medicamento/Consumible",
+        required=True,
+        ondelete="restrict"
+    )
+    quantity_units = fields.Float(
+        string="Cantidad (unidades)",
+        default=1.0,
+        help="Cantidad por cirugía en unidades base (p. ej. mL, tabletas)."
+    )
+    consume_stock = fields.Boolean(string="Descontar stock", default=True)
+    notes = fields.Char(string="Notas")
+
+    _sql_constraints = [
+        ('qty_non_negative', 'CHECK(quantity_units >= 0)', 'La cantidad debe ser mayor o igual a 0.')
+    ]
 
 
 class SurgeryMedicationLine(models.Model):
@@ -31,6 +76,7 @@ class SurgeryMedicationLine(models.Model):
     """
     _name = "animal.surgery.medication.line"
     _description = "Línea de medicamentos de cirugía"
+    _inherit = ['vet.stock.consumer.mixin']
     _order = "id asc"
 
     surgery_record_id = fields.Many2one(
@@ -63,19 +109,31 @@ class SurgeryMedicationLine(models.Model):
         ('qty_non_negative', 'CHECK(quantity_units >= 0)', 'La cantidad debe ser mayor o igual a 0.')
     ]
 
-    # === Movimiento de stock ===
     @api.model
-    def create(self, vals):
-        rec = super().create(vals)
-        if rec.consume_stock and rec.medicine_id and rec.quantity_units:
-            rec.medicine_id._consume_units(rec.quantity_units)
-        return rec
+    def _stock_doctors(self, vals_list):
+        # Sin campo propio de médico: descuentan de la ubicación del cirujano.
+        record_ids = {vals.get('surgery_record_id') for vals in vals_list} - {None, False}
+        surgeons = {rec.id: rec.surgeon for rec in self.env['animal.surgery.record'].browse(record_ids)}
+        return [surgeons.get(vals.get('surgery_record_id')) for vals in vals_list]
+
+    # === Movimiento de stock ===
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if self.env.context.get('vet_stock_consumed'):
+            # Stock ya descontado en bloque (p. ej. al aplicar un kit).
+            return records
+        for rec in records:
+            if rec.consume_stock and rec.medicine_id and rec.quantity_units:
+                rec.medicine_id._consume_units(rec.quantity_units, rec.stock_location_id)
+        return records
 
     def write(self, vals):
         before = {r.id: {
             'medicine_id': r.medicine_id.id,
             'quantity_units': float(r.quantity_units or 0.0),
             'consume_stock': bool(r.consume_stock),
+            'stock_location_id': r.stock_location_id,
         } for r in self}
         res = super().write(vals)
         for r in self:
@@ -87,32 +145,34 @@ class SurgeryMedicationLine(models.Model):
             new_med = r.medicine_id
             new_qty = float(r.quantity_units or 0.0)
             new_consume = bool(r.consume_stock)
+            prev_loc = prev['stock_location_id']
+            new_loc = r.stock_location_id
 
             # 1) Antes consumía y ahora NO -> revertir
             if prev_consume and not new_consume and prev_med and prev_qty:
-                prev_med._revert_units(prev_qty)
+                prev_med._revert_units(prev_qty, prev_loc)
             # 2) Antes NO y ahora SÍ -> consumir
             elif not prev_consume and new_consume and new_med and new_qty:
-                new_med._consume_units(new_qty)
+                new_med._consume_units(new_qty, new_loc)
             # 3) Sigue consumiendo -> revisar cambios
             elif prev_consume and new_consume:
-                if prev_med and new_med and prev_med.id != new_med.id:
+                if prev_med and new_med and (prev_med.id != new_med.id or prev_loc != new_loc):
                     if prev_qty:
-                        prev_med._revert_units(prev_qty)
+                        prev_med._revert_units(prev_qty, prev_loc)
                     if new_qty:
-                        new_med._consume_units(new_qty)
+                        new_med._consume_units(new_qty, new_loc)
                 else:
                     delta = new_qty - prev_qty
                     if delta > 0:
-                        new_med._consume_units(delta)
+                        new_med._consume_units(delta, new_loc)
                     elif delta < 0:
-                        new_med._revert_units(-delta)
+                        new_med._revert_units(-delta, new_loc)
         return res
 
     def unlink(self):
         for r in self:
             if r.consume_stock and r.medicine_id and r.quantity_units:
-                r.medicine_id._revert_units(r.quantity_units)
+                r.medicine_id._revert_units(r.quantity_units, r.stock_location_id)
         return super().unlink()
 
 
@@ -123,8 +183,9 @@ class SurgeryRecord(models.Model):
     """
     _name = "animal.surgery.record"
     _description = "Registro de cirugías por animal"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.clinical.search.mixin', 'vet.optimistic.lock.mixin']
     _order = "date desc, id desc"
+    _clinical_search_fields = {'complications': 'A', 'procedure_details': 'B'}
 
     # Identificador / referencia
     sequence = fields.Char(
@@ -263,6 +324,7 @@ class SurgeryRecord(models.Model):
         "surgery_record_id",
         string="Consumos / Medicación intra-quirúrgica"
     )
+    kit_applied = fields.Boolean(string="Kit aplicado", copy=False, readonly=True)
 
     # Adjuntos adicionales
     attachment_ids = fields.Many2many(
@@ -287,17 +349,15 @@ class SurgeryRecord(models.Model):
         Si el animal tiene 'médico tratante', proponerlo como Cirujano.
         Sugerimos consentimiento firmado más reciente del animal.
         """
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.surgeon:
-                rec.surgeon = rec.animal_id.treating_doctor
-            if rec.animal_id and not rec.consent_id:
-                consent = self.env['animal.consent'].search([
-                    ('animal_id', '=', rec.animal_id.id),
-                    ('state', '=', 'signed'),
-                    ('consent_type', 'in', ('surgery', 'anesthesia'))
-                ], order='date desc', limit=1)
-                if consent:
-                    rec.consent_id = consent.id
+            patient = patients.get(rec.animal_id._origin.id)
+            if not patient:
+                continue
+            if patient['treating_doctor'] and not rec.surgeon:
+                rec.surgeon = patient['treating_doctor']
+            if not rec.consent_id and patient['surgical_consent_id']:
+                rec.consent_id = patient['surgical_consent_id']
 
     def name_get(self):
         res = []
@@ -310,27 +370,62 @@ class SurgeryRecord(models.Model):
 
     # === Acciones de flujo ===
     def action_start(self):
-        for rec in self:
-            if rec.state not in ('scheduled',):
-                raise UserError(_("Solo se puede iniciar una cirugía programada."))
-            rec.state = 'in_progress'
+        if any(rec.state != 'scheduled' for rec in self):
+            raise UserError(_("Solo se puede iniciar una cirugía programada."))
+        self._claim(('scheduled',))
+        self.write({'state': 'in_progress'})
         return True
 
     def action_done(self):
-        for rec in self:
-            if rec.state not in ('in_progress', 'scheduled'):
-                raise UserError(_("Solo se puede finalizar una cirugía en curso o programada."))
-            rec.state = 'done'
+        if any(rec.state not in ('in_progress', 'scheduled') for rec in self):
+            raise UserError(_("Solo se puede finalizar una cirugía en curso o programada."))
+        self._claim(('in_progress', 'scheduled'))
+        self.write({'state': 'done'})
         return True
 
     def action_cancel(self):
-        for rec in self:
-            if rec.state == 'done':
-                raise UserError(_("No es posible cancelar una cirugía completada."))
-            rec.state = 'cancelled'
+        if any(rec.state == 'done' for rec in self):
+            raise UserError(_("No es posible cancelar una cirugía completada."))
+        records = self.filtered(lambda rec: rec.state != 'cancelled')
+        records._claim(('scheduled', 'in_progress'))
+        records.write({'state': 'cancelled'})
         return True
 
     def action_reset_to_scheduled(self):
-        for rec in self:
-            rec.state = 'scheduled'
+        records = self.filtered(lambda rec: rec.state != 'scheduled')
+        records._claim(('in_progress', 'done', 'cancelled'))
+        records.write({'state': 'scheduled'})
+        return True
+
+    def action_apply_kit(self):
+        """
+        Carga el kit de la cirugía del catálogo como líneas de consumo. Para
+        muchas cirugías a la vez (jornadas de esterilización) las líneas se crean
+        en un solo lote y el stock se descuenta una vez por medicamento.
+        """
+        records = self.filtered(
+            lambda rec: not rec.kit_applied and rec.state != 'cancelled' and rec.surgery_id.kit_line_ids
+        )
+        if not records:
+            raise UserError(_("No hay kits pendientes de aplicar en las cirugías seleccionadas."))
+        # Cada cirugía descuenta de la ubicación de su cirujano/a.
+        by_doctor = self.env['vet.stock.location']._for_doctors(records.mapped('surgeon'))
+        line_vals = []
+        units_by_medicine = defaultdict(float)
+        for rec in records:
+            location_id = by_doctor[rec.surgeon or False]
+            for kit_line in rec.surgery_id.kit_line_ids:
+                line_vals.append({
+                    'surgery_record_id': rec.id,
+                    'medicine_id': kit_line.medicine_id.id,
+                    'quantity_units': kit_line.quantity_units,
+                    'consume_stock': kit_line.consume_stock,
+                    'stock_location_id': location_id,
+                    'notes': kit_line.notes,
+                })
+                if kit_line.consume_stock:
+                    units_by_medicine[kit_line.medicine_id.id, location_id] += kit_line.quantity_units
+        self.env['animal.medicine']._consume_units_grouped(units_by_medicine)
+        self.env['animal.surgery.medication.line'].with_context(vet_stock_consumed=True).create(line_vals)
+        records.write({'kit_applied': True})
         return True
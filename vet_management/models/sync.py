@@ -0,0 +1,316 @@
+import logging
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+
+from .keyset_mixin import decode_cursor, encode_cursor
+
+_logger = logging.getLogger(__name__)
+
+# Modelos que el dispositivo descarga (campos en el orden de las filas compactas).
+PULL_MODELS = {
+    'animal': [
+        'identification', 'name', 'species', 'breed', 'sex', 'birthdate', 'owner',
+        'microchip_number', 'weight', 'treating_doctor', 'active',
+    ],
+    'animal.vaccine': ['name', 'doses_per_vial'],
+    'animal.dewormer': ['name', 'units_per_pack'],
+    'animal.vaccination': [
+        'sync_uuid', 'animal_id', 'vaccine_id', 'date', 'next_date', 'route', 'doctor',
+        'applied_doses', 'lot_number', 'lot_expiration', 'notes',
+    ],
+    'animal.deworming': [
+        'sync_uuid', 'animal_id', 'dewormer_id', 'date', 'next_date', 'route', 'doctor',
+        'quantity_units', 'lot_number', 'lot_expiration', 'notes',
+    ],
+}
+
+# Modelos que el dispositivo puede subir y campos aceptados.
+PUSH_MODELS = {
+    'animal.vaccination': [
+        'animal_id', 'vaccine_id', 'date', 'next_date', 'route', 'doctor',
+        'applied_doses', 'lot_number', 'lot_expiration', 'notes',
+    ],
+    'animal.deworming': [
+        'animal_id', 'dewormer_id', 'date', 'next_date', 'route', 'doctor',
+        'quantity_units', 'lot_number', 'lot_expiration', 'notes',
+    ],
+}
+
+# Clave del cursor de eliminaciones dentro de los cursores del dispositivo.
+TOMBSTONE_CURSOR = 'vet.sync.tombstone'
+TOMBSTONE_RETENTION_DAYS = 180
+# La descarga solo entrega cambios con más antigüedad que este margen (segundos).
+# write_date es la hora de inicio de la transacción y los ids se asignan antes
+# de confirmar: una transacción que empezó antes de la descarga anterior y
+# confirma después quedaría detrás del cursor. El margen debe superar la
+# duración de la transacción más larga (limit_time_real de los workers).
+SYNC_LAG_PARAM = 'vet_management.sync_lag_seconds'
+DEFAULT_SYNC_LAG_SECONDS = 120
+
+
+class SyncMixin(models.AbstractModel):
+    """
+    Modelos sincronizables: paginación por (write_date, id) y lápida al eliminar,
+    para que los dispositivos offline sepan qué borrar.
+    Nota: las eliminaciones en cascada a nivel SQL no pasan por `unlink` y no dejan lápida.
+    """
+    _name = "vet.sync.mixin"
+    _inherit = ['vet.keyset.mixin']
+    _description = "Modelo sincronizable con dispositivos offline"
+
+    def unlink(self):
+        if self:
+            self.env['vet.sync.tombstone'].sudo().create([
+                {'res_model': self._name, 'res_id': res_id} for res_id in self.ids
+            ])
+        return super().unlink()
+
+
+class SyncTombstone(models.Model):
+    _name = "vet.sync.tombstone"
+    _description = "Registro eliminado (sincronización)"
+    _order = "id"
+
+    res_model = fields.Char(string="Modelo", required=True, index=True)
+    res_id = fields.Integer(string="ID", required=True)
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        """Las lápidas antiguas se purgan; un dispositivo más atrasado debe resincronizar completo."""
+        limit_date = fields.Datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        self.search([('create_date', '<', limit_date)]).unlink()
+
+
+class SyncDevice(models.Model):
+    _name = "vet.sync.device"
+    _description = "Dispositivo de sincronización (campañas offline)"
+    _order = "last_sync desc, id desc"
+
+    name = fields.Char(string="Dispositivo", required=True)
+    device_uid = fields.Char(string="Identificador", required=True, copy=False, index=True)
+    user_id = fields.Many2one('res.users', string="Usuario", default=lambda self: self.env.user, ondelete='cascade')
+    last_sync = fields.Datetime(string="Última sincronización", readonly=True)
+    cursor_ids = fields.One2many('vet.sync.cursor', 'device_id', string="Cursores")
+    active = fields.Boolean(string="Activo", default=True)
+
+    _sql_constraints = [
+        ('device_uid_unique', 'unique(user_id, device_uid)', 'Ya existe un dispositivo con este identificador.'),
+    ]
+
+    @api.model
+    def _get_device(self, device_uid, name=None):
+        if not device_uid:
+            raise UserError(_("Falta el identificador del dispositivo."))
+        # Cada usuario solo ve y avanza los cursores de sus propios dispositivos.
+        device = self.with_context(active_test=False).search(
+            [('device_uid', '=', device_uid), ('user_id', '=', self.env.uid)], limit=1,
+        )
+        if device and not device.active:
+            raise UserError(_("El dispositivo %s está desactivado; pida a un administrador que lo reactive.")
+                            % device.name)
+        if not device:
+            device = self.create({'name': name or device_uid, 'device_uid': device_uid})
+        return device
+
+    @api.model
+    def _sync_horizon(self):
+        """Instante hasta el que se entregan cambios: ahora menos el margen de seguridad."""
+        lag = self.env['ir.config_parameter'].sudo().get_param(SYNC_LAG_PARAM)
+        return fields.Datetime.now() - timedelta(seconds=int(lag or DEFAULT_SYNC_LAG_SECONDS))
+
+    def _get_cursors(self):
+        self.ensure_one()
+        return {cursor.res_model: cursor.cursor for cursor in self.cursor_ids}
+
+    def _store_cursors(self, cursors):
+        """Guarda los cursores que el dispositivo confirma haber aplicado."""
+        self.ensure_one()
+        known = {cursor.res_model: cursor for cursor in self.cursor_ids}
+        to_create = []
+        for res_model, token in cursors.items():
+            if res_model not in PULL_MODELS and res_model != TOMBSTONE_CURSOR:
+                continue
+            if res_model in known:
+                if known[res_model].cursor != token:
+                    known[res_model].cursor = token
+            else:
+                to_create.append({'device_id': self.id, 'res_model': res_model, 'cursor': token})
+        if to_create:
+            self.env['vet.sync.cursor'].create(to_create)
+
+    # === Descarga ===
+    def sync_pull(self, cursors=None, limit=500):
+        """
+        Cambios posteriores a los cursores del dispositivo, en filas compactas
+        (listas en el orden de ``fields``; many2one como id).
+
+        ``cursors`` son los devueltos por la descarga anterior: enviarlos confirma
+        que el dispositivo los aplicó, y solo entonces el servidor avanza. Los
+        cambios más recientes que el margen de ``SYNC_LAG_PARAM`` esperan a la
+        descarga siguiente (ver `_sync_horizon`).
+        """
+        self.ensure_one()
+        if cursors:
+            self._store_cursors(cursors)
+        stored = self._get_cursors()
+        next_cursors = dict(stored)
+        changes = {}
+        has_more = False
+        horizon = self._sync_horizon()
+
+        for model_name, field_names in PULL_MODELS.items():
+            Model = self.env[model_name].with_context(active_test=False)
+            try:
+                after = decode_cursor(stored[model_name]) if stored.get(model_name) else None
+            except ValueError:
+                after = None
+            rows = Model._keyset_search([('write_date', '<', horizon)], after=after, limit=limit)
+            if not rows:
+                continue
+            write_dates = dict(rows)
+            data = Model.browse(list(write_dates)).read(field_names, load=None)
+            changes[model_name] = {
+                'fields': ['id', 'write_date'] + field_names,
+                'rows': [
+                    [values['id'], write_dates[values['id']].isoformat()] + [values[name] for name in field_names]
+                    for values in data
+                ],
+            }
+            next_cursors[model_name] = encode_cursor(rows[-1][1], rows[-1][0])
+            has_more = has_more or len(rows) == limit
+
+        deleted = {}
+        tombstones = self.env['vet.sync.tombstone'].search_read(
+            [('id', '>', int(stored.get(TOMBSTONE_CURSOR) or 0)), ('res_model', 'in', list(PULL_MODELS)),
+             ('create_date', '<', horizon)],
+            ['res_model', 'res_id'], order='id', limit=limit,
+        )
+        for tombstone in tombstones:
+            deleted.setdefault(tombstone['res_model'], []).append(tombstone['res_id'])
+        if tombstones:
+            next_cursors[TOMBSTONE_CURSOR] = str(tombstones[-1]['id'])
+            has_more = has_more or len(tombstones) == limit
+
+        self.last_sync = fields.Datetime.now()
+        return {'changes': changes, 'deleted': deleted, 'cursors': next_cursors, 'has_more': has_more}
+
+    # === Subida ===
+    def sync_push(self, payload):
+        """
+        Aplica registros de vacunación/desparasitación hechos offline.
+
+        Cada registro trae ``uuid`` (generado en el dispositivo) y, si edita uno
+        ya sincronizado, ``base_write_date`` (el write_date que el dispositivo vio).
+        - uuid nuevo: se crea (todos los nuevos de un modelo en un solo `create`).
+        - uuid existente sin base: reenvío del mismo lote, no se aplica de nuevo,
+          así el stock nunca se descuenta dos veces.
+        - uuid existente con base: se aplica si el servidor no cambió desde base;
+          si cambió, gana el servidor y se informa el conflicto con su versión.
+        ``deleted``: {modelo: [uuid, ...]} se eliminan (devolviendo stock).
+        """
+        self.ensure_one()
+        result = {'created': {}, 'updated': {}, 'duplicates': {}, 'conflicts': [], 'errors': [], 'deleted': {}}
+        for model_name, field_names in PUSH_MODELS.items():
+            items = payload.get(model_name) or []
+            if items:
+                self._push_model(model_name, field_names, items, result)
+
+        for model_name, uuids in (payload.get('deleted') or {}).items():
+            if model_name not in PUSH_MODELS:
+                continue
+            records = self.env[model_name].search([('sync_uuid', 'in', uuids)])
+            result['deleted'][model_name] = records.mapped('sync_uuid')
+            records.unlink()
+
+        self.last_sync = fields.Datetime.now()
+        return result
+
+    def _push_model(self, model_name, field_names, items, result):
+        Model = self.env[model_name]
+        by_uuid = {}
+        for item in items:
+            if not item.get('uuid'):
+                result['errors'].append({'model': model_name, 'uuid': None, 'error': _("Registro sin uuid.")})
+                continue
+            # Dentro de un mismo lote, la última versión de cada uuid es la que vale.
+            by_uuid[item['uuid']] = item
+
+        existing = {rec.sync_uuid: rec for rec in Model.search([('sync_uuid', 'in', list(by_uuid))])}
+        server_dates = self._fetch_write_dates(Model, [rec.id for rec in existing.values()])
+
+        to_create = []
+        for uuid, item in by_uuid.items():
+            values = {name: item[name] for name in field_names if name in item}
+            record = existing.get(uuid)
+            if not record:
+                values['sync_uuid'] = uuid
+                to_create.append(values)
+                continue
+            base = item.get('base_write_date')
+            if not base:
+                result['duplicates'].setdefault(model_name, {})[uuid] = record.id
+                continue
+            try:
+                base = datetime.fromisoformat(base)
+            except ValueError:
+                result['errors'].append({'model': model_name, 'uuid': uuid, 'error': _("base_write_date inválido.")})
+                continue
+            if server_dates[record.id] > base:
+                result['conflicts'].append({
+                    'model': model_name,
+                    'uuid': uuid,
+                    'server_write_date': server_dates[record.id].isoformat(),
+                    'server': record.read(PULL_MODELS[model_name], load=None)[0],
+                })
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    record.write(values)
+                result['updated'].setdefault(model_name, {})[uuid] = record.id
+            except (UserError, ValidationError, psycopg2.Error) as e:
+                result['errors'].append({'model': model_name, 'uuid': uuid, 'error': str(e)})
+
+        if to_create:
+            created = self._create_batch(Model, to_create, result)
+            result['created'].setdefault(model_name, {}).update({rec.sync_uuid: rec.id for rec in created})
+
+    def _create_batch(self, Model, vals_list, result):
+        """Un solo `create`; si el lote falla, se reintenta uno por uno para aislar el error."""
+        try:
+            with self.env.cr.savepoint():
+                return Model.create(vals_list)
+        except (UserError, ValidationError, psycopg2.Error):
+            _logger.info("vet.sync: lote de %s con errores, reintentando por registro", Model._name)
+        created = Model
+        for values in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    created |= Model.create(values)
+            except (UserError, ValidationError, psycopg2.Error) as e:
+                result['errors'].append({'model': Model._name, 'uuid': values['sync_uuid'], 'error': str(e)})
+        return created
+
+    def _fetch_write_dates(self, Model, ids):
+        """write_date con microsegundos, tal como se entregan en la descarga."""
+        if not ids:
+            return {}
+        Model.flush_model(['write_date'])
+        self.env.cr.execute('SELECT id, write_date FROM "%s" WHERE id IN %%s' % Model._table, [tuple(ids)])
+        return dict(self.env.cr.fetchall())
+
+
+class SyncCursor(models.Model):
+    _name = "vet.sync.cursor"
+    _description = "Cursor de sincronización por dispositivo y modelo"
+
+    device_id = fields.Many2one('vet.sync.device', string="Dispositivo", required=True, ondelete='cascade', index=True)
+    res_model = fields.Char(string="Modelo", required=True)
+    cursor = fields.Char(string="Cursor")
+
+    _sql_constraints = [
+        ('device_model_unique', 'unique(device_id, res_model)', 'Solo un cursor por dispositivo y modelo.'),
+    ]
@@ -1,3 +1,6 @@
+import math
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -5,6 +8,11 @@ from odoo.exceptions import UserError
 class Vaccine(models.Model):
     _name = "animal.vaccine"
     _description = "Animal vaccines table"
+    _inherit = ['vet.sync.mixin', 'vet.stock.product.mixin']
+    _stock_product_type = 'vaccine'
+    _stock_total_field = 'stock_total_doses'
+    _stock_loose_field = 'stock_doses'
+    _stock_fields = ('stock_boxes', 'stock_vials', 'stock_doses', 'vials_per_box', 'doses_per_vial')
 
     # === Datos básicos ===
     name = fields.Char(string="Vacuna", required=True)
@@ -51,6 +59,7 @@ class Vaccine(models.Model):
         store=True,
         help="Total de dosis considerando cajas, frascos y dosis sueltas."
     )
+    quant_ids = fields.One2many("vet.stock.quant", "vaccine_id", string="Stock por ubicación")
 
     @api.depends('stock_boxes', 'stock_vials', 'stock_doses', 'vials_per_box', 'doses_per_vial')
     def _compute_stock_total_doses(self):
@@ -107,51 +116,58 @@ class Vaccine(models.Model):
         self.stock_boxes -= how_many_boxes
         self.stock_vials += int(how_many_boxes) * int(self.vials_per_box or 0)
 
-    def _consume_doses(self, doses):
+    def _consume_doses(self, doses, location=None):
         """
         Consume 'doses' dosis del stock, fraccionando según sea necesario:
-        primero dosis sueltas, luego frascos, luego cajas.
+        primero dosis sueltas, luego frascos, luego cajas. Se descuentan de
+        `location` (por defecto la del contexto o la principal).
         """
         self.ensure_one()
         if not doses or doses <= 0:
             return
 
         self._ensure_enough_doses(doses)
+        self._stock_post(-doses, location)
+        self = self.with_context(vet_stock_engine=True)
 
-        # Asegurar suficiencia de dosis sueltas, fraccionando de frascos/cajas si falta
+        # Asegurar suficiencia de dosis sueltas, fraccionando de frascos/cajas si falta.
+        # Se calcula de una vez cuántos frascos (y cajas) abrir, en vez de uno por uno.
         dpv = int(self.doses_per_vial or 0)
         vpb = int(self.vials_per_box or 0)
 
-        # Si faltan dosis sueltas, intento romper frascos; si no, cajas.
         deficit = doses - (self.stock_doses or 0.0)
-        while deficit > 0:
-            if (self.stock_vials or 0) > 0:
-                self._break_vial_to_doses(1)
-            elif (self.stock_boxes or 0) > 0:
-                self._break_box_to_vials(1)
-            else:
-                # No debería entrar aquí por _ensure_enough_doses, pero por seguridad:
+        if deficit > 0:
+            if dpv < 1:
                 raise UserError(_("No hay stock suficiente para fraccionar en dosis."))
-            deficit = doses - (self.stock_doses or 0.0)
+            vials_needed = int(math.ceil(deficit / dpv))
+            missing_vials = vials_needed - (self.stock_vials or 0)
+            if missing_vials > 0:
+                if vpb < 1:
+                    raise UserError(_("No hay stock suficiente para fraccionar en dosis."))
+                self._break_box_to_vials(int(math.ceil(missing_vials / vpb)))
+            self._break_vial_to_doses(vials_needed)
 
         # Ahora ya hay dosis sueltas suficientes
         self.stock_doses -= doses
 
-    def _revert_doses(self, doses):
+    def _revert_doses(self, doses, location=None):
         """
         Devuelve 'doses' dosis al stock como dosis sueltas (no recompone cajas/frasco).
         """
         self.ensure_one()
         if not doses or doses <= 0:
             return
-        self.stock_doses += doses
+        self._stock_post(doses, location, 'return')
+        self.with_context(vet_stock_engine=True).stock_doses += doses
 
 
 class Vaccination(models.Model):
     _name = "animal.vaccination"
     _description = "Registro de vacunación por animal"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.sync.mixin', 'vet.document.cache.mixin',
+                'vet.stock.consumer.mixin']
     _order = "date desc, id desc"
+    _document_cache_depends = ('animal_id', 'animal_id.breed', 'animal_id.tags', 'owner_id', 'specie_id', 'vaccine_id')
 
     # Enlaces
     animal_id = fields.Many2one(
@@ -201,6 +217,9 @@ class Vaccination(models.Model):
         help="Si está activado, al guardar se descuenta la(s) dosis del stock de la vacuna."
     )
 
+    # Identificador generado por el dispositivo offline (sincronización idempotente)
+    sync_uuid = fields.Char(string="UUID sincronización", copy=False, readonly=True, index=True)
+
     # Auxiliares de lectura
     owner_id = fields.Many2one(
         related="animal_id.owner",
@@ -218,9 +237,11 @@ class Vaccination(models.Model):
     @api.onchange('animal_id')
     def _onchange_animal_id_prefill_doctor(self):
         """Si el animal tiene 'médico tratante', proponerlo como doctor."""
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor:
-                rec.doctor = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor:
+                rec.doctor = patient['treating_doctor']
 
     def name_get(self):
         res = []
@@ -235,24 +256,47 @@ class Vaccination(models.Model):
         # Evitar duplicados exactos (mismo animal, misma vacuna, misma fecha)
         ('unique_animal_vaccine_date',
          'unique(animal_id, vaccine_id, date)',
-         'Ya existe un registro de esta vacuna para el animal en la misma fecha.')
+         'Ya existe un registro de esta vacuna para el animal en la misma fecha.'),
+        ('unique_sync_uuid', 'unique(sync_uuid)', 'El UUID de sincronización ya existe.'),
     ]
 
     # === Movimiento de stock ===
-    @api.model
-    def create(self, vals):
-        records = super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Un solo descuento por vacuna y ubicación con el total de dosis del lote
+        doses_by_vaccine = defaultdict(float)
         for rec in records:
             if rec.consume_stock and rec.vaccine_id and rec.applied_doses:
-                rec.vaccine_id._consume_doses(rec.applied_doses)
+                doses_by_vaccine[rec.vaccine_id, rec.stock_location_id] += rec.applied_doses
+        for (vaccine, location), doses in doses_by_vaccine.items():
+            vaccine._consume_doses(doses, location)
         return records
 
+    @api.model
+    def create_campaign(self, vaccine, animals, date, values=None):
+        """
+        Vacunación masiva: crea el registro de `animals` en un solo create
+        (sin seguimiento de chatter) y descuenta el total de dosis una vez.
+        Omite los animales que ya tienen esta vacuna en la misma fecha.
+        """
+        already = self.search([
+            ('animal_id', 'in', animals.ids),
+            ('vaccine_id', '=', vaccine.id),
+            ('date', '=', date),
+        ]).animal_id
+        values = dict(values or {}, vaccine_id=vaccine.id, date=date)
+        return self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+        ).create([dict(values, animal_id=animal.id) for animal in animals - already])
+
     def write(self, vals):
         # Guardamos estado previo para calcular diferencias
         before = {rec.id: {
             'vaccine_id': rec.vaccine_id.id,
             'applied_doses': rec.applied_doses,
             'consume_stock': rec.consume_stock,
+            'stock_location_id': rec.stock_location_id,
         } for rec in self}
 
         res = super().write(vals)
@@ -262,34 +306,36 @@ class Vaccination(models.Model):
             prev_vac = prev['vaccine_id'] and self.env['animal.vaccine'].browse(prev['vaccine_id']) or False
             prev_doses = float(prev['applied_doses'] or 0.0)
             prev_consume = bool(prev['consume_stock'])
+            prev_loc = prev['stock_location_id']
             new_vac = rec.vaccine_id
             new_doses = float(rec.applied_doses or 0.0)
             new_consume = bool(rec.consume_stock)
+            new_loc = rec.stock_location_id
 
             # Casos:
             # 1) Antes consumía y ahora NO -> revertir prev_doses en prev_vac
             if prev_consume and not new_consume and prev_vac and prev_doses:
-                prev_vac._revert_doses(prev_doses)
+                prev_vac._revert_doses(prev_doses, prev_loc)
 
             # 2) Antes NO y ahora SÍ -> consumir new_doses en new_vac
             elif not prev_consume and new_consume and new_vac and new_doses:
-                new_vac._consume_doses(new_doses)
+                new_vac._consume_doses(new_doses, new_loc)
 
-            # 3) Sigue consumiendo: revisar cambios de vacuna o cantidad
+            # 3) Sigue consumiendo: revisar cambios de vacuna, ubicación o cantidad
             elif prev_consume and new_consume:
-                if prev_vac and new_vac and prev_vac.id != new_vac.id:
-                    # Cambió la vacuna: devolver a la anterior y consumir de la nueva
+                if prev_vac and new_vac and (prev_vac.id != new_vac.id or prev_loc != new_loc):
+                    # Cambió la vacuna o la ubicación: devolver a la anterior y consumir de la nueva
                     if prev_doses:
-                        prev_vac._revert_doses(prev_doses)
+                        prev_vac._revert_doses(prev_doses, prev_loc)
                     if new_doses:
-                        new_vac._consume_doses(new_doses)
+                        new_vac._consume_doses(new_doses, new_loc)
                 else:
                     # Misma vacuna: consumir diferencia
                     delta = new_doses - prev_doses
                     if delta > 0:
-                        new_vac._consume_doses(delta)
+                        new_vac._consume_doses(delta, new_loc)
                     elif delta < 0:
-                        new_vac._revert_doses(-delta)
+                        new_vac._revert_doses(-delta, new_loc)
 
         return res
 
@@ -297,5 +343,5 @@ class Vaccination(models.Model):
         for rec in self:
             if rec.consume_stock and rec.vaccine_id and rec.applied_doses:
                 # Devolver las dosis consumidas
-                rec.vaccine_id._revert_doses(rec.applied_doses)
+                rec.vaccine_id._revert_doses(rec.applied_doses, rec.stock_location_id)
         return super().unlink()
\ No newline at end of file
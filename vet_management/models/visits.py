@@ -1,10 +1,19 @@
 from odoo import fields, models, api
 
+from .animals import AGE_BAND_SELECTION, age_band, age_in_years
+
 class Visit(models.Model):
     _name = "animal.visit"
     _description = "Animals visits table"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.keyset.mixin', 'vet.clinical.search.mixin']
     _order = "date desc"
+    _clinical_search_fields = {
+        'prediagnoses': 'A',
+        'anamnesis': 'B',
+        'clinical_exam': 'B',
+        'treatment': 'C',
+        'rp': 'C',
+    }
 
     animal_id = fields.Many2one('animal', string='Animal', required=True)  # Campo de relación Many2one con animal
     date = fields.Datetime(string="Fecha", required=True)
@@ -13,6 +22,9 @@ class Visit(models.Model):
     sex = fields.Selection(related="animal_id.sex", string="Sexo", readonly=True, store=True)
     breed = fields.Many2one(related="animal_id.breed", string="Raza", readonly=True, store=True)
     specie = fields.Many2one(related="animal_id.species", string="Especie", readonly=True, store=True)
+    # Tramo a la fecha de la visita: se fija al crearla (o al cambiar su fecha o
+    # animal) y no cambia cuando el animal envejece.
+    age_band = fields.Selection(AGE_BAND_SELECTION, string="Tramo etario", compute="_compute_age_band", store=True)
 
     # ---- CAMPO(S) HISTÓRICOS (se mantienen por compatibilidad) ----
     reason = fields.Text(string="Razón")
@@ -44,4 +56,12 @@ class Visit(models.Model):
     def create(self, vals):
         if vals.get('sequence', 'Nuevo') == 'Nuevo':
             vals['sequence'] = self.env['ir.sequence'].next_by_code('animal.visit.sequence') or 'Nuevo'
-        return super(Visit, self).create(vals)
\ No newline at end of file
+        return super(Visit, self).create(vals)
+
+    @api.depends('date', 'animal_id')
+    def _compute_age_band(self):
+        for rec in self:
+            if rec.animal_id.birthdate:
+                rec.age_band = age_band(age_in_years(rec.animal_id.birthdate, rec.date))
+            else:
+                rec.age_band = rec.animal_id.age_band
\ No newline at end of file
@@ -0,0 +1,223 @@
+import math
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+METRICS = [
+    ('weight', 'Peso (kg)'),
+    ('height', 'Altura'),
+    ('hr', 'Frecuencia cardiaca (lpm)'),
+    ('rr', 'Frecuencia respiratoria (rpm)'),
+    ('temp', 'Temperatura (°C)'),
+    ('spo2', 'SpO₂ (%)'),
+    ('map', 'PAM (mmHg)'),
+    ('etco2', 'ETCO₂ (mmHg)'),
+]
+# Campo con el último valor -> métrica de la serie.
+SURGERY_VITAL_FIELDS = {
+    'vitals_hr': 'hr',
+    'vitals_rr': 'rr',
+    'vitals_temp': 'temp',
+    'vitals_spo2': 'spo2',
+    'vitals_map': 'map',
+    'vitals_etco2': 'etco2',
+}
+ANIMAL_VITAL_FIELDS = {'weight': 'weight', 'height': 'height'}
+
+INSERT_CHUNK = 2000
+DEFAULT_POINTS = 300
+
+
+class VitalSample(models.Model):
+    """
+    Una fila por muestra (animal, métrica, instante), sin columnas de auditoría.
+    El monitoreo intraoperatorio llega por lotes y se inserta con SQL; los
+    gráficos leen series reducidas (promedio/mín/máx por intervalo).
+    """
+    _name = "animal.vital.sample"
+    _description = "Signo vital / medición"
+    _order = "measured_at desc"
+    _log_access = False
+
+    animal_id = fields.Many2one("animal", string="Animal", required=True, ondelete='cascade')
+    surgery_record_id = fields.Many2one(
+        "animal.surgery.record", string="Cirugía", ondelete='set null', index='btree_not_null'
+    )
+    metric = fields.Selection(METRICS, string="Medición", required=True)
+    value = fields.Float(string="Valor", required=True)
+    measured_at = fields.Datetime(string="Fecha/hora", required=True, default=fields.Datetime.now)
+
+    _sql_constraints = [
+        # También es el índice de las series: (animal, métrica, instante).
+        ('animal_metric_time_unique', 'unique(animal_id, metric, measured_at)',
+         'Ya existe una medición de este tipo para el animal en ese instante.'),
+    ]
+
+    @api.model
+    def ingest(self, series, overwrite=False):
+        """
+        Inserta series de muestras::
+
+            [{'animal_id': 1, 'metric': 'hr', 'surgery_record_id': 7,
+              'points': [['2024-05-02T10:00:15', 82], ...]}, ...]
+
+        Reenviar las mismas muestras no las duplica. Con `overwrite`, una muestra
+        que ya existe en ese instante toma el valor nuevo (ediciones de un campo
+        de valor actual). Devuelve el número de filas escritas.
+        """
+        self.check_access_rights('create')
+        metrics = dict(METRICS)
+        rows = []
+        for serie in series:
+            if serie.get('metric') not in metrics or not serie.get('animal_id'):
+                raise UserError(_("Cada serie debe tener 'animal_id' y una 'metric' válida (%s).") % ', '.join(metrics))
+            try:
+                for measured_at, value in serie.get('points') or []:
+                    if isinstance(measured_at, str):
+                        measured_at = fields.Datetime.to_datetime(measured_at.replace('T', ' '))
+                    rows.append((
+                        serie['animal_id'], serie.get('surgery_record_id') or None, serie['metric'],
+                        float(value), measured_at,
+                    ))
+            except (TypeError, ValueError):
+                raise UserError(_("Puntos inválidos en la serie %s/%s: se esperaba [[fecha UTC, valor], ...].")
+                                % (serie['animal_id'], serie['metric']))
+        if not rows:
+            return 0
+        if overwrite:
+            # Un mismo INSERT ... DO UPDATE no puede tocar dos veces la misma fila.
+            rows = list({(row[0], row[2], row[4]): row for row in rows}.values())
+        conflict = "DO UPDATE SET value = EXCLUDED.value" if overwrite else "DO NOTHING"
+        self._check_references({row[0] for row in rows}, {row[1] for row in rows if row[1]})
+        self.flush_model()
+        inserted = 0
+        for start in range(0, len(rows), INSERT_CHUNK):
+            result = execute_values(self.env.cr._obj, """
+                INSERT INTO animal_vital_sample (animal_id, surgery_record_id, metric, value, measured_at)
+                VALUES %s
+                ON CONFLICT (animal_id, metric, measured_at) {conflict}
+                RETURNING id
+            """.format(conflict=conflict), rows[start:start + INSERT_CHUNK], fetch=True)
+            inserted += len(result)
+        self.invalidate_model()
+        return inserted
+
+    @api.model
+    def _check_references(self, animal_ids, surgery_ids):
+        animals = self.env['animal'].browse(animal_ids)
+        if len(animals.exists()) != len(animal_ids):
+            raise UserError(_("Animales inexistentes: %s") % sorted(set(animal_ids) - set(animals.exists().ids)))
+        animals.check_access_rule('read')
+        surgeries = self.env['animal.surgery.record'].browse(surgery_ids)
+        if len(surgeries.exists()) != len(surgery_ids):
+            raise UserError(_("Cirugías inexistentes: %s") % sorted(set(surgery_ids) - set(surgeries.exists().ids)))
+
+    @api.model
+    def get_series(self, animal_id, metric, date_from=None, date_to=None, surgery_record_id=None, points=DEFAULT_POINTS):
+        """
+        Serie reducida a ~`points` intervalos iguales entre la primera y la última
+        muestra: [{'t', 'avg', 'min', 'max', 'n'}]. Si hay menos muestras que
+        intervalos, se devuelven tal cual.
+        """
+        self.check_access_rights('read')
+        where = ["animal_id = %s", "metric = %s"]
+        params = [animal_id, metric]
+        if surgery_record_id:
+            where.append("surgery_record_id = %s")
+            params.append(surgery_record_id)
+        if date_from:
+            where.append("measured_at >= %s")
+            params.append(date_from)
+        if date_to:
+            where.append("measured_at <= %s")
+            params.append(date_to)
+        where = " AND ".join(where)
+        self.flush_model()
+        cr = self.env.cr
+        cr.execute("SELECT min(measured_at), max(measured_at), count(*) FROM animal_vital_sample WHERE " + where, params)
+        first, last, count = cr.fetchone()
+        if not count:
+            return []
+        points = max(1, int(points or DEFAULT_POINTS))
+        if count <= points:
+            cr.execute(
+                "SELECT measured_at, value FROM animal_vital_sample WHERE %s ORDER BY measured_at" % where, params
+            )
+            return [
+                {'t': measured_at.isoformat(), 'avg': value, 'min': value, 'max': value, 'n': 1}
+                for measured_at, value in cr.fetchall()
+            ]
+        bucket = max(1, math.ceil((last - first).total_seconds() / points))
+        cr.execute("""
+            SELECT to_timestamp(floor(extract(epoch FROM measured_at) / %s) * %s) AT TIME ZONE 'UTC' AS t,
+                   avg(value), min(value), max(value), count(*)
+              FROM animal_vital_sample
+             WHERE {where}
+          GROUP BY t
+          ORDER BY t
+        """.format(where=where), [bucket, bucket] + params)
+        return [
+            {'t': t.isoformat(), 'avg': avg, 'min': low, 'max': high, 'n': n}
+            for t, avg, low, high, n in cr.fetchall()
+        ]
+
+
+def record_current_values(records, vals, field_map, animal_field=None):
+    """
+    Guarda como muestra cada valor de `field_map` presente en `vals`, para no
+    perder el historial de los campos de "valor actual" (peso, signos vitales).
+    Dos ediciones en la misma transacción comparten instante: gana la última.
+    """
+    metrics = {metric: vals[name] for name, metric in field_map.items() if vals.get(name)}
+    if not metrics or not records:
+        return
+    now = fields.Datetime.to_string(fields.Datetime.now())
+    series = []
+    for rec in records:
+        animal = rec[animal_field] if animal_field else rec
+        if not animal:
+            continue
+        for metric, value in metrics.items():
+            series.append({
+                'animal_id': animal.id,
+                'surgery_record_id': rec.id if animal_field else False,
+                'metric': metric,
+                'points': [[now, value]],
+            })
+    records.env['animal.vital.sample'].ingest(series, overwrite=True)
+
+
+class Animal(models.Model):
+    _inherit = "animal"
+
+    vital_sample_ids = fields.One2many("animal.vital.sample", "animal_id", string="Mediciones")
+
+    @api.model
+    def create(self, vals):
+        record = super().create(vals)
+        record_current_values(record, vals, ANIMAL_VITAL_FIELDS)
+        return record
+
+    def write(self, vals):
+        res = super().write(vals)
+        record_current_values(self, vals, ANIMAL_VITAL_FIELDS)
+        return res
+
+
+class SurgeryRecord(models.Model):
+    _inherit = "animal.surgery.record"
+
+    vital_sample_ids = fields.One2many("animal.vital.sample", "surgery_record_id", string="Monitoreo")
+
+    @api.model
+    def create(self, vals):
+        record = super().create(vals)
+        record_current_values(record, vals, SURGERY_VITAL_FIELDS, animal_field='animal_id')
+        return record
+
+    def write(self, vals):
+        res = super().write(vals)
+        record_current_values(self, vals, SURGERY_VITAL_FIELDS, animal_field='animal_id')
+        return res
@@ -1,11 +1,48 @@
-from odoo import models, fields, api, _
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api, _, _lt
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+from .animals import AGE_BAND_SELECTION, age_band, age_in_years
+
+TICKET_STATES = [
+    ('waiting', 'En espera'),
+    ('called', 'Llamado'),
+    ('in_consultation', 'En consulta'),
+    ('paused', 'Pausado'),
+    ('done', 'Atendido'),
+    ('cancelled', 'Cancelado'),
+]
+# Máquina de estados: acción -> (estados de origen, estado destino, error si algún ticket no está en origen).
+TICKET_TRANSITIONS = {
+    'call': (('waiting', 'paused'), 'called',
+             _lt("Solo se puede 'llamar' tickets en espera o pausados.")),
+    'start': (('waiting', 'called', 'paused'), 'in_consultation',
+              _lt("Solo se puede iniciar atención desde En espera/Llamado/Pausado.")),
+    'pause': (('in_consultation',), 'paused',
+              _lt("Solo se puede pausar cuando está 'En consulta'.")),
+    'resume': (('paused',), 'in_consultation',
+               _lt("Solo se puede reanudar desde 'Pausado'.")),
+    'done': (('in_consultation', 'called', 'paused'), 'done',
+             _lt("Solo se puede finalizar cuando el ticket está en consulta/llamado/pausado.")),
+    'cancel': (('waiting', 'called', 'in_consultation', 'paused', 'cancelled'), 'cancelled',
+               _lt("No es posible cancelar un ticket ya atendido.")),
+    'reset': (tuple(state for state, _label in TICKET_STATES), 'waiting', ""),
+}
+# Campos de hora que fija (ahora) o limpia (False) cada acción.
+TRANSITION_TIMES = {
+    'call': {'called_time': True},
+    'start': {'start_time': True},
+    'done': {'end_time': True},
+    'reset': {'called_time': False, 'start_time': False, 'end_time': False},
+}
 
 
 class VetWaitingTicket(models.Model):
     _name = "vet.waiting.ticket"
     _description = "Sala de Espera - Ticket"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'vet.keyset.mixin', 'vet.optimistic.lock.mixin']
     _order = "state, priority desc, arrival_time asc, id asc"
 
     # Identificador / referencia
@@ -58,6 +95,13 @@ class VetWaitingTicket(models.Model):
         store=True,
         readonly=True
     )
+    age_band = fields.Selection(
+        AGE_BAND_SELECTION,
+        string='Tramo etario',
+        compute='_compute_age_band',
+        store=True,
+        help="Tramo etario del paciente a la fecha de ingreso; no cambia cuando el animal envejece."
+    )
 
     # Sala de espera
     arrival_time = fields.Datetime(
@@ -83,14 +127,7 @@ class VetWaitingTicket(models.Model):
     ], string="Prioridad", default='1', tracking=True, index=True)
 
     # Estado del ticket
-    state = fields.Selection([
-        ('waiting', 'En espera'),
-        ('called', 'Llamado'),
-        ('in_consultation', 'En consulta'),
-        ('paused', 'Pausado'),
-        ('done', 'Atendido'),
-        ('cancelled', 'Cancelado'),
-    ], string="Estado", default='waiting', tracking=True, index=True)
+    state = fields.Selection(TICKET_STATES, string="Estado", default='waiting', tracking=True, index=True)
 
     # Visita creada a partir del ticket
     visit_id = fields.Many2one('animal.visit', string="Visita vinculada", tracking=True)
@@ -103,11 +140,14 @@ class VetWaitingTicket(models.Model):
     )
     notes = fields.Text(string="Notas internas")
 
-    @api.model
-    def create(self, vals):
-        if vals.get('sequence', 'Nuevo') == 'Nuevo':
-            vals['sequence'] = self.env['ir.sequence'].next_by_code('vet.waiting.ticket.sequence') or 'Nuevo'
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('sequence', 'Nuevo') == 'Nuevo':
+                vals['sequence'] = self.env['ir.sequence'].next_by_code('vet.waiting.ticket.sequence') or 'Nuevo'
+        records = super().create(vals_list)
+        self.env['vet.waiting.ticket.transition']._log([(rec.id, False, rec.state) for rec in records])
+        return records
 
     @api.depends('arrival_time', 'start_time', 'end_time')
     def _compute_waiting_minutes(self):
@@ -121,48 +161,84 @@ class VetWaitingTicket(models.Model):
             delta = fields.Datetime.to_datetime(stop) - fields.Datetime.to_datetime(rec.arrival_time)
             rec.waiting_minutes = int(delta.total_seconds() // 60)
 
+    @api.depends('arrival_time', 'animal_id')
+    def _compute_age_band(self):
+        for rec in self:
+            if rec.animal_id.birthdate:
+                rec.age_band = age_band(age_in_years(rec.animal_id.birthdate, rec.arrival_time))
+            else:
+                rec.age_band = rec.animal_id.age_band
+
     @api.onchange('animal_id')
     def _onchange_animal_id_suggest_doctor(self):
         """Si el animal tiene 'médico tratante', sugerirlo como doctor."""
+        patients = self.env['vet.patient.context'].get_for(self)
         for rec in self:
-            if rec.animal_id and rec.animal_id.treating_doctor and not rec.doctor:
-                rec.doctor = rec.animal_id.treating_doctor
+            patient = patients.get(rec.animal_id._origin.id)
+            if patient and patient['treating_doctor'] and not rec.doctor:
+                rec.doctor = patient['treating_doctor']
 
     # === Acciones de flujo ===
+    def _transition(self, action, versions=None, claim=True):
+        """
+        Aplica `action` a todo el lote: valida los estados de origen de todos los
+        tickets antes de modificar ninguno, los reclama (ver `_claim`) para que
+        una transición concurrente falle limpiamente, escribe el estado destino
+        con un solo `write` y registra las transiciones con un solo INSERT. Los
+        tickets que ya están en el destino no se modifican.
+        """
+        sources, target, message = TICKET_TRANSITIONS[action]
+        invalid = self.filtered(lambda rec: rec.state not in sources)
+        if invalid:
+            raise UserError("%s\n%s" % (message, ", ".join(invalid.mapped('sequence'))))
+        records = self.filtered(lambda rec: rec.state != target)
+        if not records:
+            return records
+        if claim:
+            records._claim(sources, versions)
+        now = fields.Datetime.now()
+        vals = {'state': target}
+        vals.update({name: now if set_now else False for name, set_now in TRANSITION_TIMES.get(action, {}).items()})
+        changes = [(rec.id, rec.state, target) for rec in records]
+        records.write(vals)
+        self.env['vet.waiting.ticket.transition']._log(changes, now)
+        return records
+
     def action_call(self):
-        for rec in self:
-            if rec.state not in ('waiting', 'paused'):
-                raise UserError(_("Solo se puede 'llamar' tickets en espera o pausados."))
-            rec.write({'state': 'called', 'called_time': fields.Datetime.now()})
+        self._transition('call')
         return True
 
-    def action_start_consultation(self):
-        """Pasa a 'En consulta'. Si no existe, crea la visita y la vincula."""
-        for rec in self:
-            if rec.state not in ('waiting', 'called', 'paused'):
-                raise UserError(_("Solo se puede iniciar atención desde En espera/Llamado/Pausado."))
-
-            visit = rec.visit_id
-            if not visit:
-                visit_vals = {
-                    'animal_id': rec.animal_id.id,
-                    'date': fields.Datetime.now(),
-                    'doctor': rec.doctor or (rec.animal_id and rec.animal_id.treating_doctor) or False,
-                    # Campos nuevos en Visit (v17 del módulo): los rellenamos si existen
-                    'consultation_reason': rec.reason or '',
-                }
-                visit = self.env['animal.visit'].create(visit_vals)
-                rec.visit_id = visit.id
-
-            rec.write({'state': 'in_consultation', 'start_time': fields.Datetime.now()})
+    def action_start_consultation(self, versions=None):
+        """Pasa a 'En consulta'; crea en un solo `create` las visitas que falten y las vincula."""
+        sources, _target, message = TICKET_TRANSITIONS['start']
+        if any(rec.state not in sources for rec in self):
+            raise UserError(str(message))
+        # Reclamar antes de crear visitas: un segundo "Iniciar atención" simultáneo falla sin duplicarlas.
+        self._claim(sources, versions)
+        without_visit = self.filtered(lambda rec: not rec.visit_id)
+        now = fields.Datetime.now()
+        visits = self.env['animal.visit'].create([
+            {
+                'animal_id': rec.animal_id.id,
+                'date': now,
+                'doctor': rec.doctor or (rec.animal_id and rec.animal_id.treating_doctor) or False,
+                'consultation_reason': rec.reason or '',
+            }
+            for rec in without_visit
+        ])
+        # Por el ORM: visit_id se sigue en el chatter y cada ticket lleva su propia visita.
+        for rec, visit in zip(without_visit, visits):
+            rec.visit_id = visit
+        self._transition('start', claim=False)
 
+        if len(self) == 1:
             # Abrir la visita en formulario
             return {
                 'type': 'ir.actions.act_window',
                 'name': _('Visita'),
                 'res_model': 'animal.visit',
                 'view_mode': 'form',
-                'res_id': visit.id,
+                'res_id': self.visit_id.id,
                 'target': 'current',
                 'context': dict(self._context),
             }
@@ -182,41 +258,23 @@ class VetWaitingTicket(models.Model):
         }
 
     def action_pause(self):
-        for rec in self:
-            if rec.state != 'in_consultation':
-                raise UserError(_("Solo se puede pausar cuando está 'En consulta'."))
-            rec.state = 'paused'
+        self._transition('pause')
         return True
 
     def action_resume(self):
-        for rec in self:
-            if rec.state != 'paused':
-                raise UserError(_("Solo se puede reanudar desde 'Pausado'."))
-            rec.state = 'in_consultation'
+        self._transition('resume')
         return True
 
     def action_done(self):
-        for rec in self:
-            if rec.state not in ('in_consultation', 'called', 'paused'):
-                raise UserError(_("Solo se puede finalizar cuando el ticket está en consulta/llamado/pausado."))
-            rec.write({'state': 'done', 'end_time': fields.Datetime.now()})
+        self._transition('done')
         return True
 
     def action_cancel(self):
-        for rec in self:
-            if rec.state in ('done',):
-                raise UserError(_("No es posible cancelar un ticket ya atendido."))
-            rec.state = 'cancelled'
+        self._transition('cancel')
         return True
 
     def action_reset_to_waiting(self):
-        for rec in self:
-            rec.write({
-                'state': 'waiting',
-                'called_time': False,
-                'start_time': False,
-                'end_time': False,
-            })
+        self._transition('reset')
         return True
 
     # === Utilidad para acción de servidor "Llamar siguiente" ===
@@ -248,3 +306,64 @@ class VetWaitingTicket(models.Model):
             'res_id': ticket.id,
             'target': 'current',
         }
+
+
+class VetWaitingTicketTransition(models.Model):
+    """
+    Registro compacto de cambios de estado de los tickets (una fila por
+    transición, sin columnas de auditoría), con el tiempo que el ticket pasó
+    en el estado que deja. Las estadísticas de la sala lo leen en lugar de
+    mail.tracking.value.
+    """
+    _name = "vet.waiting.ticket.transition"
+    _description = "Sala de Espera - Transición de estado"
+    _order = "changed_at desc, id desc"
+    _log_access = False
+
+    ticket_id = fields.Many2one("vet.waiting.ticket", string="Ticket", required=True, ondelete='cascade', readonly=True)
+    from_state = fields.Selection(TICKET_STATES, string="Desde", readonly=True)
+    to_state = fields.Selection(TICKET_STATES, string="Hacia", required=True, readonly=True)
+    changed_at = fields.Datetime(string="Fecha/hora", required=True, readonly=True, index=True)
+    user_id = fields.Many2one("res.users", string="Usuario", readonly=True)
+    minutes_in_state = fields.Float(
+        string="Minutos en el estado anterior",
+        digits=(16, 1),
+        readonly=True,
+        group_operator='avg'
+    )
+    doctor = fields.Char(related="ticket_id.doctor", string="Dr/Dra")
+    priority = fields.Selection(related="ticket_id.priority", string="Prioridad")
+
+    def init(self):
+        super().init()
+        create_index(self._cr, 'vet_waiting_ticket_transition_ticket_changed_index', self._table,
+                     ['ticket_id', 'changed_at DESC'])
+
+    @api.model
+    def _log(self, changes, changed_at=None):
+        """[(ticket_id, estado de origen, estado destino)] en un INSERT; calcula el tiempo en el estado anterior."""
+        if not changes:
+            return
+        changed_at = changed_at or fields.Datetime.now()
+        self.env['vet.waiting.ticket'].flush_model(['arrival_time'])
+        execute_values(self.env.cr._obj, """
+            INSERT INTO vet_waiting_ticket_transition
+                   (ticket_id, from_state, to_state, changed_at, user_id, minutes_in_state)
+            SELECT v.ticket_id, v.from_state, v.to_state, v.changed_at, v.user_id,
+                   CASE WHEN v.from_state IS NOT NULL
+                        THEN extract(epoch FROM v.changed_at - coalesce(last.changed_at, tk.arrival_time)) / 60
+                   END
+              FROM (VALUES %s) AS v(ticket_id, from_state, to_state, changed_at, user_id)
+              JOIN vet_waiting_ticket tk ON tk.id = v.ticket_id
+              LEFT JOIN LATERAL (
+                  SELECT changed_at FROM vet_waiting_ticket_transition t
+                   WHERE t.ticket_id = v.ticket_id
+                ORDER BY changed_at DESC
+                   LIMIT 1
+              ) last ON TRUE
+        """, [
+            (ticket_id, from_state or None, to_state, changed_at, self.env.uid)
+            for ticket_id, from_state, to_state in changes
+        ], template="(%s, %s, %s, %s::timestamp, %s)")
+        self.invalidate_model()
+
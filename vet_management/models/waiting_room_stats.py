@@ -0,0 +1,187 @@
+import heapq
+import logging
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# A partir de STAT_WINDOW atenciones la media pasa a ser móvil (exponencial) y sigue los cambios recientes.
+STAT_WINDOW = 50
+# Atenciones mínimas para usar una estadística; con menos se usa la del nivel más general.
+MIN_SAMPLES = 5
+DEFAULT_SERVICE_MINUTES = 20
+# Consultas simultáneas de la sala; sin valor se usa la cantidad de médicos con tickets abiertos.
+CAPACITY_PARAM = 'vet_management.waiting_room_capacity'
+# Tickets que esperan ser llamados (los pausados no ocupan box ni esperan turno).
+QUEUE_STATES = ('waiting', 'called')
+# Campos del ticket que determinan la cola.
+QUEUE_FIELDS = ['state', 'priority', 'arrival_time', 'doctor', 'reason', 'start_time']
+
+
+def reason_key(reason):
+    """Motivo comparable: minúsculas, espacios normalizados, acotado."""
+    return ' '.join((reason or '').lower().split())[:64]
+
+
+def stat_keys(doctor, priority, reason):
+    """Claves (médico, prioridad, motivo) de la más específica a la más general; '' = cualquiera."""
+    doctor = (doctor or '').strip()
+    priority = priority or ''
+    return [
+        (doctor, priority, reason_key(reason)),
+        (doctor, priority, ''),
+        ('', priority, ''),
+        ('', '', ''),
+    ]
+
+
+class ServiceStat(models.Model):
+    """
+    Duración media de atención (inicio -> fin) por médico, prioridad y motivo,
+    más sus niveles agregados. Se actualiza al finalizar cada ticket, sin
+    recorrer el historial: el upsert suma sobre la fila vigente, de modo que
+    dos cierres simultáneos no se pisan.
+    """
+    _name = "vet.service.stat"
+    _description = "Duración de atención (estadística)"
+    _order = "doctor, priority, reason_key"
+    _log_access = False
+
+    doctor = fields.Char(string="Dr/Dra", readonly=True)
+    priority = fields.Char(string="Prioridad", readonly=True)
+    reason_key = fields.Char(string="Motivo", readonly=True)
+    count = fields.Integer(string="Atenciones", readonly=True)
+    mean_minutes = fields.Float(string="Duración media (min)", digits=(16, 1), readonly=True)
+
+    _sql_constraints = [
+        ('key_unique', 'unique(doctor, priority, reason_key)', 'La estadística ya existe.'),
+    ]
+
+    @api.model
+    def _load(self, keys):
+        keys = set(keys)
+        if not keys:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT doctor, priority, reason_key, count, mean_minutes
+              FROM vet_service_stat
+             WHERE (doctor, priority, reason_key) IN %s
+        """, [tuple(keys)])
+        return {(doctor, priority, key): (count, mean) for doctor, priority, key, count, mean in self.env.cr.fetchall()}
+
+    @api.model
+    def _record(self, samples):
+        """
+        Suma las atenciones [(médico, prioridad, motivo, minutos)] a todos sus
+        niveles con un solo upsert: cada clave aporta (n, media del lote) y la
+        fila existente se actualiza con su propio count/mean_minutes (media
+        acumulada hasta STAT_WINDOW, móvil después).
+        """
+        samples = [sample for sample in samples if sample[3] >= 0]
+        if not samples:
+            return
+        batch = {}
+        for doctor, priority, reason, minutes in samples:
+            for key in stat_keys(doctor, priority, reason):
+                count, total = batch.get(key, (0, 0.0))
+                batch[key] = (count + 1, total + minutes)
+        self.flush_model()
+        execute_values(self.env.cr._obj, """
+            INSERT INTO vet_service_stat AS s (doctor, priority, reason_key, count, mean_minutes)
+            VALUES %s
+            ON CONFLICT (doctor, priority, reason_key)
+            DO UPDATE SET count = s.count + EXCLUDED.count,
+                          mean_minutes = s.mean_minutes + EXCLUDED.count * (EXCLUDED.mean_minutes - s.mean_minutes)
+                                         / greatest(EXCLUDED.count, least(s.count + EXCLUDED.count, {window}))
+        """.format(window=STAT_WINDOW), [key + (count, total / count) for key, (count, total) in batch.items()])
+        self.invalidate_model()
+
+    @api.model
+    def _expected_minutes(self, tickets):
+        """{id: minutos esperados} de filas (id, médico, prioridad, motivo); una consulta para todas."""
+        keys_by_ticket = {ticket_id: stat_keys(doctor, priority, reason) for ticket_id, doctor, priority, reason in tickets}
+        stats = self._load(key for keys in keys_by_ticket.values() for key in keys)
+        expected = {}
+        for ticket_id, keys in keys_by_ticket.items():
+            known = [stats[key] for key in keys if key in stats]
+            reliable = [mean for count, mean in known if count >= MIN_SAMPLES]
+            expected[ticket_id] = reliable[0] if reliable else (known[-1][1] if known else DEFAULT_SERVICE_MINUTES)
+        return expected
+
+
+class VetWaitingTicket(models.Model):
+    _inherit = "vet.waiting.ticket"
+
+    # Se calculan al leer (una simulación por lectura): guardarlas obligaba a
+    # reescribir todos los tickets de la cola en cada cambio.
+    queue_position = fields.Integer(string="Posición en la cola", compute="_compute_predictions")
+    expected_call_time = fields.Datetime(string="Llamado estimado", compute="_compute_predictions")
+    expected_wait_minutes = fields.Integer(
+        string="Espera estimada (min)",
+        compute="_compute_predictions",
+        help="Minutos estimados hasta ser llamado, según la cola, los boxes y la duración habitual de las atenciones."
+    )
+
+    def _compute_predictions(self):
+        predictions = self._queue_predictions()
+        for rec in self:
+            rec.queue_position, rec.expected_call_time, rec.expected_wait_minutes = predictions.get(
+                rec.id, (False, False, False)
+            )
+
+    def _transition(self, action, versions=None, claim=True):
+        records = super()._transition(action, versions=versions, claim=claim)
+        if action == 'done':
+            self.env['vet.service.stat']._record([
+                (rec.doctor, rec.priority, rec.reason, (rec.end_time - rec.start_time).total_seconds() / 60)
+                for rec in records if rec.start_time and rec.end_time
+            ])
+        return records
+
+    @api.model
+    def _queue_predictions(self):
+        """
+        {id: (posición, hora de llamado, minutos de espera)} de los tickets en
+        cola. Simula la cola abierta en orden de llamado (prioridad, llegada)
+        sobre los boxes disponibles: cada ticket toma el primer box que se libera
+        y lo ocupa su duración esperada (un heap de boxes), en una pasada por la
+        cola leída con una consulta.
+        """
+        cr = self.env.cr
+        self.flush_model(QUEUE_FIELDS)
+        cr.execute("""
+            SELECT id, state, doctor, priority, reason, start_time
+              FROM vet_waiting_ticket
+             WHERE state IN %s
+          ORDER BY state = 'called' DESC, priority DESC, arrival_time, id
+        """, [QUEUE_STATES + ('in_consultation',)])
+        rows = cr.fetchall()
+        expected = self.env['vet.service.stat']._expected_minutes(
+            (ticket_id, doctor, priority, reason) for ticket_id, _state, doctor, priority, reason, _start in rows
+        )
+        now = fields.Datetime.now()
+        capacity = int(self.env['ir.config_parameter'].sudo().get_param(CAPACITY_PARAM) or 0) or max(
+            len({(doctor or '').strip().lower() for _id, _state, doctor, *_rest in rows if doctor}), 1
+        )
+        in_consultation = [
+            max(now, start + timedelta(minutes=expected[ticket_id])) if start else now
+            for ticket_id, state, _doctor, _priority, _reason, start in rows if state == 'in_consultation'
+        ]
+        servers = sorted(in_consultation)[:capacity]
+        servers += [now] * (capacity - len(servers))
+        heapq.heapify(servers)
+        predictions = {}
+        position = 0
+        for ticket_id, state, _doctor, _priority, _reason, _start in rows:
+            if state == 'in_consultation':
+                continue
+            position += 1
+            call_time = heapq.heappop(servers)
+            heapq.heappush(servers, call_time + timedelta(minutes=expected[ticket_id]))
+            predictions[ticket_id] = (position, call_time, int((call_time - now).total_seconds() // 60))
+        _logger.debug("vet.waiting.ticket: %s tickets en cola, %s boxes", len(predictions), capacity)
+        return predictions
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+from . import catalog
+from . import animal
+from . import clinical
+from . import waiting_room
+from . import benchmark
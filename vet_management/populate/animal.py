@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import fields, models
+from odoo.tools import populate
+
+DOCTORS = ['Dra. Pérez', 'Dr. Soto', 'Dra. Muñoz', 'Dr. Rojas', 'Dra. Fuentes', 'Dr. Araya']
+
+
+class Animal(models.Model):
+    _inherit = "animal"
+    _populate_sizes = {'small': 100, 'medium': 5000, 'large': 50000}
+    _populate_dependencies = ['res.partner', 'animal.specie', 'animal.breed', 'animal.tag', 'animal.allergy']
+
+    def _populate_factories(self):
+        # Mascotas de los contactos poblados: ~2/3 de los animales tienen dueño.
+        partner_ids = self.env.registry.populated_models['res.partner']
+        specie_ids = self.env.registry.populated_models['animal.specie']
+        tag_ids = self.env.registry.populated_models['animal.tag']
+        allergy_ids = self.env.registry.populated_models['animal.allergy']
+        breeds_by_specie = defaultdict(list)
+        for breed in self.env['animal.breed'].browse(self.env.registry.populated_models['animal.breed']):
+            breeds_by_specie[breed.specie.id].append(breed.id)
+        today = fields.Date.today()
+
+        def get_owner(random=None, **kwargs):
+            return random.choice(partner_ids) if random.random() < 0.66 else False
+
+        def get_breed(values=None, random=None, **kwargs):
+            breeds = breeds_by_specie.get(values['species'])
+            return random.choice(breeds) if breeds else False
+
+        def get_birthdate(random=None, **kwargs):
+            return today - timedelta(days=random.randint(30, 15 * 365))
+
+        def get_tags(random=None, **kwargs):
+            return [(6, 0, random.sample(tag_ids, min(len(tag_ids), random.randint(0, 2))))]
+
+        def get_allergies(random=None, **kwargs):
+            if not allergy_ids or random.random() > 0.1:
+                return [(6, 0, [])]
+            return [(6, 0, [random.choice(allergy_ids)])]
+
+        return [
+            ('name', populate.constant('Mascota {counter}')),
+            ('species', populate.randomize(specie_ids)),
+            ('breed', populate.compute(get_breed)),
+            ('owner', populate.compute(get_owner)),
+            ('sex', populate.randomize(['male', 'female'])),
+            ('birthdate', populate.compute(get_birthdate)),
+            ('reproductive_status', populate.randomize(['neutered', 'entire', False], [4, 4, 2])),
+            ('microchip_number', populate.randomize([False, '9000{counter:011d}'], [1, 1])),
+            ('weight', populate.randfloat(0.5, 60.0)),
+            ('size', populate.randomize(['small', 'medium', 'large'])),
+            ('treating_doctor', populate.randomize(DOCTORS + [False])),
+            ('tags', populate.compute(get_tags)),
+            ('allergies', populate.compute(get_allergies)),
+        ]
@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark reproducible de los flujos clave sobre una base poblada con
+`odoo-bin populate --models=... --size=small|medium|large`.
+
+Uso (desde `odoo-bin shell`)::
+
+    env['vet.benchmark'].run('/tmp/vet_bench.json')
+
+Cada flujo se ejecuta dentro de un savepoint que se revierte al terminar,
+por lo que el benchmark no altera los datos de la base.
+"""
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models, release
+from odoo.addons.vet_management.models.clinical_search import SEARCH_MODELS
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_FLOWS = (
+    'animal_kanban',
+    'ticket_call_next',
+    'vaccination_create',
+    'vaccination_campaign',
+    'statistics_pivot',
+    'report_render',
+    'api_keyset_scan',
+    'search_read_offset_scan',
+    'clinical_fulltext_search',
+    'clinical_ilike_search',
+    'lab_ingest',
+    'vitals_intraop',
+    'prescription_dispense',
+    'surgery_kit_apply',
+    'hospitalization_round',
+    'medication_bulk_create',
+    'protocol_campaign',
+    'age_refresh',
+    'appointment_availability',
+    'waiting_queue_prediction',
+    'waiting_room_closing',
+    'cold_chain_ingest',
+    'stock_transfer',
+    'stock_valuation',
+)
+
+# Modelos cuyo volumen se guarda junto a los tiempos para comparar ejecuciones.
+DATASET_MODELS = (
+    'animal', 'animal.visit', 'animal.vaccination', 'animal.deworming', 'animal.medication',
+    'animal.surgery.record', 'animal.surgery.medication.line', 'vet.waiting.ticket',
+    'animal.prescription', 'animal.consent', 'animal.exam.order',
+)
+
+# Recorrido paginado de visitas (API por cursor vs. search_read con offset).
+SCAN_PAGES = 20
+SCAN_PAGE_SIZE = 200
+SCAN_FIELDS = ['sequence', 'animal_id', 'date', 'doctor', 'consultation_reason', 'write_date']
+
+# Archivo de laboratorio sintético: órdenes x analitos.
+LAB_ORDERS = 500
+LAB_ANALYTES = ['CREA', 'BUN', 'ALT', 'GLU', 'HCT', 'PLT', 'WBC', 'ALB', 'FA', 'PT']
+
+# Términos de la búsqueda clínica (índice tsvector vs. ILIKE sobre varias columnas).
+CLINICAL_TERMS = ['parvovirus', 'fractura', 'otitis', 'gastroenteritis']
+
+# Monitoreo intraoperatorio: 3 h cada 15 s por medición (valor base de cada una).
+VITALS_SAMPLES = 720
+VITALS_METRICS = [('hr', 80), ('rr', 14), ('temp', 37), ('spo2', 90), ('map', 70), ('etco2', 35)]
+
+# Cierre del día: recetas emitidas x líneas, sobre pocos medicamentos.
+DISPENSE_PRESCRIPTIONS = 100
+DISPENSE_LINES = 5
+
+# Jornada de esterilización: cirugías x líneas del kit.
+KIT_SURGERIES = 50
+KIT_LINES = 8
+
+# Sala de hospitalización: pacientes x tratamientos (cada 8 h, horizonte de 24 h).
+WARD_PATIENTS = 30
+WARD_TREATMENTS = 3
+
+# Importación de medicaciones (valida contraindicaciones y descuenta stock).
+MEDICATION_BULK = 2000
+
+# Campaña de vacunación con protocolos activos (recalcula pendientes de los animales vacunados).
+PROTOCOL_CAMPAIGN = 500
+
+# Agenda: médicos x días consultados (objetivo: muy por debajo de 100 ms).
+AGENDA_DOCTORS = 20
+AGENDA_DAYS = 30
+
+# Sala de espera: tickets abiertos en la cola al recalcular las esperas estimadas.
+QUEUE_TICKETS = 200
+
+# Cadena de frío: heladeras x un día de lecturas por minuto (con una excursión de 30 min en cada una).
+COLD_CHAIN_FRIDGES = 10
+COLD_CHAIN_MINUTES = 1440
+
+# Stock por ubicación: productos recibidos y trasladados al móvil, y aplicaciones descontadas desde allí.
+STOCK_PRODUCTS = 50
+STOCK_CONSUMPTIONS = 500
+
+# Valorización: recepciones con costo por producto y aplicaciones que consumen capas FIFO, y valor al día.
+VALUATION_RECEIPTS = 3
+VALUATION_CONSUMPTIONS = 2000
+
+
+class VetBenchmark(models.AbstractModel):
+    _name = "vet.benchmark"
+    _description = "Benchmark de flujos de la veterinaria"
+
+    @api.model
+    def run(self, output_path=None, repeat=5, flows=None):
+        """
+        Mide cada flujo `repeat` veces y guarda el resultado en JSON.
+        Devuelve el diccionario de resultados.
+        """
+        flows = flows or BENCHMARK_FLOWS
+        cr = self.env.cr
+        result = {
+            'database': cr.dbname,
+            'server_version': release.version,
+            'date': fields.Datetime.to_string(fields.Datetime.now()),
+            'repeat': repeat,
+            'dataset': {model: self.env[model].search_count([]) for model in DATASET_MODELS},
+            'flows': {},
+        }
+
+        for flow in flows:
+            method = getattr(self, '_bench_%s' % flow)
+            timings = []
+            queries = 0
+            for _i in range(repeat):
+                cr.execute('SAVEPOINT vet_benchmark')
+                try:
+                    self.env.invalidate_all()
+                    start_queries = cr.sql_log_count
+                    start = time.perf_counter()
+                    method()
+                    self.env.flush_all()
+                    timings.append(time.perf_counter() - start)
+                    queries = cr.sql_log_count - start_queries
+                finally:
+                    cr.execute('ROLLBACK TO SAVEPOINT vet_benchmark')
+                    self.env.invalidate_all()
+            result['flows'][flow] = {
+                'min_ms': round(min(timings) * 1000, 2),
+                'median_ms': round(statistics.median(timings) * 1000, 2),
+                'max_ms': round(max(timings) * 1000, 2),
+                'queries': queries,
+            }
+            _logger.info("vet.benchmark %s: %s", flow, result['flows'][flow])
+
+        if not output_path:
+            output_path = os.path.join(
+                tempfile.gettempdir(), 'vet_benchmark',
+                '%s-%s.json' % (cr.dbname, time.strftime('%Y%m%d-%H%M%S')),
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        _logger.info("vet.benchmark: resultados guardados en %s", output_path)
+        return result
+
+    # === Flujos ===
+    def _bench_animal_kanban(self):
+        """Primera página del kanban de animales, tal como la pide el cliente web."""
+        self.env['animal'].web_search_read(
+            [('active', '=', True)],
+            {
+                'name': {},
+                'species': {'fields': {'display_name': {}}},
+                'owner': {'fields': {'display_name': {}}},
+                'identification': {},
+                'sex': {},
+            },
+            limit=80,
+        )
+
+    def _bench_ticket_call_next(self):
+        """Llamar a los próximos 10 tickets de la sala de espera."""
+        Ticket = self.env['vet.waiting.ticket']
+        for _i in range(10):
+            Ticket.action_call_next()
+
+    def _bench_vaccination_create(self):
+        """Registrar 50 vacunaciones desde el formulario (una por una, con descuento de stock)."""
+        vaccine = self.env['animal.vaccine'].search([('stock_total_doses', '>=', 50)], limit=1)
+        animals = self.env['animal'].search([], limit=50)
+        if not vaccine or not animals:
+            return
+        # Fecha futura: evita chocar con la unicidad (animal, vacuna, fecha) de los datos poblados.
+        date = fields.Date.today() + timedelta(days=1)
+        Vaccination = self.env['animal.vaccination']
+        for animal in animals:
+            Vaccination.create({
+                'animal_id': animal.id,
+                'vaccine_id': vaccine.id,
+                'date': date,
+                'applied_doses': 1.0,
+            })
+
+    def _bench_vaccination_campaign(self):
+        """Campaña masiva: 500 animales con la misma vacuna (objetivo: menos de 2 s)."""
+        vaccine = self.env['animal.vaccine'].search([('stock_total_doses', '>=', 500)], limit=1)
+        animals = self.env['animal'].search([], limit=500)
+        if not vaccine or not animals:
+            return
+        self.env['animal.vaccination'].create_campaign(
+            vaccine, animals, fields.Date.today() + timedelta(days=1), {'applied_doses': 1.0},
+        )
+
+    def _bench_statistics_pivot(self):
+        """Agrupaciones de las vistas pivot/graph del menú Reportes."""
+        groupings = [
+            ('animal.visit', ['specie', 'date:month']),
+            ('animal.visit', ['specie', 'age_band']),
+            ('vet.waiting.ticket', ['age_band', 'arrival_time:day']),
+            ('animal.vaccination', ['vaccine_id', 'date:month']),
+            ('animal.deworming', ['dewormer_id', 'date:month']),
+            ('animal.sterilization', ['procedure_type', 'date:month']),
+        ]
+        for model, groupby in groupings:
+            self.env[model].read_group([], ['__count'], groupby, lazy=False)
+
+    def _bench_report_render(self):
+        """Render HTML (sin wkhtmltopdf) de los reportes más usados."""
+        Report = self.env['ir.actions.report']
+        for report_ref, model in [
+            ('vet_management.action_report_visit', 'animal.visit'),
+            ('vet_management.action_report_vaccination', 'animal.vaccination'),
+            ('vet_management.action_report_prescription', 'animal.prescription'),
+        ]:
+            docids = self.env[model].search([], limit=20).ids
+            if docids:
+                Report._render_qweb_html(report_ref, docids)
+
+    def _bench_api_keyset_scan(self):
+        """Recorrido de visitas como lo hace la API: páginas por (write_date, id) y campos acotados."""
+        Visit = self.env['animal.visit']
+        after = None
+        for _i in range(SCAN_PAGES):
+            rows = Visit._keyset_search(after=after, limit=SCAN_PAGE_SIZE)
+            if not rows:
+                break
+            Visit.browse([res_id for res_id, _write_date in rows]).read(SCAN_FIELDS)
+            after = (rows[-1][1], rows[-1][0])
+
+    def _bench_search_read_offset_scan(self):
+        """El mismo recorrido con `search_read` + offset, como lo hacían las integraciones."""
+        Visit = self.env['animal.visit']
+        for page in range(SCAN_PAGES):
+            if not Visit.search_read([], SCAN_FIELDS, offset=page * SCAN_PAGE_SIZE,
+                                     limit=SCAN_PAGE_SIZE, order='write_date, id'):
+                break
+
+    def _bench_clinical_fulltext_search(self):
+        """Búsqueda unificada por índice tsvector (con stemming y ranking)."""
+        ClinicalSearch = self.env['vet.clinical.search']
+        for term in CLINICAL_TERMS:
+            ClinicalSearch.search_narratives(term, limit=20)
+
+    def _bench_clinical_ilike_search(self):
+        """La misma búsqueda como se hacía antes: ILIKE sobre cada columna narrativa."""
+        for term in CLINICAL_TERMS:
+            for model_name in SEARCH_MODELS.values():
+                Model = self.env[model_name]
+                domain = ['|'] * (len(Model._clinical_search_fields) - 1) + [
+                    (name, 'ilike', term) for name in Model._clinical_search_fields
+                ]
+                Model.search_read(domain, ['display_name', 'animal_id', 'date'], limit=20)
+
+    def _bench_lab_ingest(self):
+        """Ingesta de un CSV de laboratorio con 10 analitos por orden (5.000 resultados)."""
+        sequences = self.env['animal.exam.order'].search([], limit=LAB_ORDERS).mapped('sequence')
+        if not sequences:
+            return
+        lines = ['orden;analito;valor;unidad;ref_min;ref_max']
+        for index, sequence in enumerate(sequences):
+            for code in LAB_ANALYTES:
+                lines.append('%s;%s;%s;mg/dL;1;10' % (sequence, code, (index % 120) / 10.0))
+        self.env['animal.lab.import'].ingest_file('benchmark.csv', '\n'.join(lines))
+
+    def _bench_vitals_intraop(self):
+        """Monitoreo de una cirugía de 3 h cada 15 s (6 mediciones) y lectura reducida a 300 puntos."""
+        surgery = self.env['animal.surgery.record'].search([('animal_id', '!=', False)], limit=1)
+        if not surgery:
+            return
+        start = fields.Datetime.now().replace(microsecond=0)
+        instants = [start + timedelta(seconds=15 * step) for step in range(VITALS_SAMPLES)]
+        Sample = self.env['animal.vital.sample']
+        Sample.ingest([
+            {
+                'animal_id': surgery.animal_id.id,
+                'surgery_record_id': surgery.id,
+                'metric': metric,
+                'points': [[instant, base + (index % 10)] for index, instant in enumerate(instants)],
+            }
+            for metric, base in VITALS_METRICS
+        ])
+        for metric, _base in VITALS_METRICS:
+            Sample.get_series(surgery.animal_id.id, metric, surgery_record_id=surgery.id, points=300)
+
+    def _bench_prescription_dispense(self):
+        """Dispensación en bloque de 100 recetas emitidas con 5 líneas cada una."""
+        animals = self.env['animal'].search([], limit=DISPENSE_PRESCRIPTIONS)
+        medicines = self.env['animal.medicine'].search([], limit=DISPENSE_LINES)
+        if not animals or not medicines:
+            return
+        medicines.write({'stock_boxes': 1000, 'packs_per_box': 10, 'units_per_pack': 10})
+        prescriptions = self.env['animal.prescription'].with_context(tracking_disable=True).create([
+            {
+                'animal_id': animal.id,
+                'state': 'issued',
+                'line_ids': [
+                    (0, 0, {'medicine_id': medicine.id, 'dose': 1, 'frequency_hours': 12, 'duration_days': 7})
+                    for medicine in medicines
+                ],
+            }
+            for animal in animals
+        ])
+        self.env.flush_all()
+        prescriptions.action_dispense()
+
+    def _bench_surgery_kit_apply(self):
+        """Kit de 8 consumos aplicado a 50 cirugías desde la lista."""
+        animals = self.env['animal'].search([], limit=KIT_SURGERIES)
+        medicines = self.env['animal.medicine'].search([], limit=KIT_LINES)
+        if not animals or not medicines:
+            return
+        medicines.write({'stock_boxes': 1000, 'packs_per_box': 10, 'units_per_pack': 10})
+        surgery = self.env['animal.surgery'].create({
+            'name': 'OVH (benchmark)',
+            'kit_line_ids': [(0, 0, {'medicine_id': medicine.id, 'quantity_units': 2}) for medicine in medicines],
+        })
+        records = self.env['animal.surgery.record'].with_context(tracking_disable=True).create([
+            {'animal_id': animal.id, 'surgery_id': surgery.id} for animal in animals
+        ])
+        self.env.flush_all()
+        records.action_apply_kit()
+
+    def _bench_hospitalization_round(self):
+        """Plan de 30 internados con 3 tratamientos, ciclo del cron y confirmación de toda la ronda."""
+        animals = self.env['animal'].search([], limit=WARD_PATIENTS)
+        medicines = self.env['animal.medicine'].search([], limit=WARD_TREATMENTS)
+        if not animals or not medicines:
+            return
+        medicines.write({'stock_boxes': 1000, 'packs_per_box': 10, 'units_per_pack': 10})
+        start = fields.Datetime.now() - timedelta(hours=1)
+        self.env['animal.hospitalization'].with_context(tracking_disable=True).create([
+            {
+                'animal_id': animal.id,
+                'treatment_ids': [
+                    (0, 0, {'medicine_id': medicine.id, 'interval_hours': 8, 'start_datetime': start})
+                    for medicine in medicines
+                ],
+            }
+            for animal in animals
+        ])
+        Treatment = self.env['animal.hospitalization.treatment']
+        Treatment._cron_expand_schedules()
+        self.env['animal.hospitalization.administration'].search([
+            ('state', '=', 'pending'), ('scheduled_at', '<=', fields.Datetime.now()),
+        ]).action_confirm()
+
+    def _bench_medication_bulk_create(self):
+        """Alta de 2.000 medicaciones en un solo `create` (validación contra el índice de contraindicaciones)."""
+        animals = self.env['animal'].search([], limit=MEDICATION_BULK // 10)
+        medicines = self.env['animal.medicine'].search([], limit=10)
+        if not animals or not medicines:
+            return
+        medicines.write({'stock_boxes': 10000, 'packs_per_box': 10, 'units_per_pack': 10})
+        self.env['animal.medication'].with_context(tracking_disable=True).create([
+            {'animal_id': animal.id, 'medicine_id': medicine.id, 'quantity_units': 1}
+            for animal in animals for medicine in medicines
+        ])
+
+    def _bench_protocol_campaign(self):
+        """Protocolo por especie y campaña de vacunación de 500 animales con recálculo de pendientes."""
+        animals = self.env['animal'].search([('birthdate', '!=', False)], limit=PROTOCOL_CAMPAIGN)
+        vaccine = self.env['animal.vaccine'].search([], limit=1)
+        if not animals or not vaccine:
+            return
+        self.env['animal.protocol'].create([
+            {
+                'name': 'Refuerzo anual (benchmark)',
+                'specie_id': specie.id,
+                'vaccine_id': vaccine.id,
+                'initial_doses': 2,
+            }
+            for specie in animals.species
+        ])
+        self.env['animal.vaccination'].create_campaign(vaccine, animals, fields.Date.today())
+
+    def _bench_age_refresh(self):
+        """Cron diario de edades: solo los cumpleaños de hoy, vía índice mes/día."""
+        self.env['ir.config_parameter'].sudo().set_param(
+            'vet_management.age_refresh_date', fields.Date.to_string(fields.Date.today() - timedelta(days=1)),
+        )
+        self.env['animal']._cron_refresh_age()
+
+    def _bench_appointment_availability(self):
+        """Disponibilidad de 20 médicos (lunes a viernes, 9 a 18 h) a 30 días, con un turno reservado por día."""
+        Doctor = self.env['vet.doctor']
+        doctors = Doctor.search([('name', '=like', 'Benchmark %')], limit=AGENDA_DOCTORS)
+        if not doctors:
+            doctors = Doctor.create([
+                {
+                    'name': 'Benchmark %02d' % n,
+                    'shift_ids': [(0, 0, {'weekday': str(day), 'hour_from': 9.0, 'hour_to': 18.0}) for day in range(5)],
+                }
+                for n in range(AGENDA_DOCTORS)
+            ])
+            animal = self.env['animal'].search([], limit=1)
+            if animal:
+                start = fields.Datetime.now().replace(hour=15, minute=0, second=0, microsecond=0)
+                self.env['vet.appointment'].with_context(tracking_disable=True).create([
+                    {'animal_id': animal.id, 'doctor_id': doctor.id, 'start': start + timedelta(days=day)}
+                    for doctor in doctors for day in range(AGENDA_DAYS)
+                ])
+        date_from = fields.Datetime.now()
+        doctors.get_availability(date_from, date_from + timedelta(days=AGENDA_DAYS))
+
+    def _bench_waiting_queue_prediction(self):
+        """Cola de 200 tickets: alta en un solo create, llamar y finalizar uno y leer las esperas de la cola."""
+        animals = self.env['animal'].search([], limit=QUEUE_TICKETS)
+        if not animals:
+            return
+        tickets = self.env['vet.waiting.ticket'].with_context(tracking_disable=True).create([
+            {'animal_id': animal.id, 'doctor': 'Dr. %s' % (n % 4), 'priority': str(n % 3)}
+            for n, animal in enumerate(animals)
+        ])
+        first = tickets[:1]
+        first.action_call()
+        first.action_start_consultation()
+        first.action_done()
+        tickets.invalidate_recordset(['expected_wait_minutes'])
+        tickets.mapped('expected_wait_minutes')
+
+    def _bench_waiting_room_closing(self):
+        """Cierre del día: 100 tickets llamados, atendidos y 100 cancelados en bloque."""
+        animals = self.env['animal'].search([], limit=200)
+        if len(animals) < 2:
+            return
+        Ticket = self.env['vet.waiting.ticket'].with_context(tracking_disable=True)
+        tickets = Ticket.create([{'animal_id': animal.id} for animal in animals])
+        half = len(tickets) // 2
+        tickets[:half].action_call()
+        tickets[:half].action_done()
+        tickets[half:].action_cancel()
+
+    def _bench_cold_chain_ingest(self):
+        """Un día de lecturas de 10 heladeras en un envío, detección de excursiones y gráfico del día."""
+        fridges = self.env['vet.fridge'].create([
+            {'name': 'Bench %s' % i, 'code': 'BENCH-%s' % i} for i in range(COLD_CHAIN_FRIDGES)
+        ])
+        start = fields.Datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=COLD_CHAIN_MINUTES)
+        series = [
+            {'fridge_id': fridge.id, 'points': [
+                [start + timedelta(minutes=minute), 9.5 if 600 <= minute < 630 else 4.0 + (minute % 7) / 10]
+                for minute in range(COLD_CHAIN_MINUTES)
+            ]}
+            for fridge in fridges
+        ]
+        Reading = self.env['vet.fridge.reading']
+        Reading.ingest(series)
+        for fridge in fridges:
+            Reading.get_series(fridge.id, start, start + timedelta(minutes=COLD_CHAIN_MINUTES))
+
+    def _bench_stock_transfer(self):
+        """Recepción de 50 medicamentos, traslado al móvil y 500 medicaciones descontadas desde el móvil."""
+        medicines = self.env['animal.medicine'].search([], limit=STOCK_PRODUCTS)
+        animals = self.env['animal'].search([], limit=STOCK_CONSUMPTIONS)
+        if not medicines or not animals:
+            return
+        Location = self.env['vet.stock.location']
+        main = Location._default_location()
+        vehicle = Location.create({'name': 'Bench móvil', 'location_type': 'vehicle'})
+        Transfer = self.env['vet.stock.transfer']
+        transfers = Transfer.create({
+            'transfer_type': 'receipt',
+            'location_dest_id': main.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': medicine.id, 'quantity': 1000})
+                         for medicine in medicines],
+        })
+        transfers |= Transfer.create({
+            'transfer_type': 'internal',
+            'location_id': main.id,
+            'location_dest_id': vehicle.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': medicine.id, 'quantity': 100})
+                         for medicine in medicines],
+        })
+        for transfer in transfers:
+            transfer.action_done()
+        self.env['animal.medication'].with_context(tracking_disable=True).create([
+            {
+                'animal_id': animal.id,
+                'medicine_id': medicines[i % len(medicines)].id,
+                'quantity_units': 1,
+                'consume_stock': True,
+                'stock_location_id': vehicle.id,
+            }
+            for i, animal in enumerate(animals)
+        ])
+
+    def _bench_stock_valuation(self):
+        """Tres recepciones con costo de 50 medicamentos, 2000 medicaciones (capas FIFO) y valorización al día."""
+        medicines = self.env['animal.medicine'].search([], limit=STOCK_PRODUCTS)
+        animals = self.env['animal'].search([], limit=STOCK_CONSUMPTIONS)
+        if not medicines or not animals:
+            return
+        main = self.env['vet.stock.location']._default_location()
+        for receipt in range(VALUATION_RECEIPTS):
+            self.env['vet.stock.transfer'].create({
+                'transfer_type': 'receipt',
+                'location_dest_id': main.id,
+                'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': medicine.id,
+                                     'quantity': VALUATION_CONSUMPTIONS, 'unit_cost': 1.0 + receipt})
+                             for medicine in medicines],
+            }).action_done()
+        self.env['animal.medication'].with_context(tracking_disable=True).create([
+            {
+                'animal_id': animals[i % len(animals)].id,
+                'medicine_id': medicines[i % len(medicines)].id,
+                'quantity_units': 3,
+                'consume_stock': True,
+                'stock_location_id': main.id,
+            }
+            for i in range(VALUATION_CONSUMPTIONS)
+        ])
+        report = self.env['vet.stock.valuation.report'].create({'product_type': 'medicine'})
+        report.action_compute()
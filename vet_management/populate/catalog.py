@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Datos de catálogo para `odoo-bin populate` (especies, razas, etiquetas,
+alergias y productos con stock suficiente para los registros clínicos).
+"""
+from odoo import models
+from odoo.tools import populate
+
+
+class Specie(models.Model):
+    _inherit = "animal.specie"
+    _populate_sizes = {'small': 3, 'medium': 6, 'large': 10}
+
+    def _populate_factories(self):
+        return [
+            ('name', populate.iterate([
+                'Canino', 'Felino', 'Conejo', 'Hurón', 'Ave',
+                'Roedor', 'Reptil', 'Equino', 'Bovino', 'Caprino',
+            ], then=populate.constant('Especie {counter}'))),
+        ]
+
+
+class Breed(models.Model):
+    _inherit = "animal.breed"
+    _populate_sizes = {'small': 10, 'medium': 40, 'large': 120}
+    _populate_dependencies = ['animal.specie']
+
+    def _populate_factories(self):
+        specie_ids = self.env.registry.populated_models['animal.specie']
+        return [
+            ('name', populate.constant('Raza {counter}')),
+            ('specie', populate.randomize(specie_ids)),
+        ]
+
+
+class Tag(models.Model):
+    _inherit = "animal.tag"
+    _populate_sizes = {'small': 5, 'medium': 15, 'large': 30}
+
+    def _populate_factories(self):
+        return [
+            ('name', populate.iterate([
+                'Negro', 'Blanco', 'Café', 'Atigrado', 'Tricolor', 'Gris', 'Dorado',
+            ], then=populate.constant('Etiqueta {counter}'))),
+            ('color', populate.randint(0, 11)),
+        ]
+
+
+class Allergy(models.Model):
+    _inherit = "animal.allergy"
+    _populate_sizes = {'small': 5, 'medium': 20, 'large': 50}
+
+    def _populate_factories(self):
+        return [
+            ('name', populate.constant('Alergia {counter}')),
+            ('allergy_type', populate.randomize(['food', 'drug', 'environment', 'other'], [3, 3, 2, 1])),
+            ('severity', populate.randomize(['low', 'medium', 'high'], [5, 3, 1])),
+        ]
+
+
+class Vaccine(models.Model):
+    _inherit = "animal.vaccine"
+    _populate_sizes = {'small': 5, 'medium': 15, 'large': 30}
+
+    def _populate_factories(self):
+        # El stock es holgado a propósito: los registros de vacunación poblados descuentan dosis.
+        return [
+            ('name', populate.constant('Vacuna {counter}')),
+            ('vials_per_box', populate.randomize([1, 5, 10, 25])),
+            ('doses_per_vial', populate.randomize([1, 1, 2, 10])),
+            ('stock_boxes', populate.constant(20000)),
+        ]
+
+
+class Dewormer(models.Model):
+    _inherit = "animal.dewormer"
+    _populate_sizes = {'small': 5, 'medium': 10, 'large': 20}
+
+    def _populate_factories(self):
+        return [
+            ('name', populate.constant('Desparasitante {counter}')),
+            ('packs_per_box', populate.randomize([1, 2, 10])),
+            ('units_per_pack', populate.randomize([1.0, 4.0, 10.0])),
+            ('stock_boxes', populate.constant(20000)),
+        ]
+
+
+class Medicine(models.Model):
+    _inherit = "animal.medicine"
+    _populate_sizes = {'small': 10, 'medium': 30, 'large': 80}
+
+    def _populate_factories(self):
+        return [
+            ('name', populate.constant('Medicamento {counter}')),
+            ('packs_per_box', populate.randomize([1, 2, 10])),
+            ('units_per_pack', populate.randomize([1.0, 10.0, 100.0])),
+            ('stock_boxes', populate.constant(20000)),
+        ]
+
+
+class Surgery(models.Model):
+    _inherit = "animal.surgery"
+    _populate_sizes = {'small': 5, 'medium': 15, 'large': 40}
+
+    def _populate_factories(self):
+        categories = [key for key, _label in self._fields['category'].selection]
+        return [
+            ('name', populate.iterate(
+                ['OVH', 'Orquiectomía', 'Enterectomía', 'Cistotomía', 'Mastectomía'],
+                then=populate.constant('Cirugía {counter}'),
+            )),
+            ('code', populate.constant('CX-{counter}')),
+            ('category', populate.randomize(categories)),
+            ('default_duration_min', populate.randint(20, 180)),
+        ]
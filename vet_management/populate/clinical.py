@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Registros clínicos poblados sobre los animales de `populate/animal.py`.
+
+Los registros con restricción de unicidad (animal, producto, fecha) se reparten
+de forma determinista según el contador para no chocar con `_sql_constraints`.
+"""
+from datetime import timedelta
+
+from odoo import fields, models
+from odoo.tools import populate
+
+from .animal import DOCTORS
+
+REASONS = ['Control anual', 'Vómitos', 'Diarrea', 'Cojera', 'Prurito', 'Tos', 'Decaimiento', 'Herida']
+
+
+def _recent(days):
+    """Fecha/hora aleatoria dentro de los últimos `days` días."""
+    return populate.randdatetime(base_date=fields.Datetime.now(), relative_before=timedelta(days=-days))
+
+
+def _spread(ids_a, ids_b, counter):
+    """Combinación única (a, b, periodo) para el contador dado."""
+    a = ids_a[counter % len(ids_a)]
+    b = ids_b[(counter // len(ids_a)) % len(ids_b)]
+    period = counter // (len(ids_a) * len(ids_b))
+    return a, b, period
+
+
+class Visit(models.Model):
+    _inherit = "animal.visit"
+    _populate_sizes = {'small': 200, 'medium': 20000, 'large': 200000}
+    _populate_dependencies = ['animal']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('date', _recent(5 * 365)),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('consultation_reason', populate.randomize(REASONS)),
+            ('anamnesis', populate.constant('Anamnesis de la visita {counter}.')),
+            ('clinical_exam', populate.constant('Examen clínico sin hallazgos relevantes ({counter}).')),
+            ('prediagnoses', populate.randomize(['Gastroenteritis', 'Otitis', 'Dermatitis', 'Parvovirus', 'Fractura'])),
+            ('treatment', populate.constant('Tratamiento sintomático.')),
+        ]
+
+
+class Vaccination(models.Model):
+    _inherit = "animal.vaccination"
+    _populate_sizes = {'small': 200, 'medium': 10000, 'large': 50000}
+    _populate_dependencies = ['animal', 'animal.vaccine']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        vaccine_ids = self.env.registry.populated_models['animal.vaccine']
+        today = fields.Date.today()
+
+        def get_animal(counter=None, **kwargs):
+            return _spread(animal_ids, vaccine_ids, counter)[0]
+
+        def get_vaccine(counter=None, **kwargs):
+            return _spread(animal_ids, vaccine_ids, counter)[1]
+
+        def get_date(counter=None, random=None, **kwargs):
+            period = _spread(animal_ids, vaccine_ids, counter)[2]
+            return today - timedelta(days=365 * period + random.randint(0, 364))
+
+        def get_next_date(values=None, **kwargs):
+            return values['date'] + timedelta(days=365)
+
+        return [
+            ('animal_id', populate.compute(get_animal)),
+            ('vaccine_id', populate.compute(get_vaccine)),
+            ('date', populate.compute(get_date)),
+            ('next_date', populate.compute(get_next_date)),
+            ('route', populate.randomize(['sc', 'im'])),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('applied_doses', populate.constant(1.0)),
+            ('lot_number', populate.constant('L{counter}')),
+        ]
+
+
+class Deworming(models.Model):
+    _inherit = "animal.deworming"
+    _populate_sizes = {'small': 200, 'medium': 10000, 'large': 50000}
+    _populate_dependencies = ['animal', 'animal.dewormer']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        dewormer_ids = self.env.registry.populated_models['animal.dewormer']
+        now = fields.Datetime.now().replace(microsecond=0)
+
+        def get_animal(counter=None, **kwargs):
+            return _spread(animal_ids, dewormer_ids, counter)[0]
+
+        def get_dewormer(counter=None, **kwargs):
+            return _spread(animal_ids, dewormer_ids, counter)[1]
+
+        def get_date(counter=None, random=None, **kwargs):
+            period = _spread(animal_ids, dewormer_ids, counter)[2]
+            return now - timedelta(days=90 * period + random.randint(0, 89))
+
+        def get_next_date(values=None, **kwargs):
+            return (values['date'] + timedelta(days=90)).date()
+
+        return [
+            ('animal_id', populate.compute(get_animal)),
+            ('dewormer_id', populate.compute(get_dewormer)),
+            ('date', populate.compute(get_date)),
+            ('next_date', populate.compute(get_next_date)),
+            ('route', populate.randomize(['oral', 'topical'])),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('quantity_units', populate.randomize([0.5, 1.0, 2.0])),
+        ]
+
+
+class Medication(models.Model):
+    _inherit = "animal.medication"
+    _populate_sizes = {'small': 200, 'medium': 10000, 'large': 50000}
+    _populate_dependencies = ['animal', 'animal.medicine']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        medicine_ids = self.env.registry.populated_models['animal.medicine']
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('medicine_id', populate.randomize(medicine_ids)),
+            ('date', _recent(3 * 365)),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('quantity_units', populate.randomize([0.5, 1.0, 2.0, 3.0])),
+        ]
+
+
+class SurgeryRecord(models.Model):
+    _inherit = "animal.surgery.record"
+    _populate_sizes = {'small': 50, 'medium': 2000, 'large': 10000}
+    _populate_dependencies = ['animal', 'animal.surgery', 'animal.medicine']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        surgery_ids = self.env.registry.populated_models['animal.surgery']
+        medicine_ids = self.env.registry.populated_models['animal.medicine']
+
+        def get_lines(random=None, **kwargs):
+            return [
+                (0, 0, {
+                    'medicine_id': medicine_id,
+                    'quantity_units': random.choice([1.0, 2.0, 5.0]),
+                })
+                for medicine_id in random.sample(medicine_ids, min(len(medicine_ids), random.randint(1, 4)))
+            ]
+
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('surgery_id', populate.randomize(surgery_ids)),
+            ('date', _recent(3 * 365)),
+            ('duration_min', populate.randint(20, 180)),
+            ('state', populate.randomize(['scheduled', 'in_progress', 'done', 'cancelled'], [1, 1, 8, 1])),
+            ('surgeon', populate.randomize(DOCTORS)),
+            ('anesthetist', populate.randomize(DOCTORS)),
+            ('asa_status', populate.randomize(['I', 'II', 'III', 'IV'], [4, 4, 2, 1])),
+            ('procedure_details', populate.constant('Procedimiento sin incidentes ({counter}).')),
+            ('medication_line_ids', populate.compute(get_lines)),
+        ]
+
+
+class Consent(models.Model):
+    _inherit = "animal.consent"
+    _populate_sizes = {'small': 50, 'medium': 3000, 'large': 20000}
+    _populate_dependencies = ['animal']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        consent_types = [key for key, _label in self._fields['consent_type'].selection]
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('date', _recent(3 * 365)),
+            ('consent_type', populate.randomize(consent_types)),
+            ('description', populate.constant('Procedimiento {counter}.')),
+            ('doctor_name', populate.randomize(DOCTORS)),
+            ('state', populate.randomize(['draft', 'signed', 'cancelled'], [2, 7, 1])),
+        ]
+
+
+class Prescription(models.Model):
+    _inherit = "animal.prescription"
+    _populate_sizes = {'small': 100, 'medium': 5000, 'large': 40000}
+    _populate_dependencies = ['animal']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('date', _recent(3 * 365)),
+            ('doctor_name', populate.randomize(DOCTORS)),
+            ('diagnosis', populate.randomize(['Otitis externa', 'Dermatitis atópica', 'Gastroenteritis'])),
+            ('rp', populate.constant('Amoxicilina 250 mg c/12 h por 7 días ({counter}).')),
+            ('duration_days', populate.randint(3, 30)),
+            ('state', populate.randomize(['draft', 'issued', 'cancelled'], [2, 7, 1])),
+        ]
+
+
+class ExamOrder(models.Model):
+    _inherit = "animal.exam.order"
+    _populate_sizes = {'small': 100, 'medium': 5000, 'large': 30000}
+    _populate_dependencies = ['animal']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        exam_types = [key for key, _label in self._fields['exam_type'].selection]
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('date', _recent(3 * 365)),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('exam_type', populate.randomize(exam_types)),
+            ('priority', populate.randomize(['normal', 'alta', 'urgente'], [6, 3, 1])),
+            ('state', populate.randomize(['draft', 'ordered', 'done', 'cancelled'], [1, 2, 6, 1])),
+            ('results', populate.constant('Valores dentro de rango ({counter}).')),
+        ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import fields, models
+from odoo.tools import populate
+
+from .animal import DOCTORS
+from .clinical import REASONS
+
+
+class VetWaitingTicket(models.Model):
+    _inherit = "vet.waiting.ticket"
+    _populate_sizes = {'small': 50, 'medium': 3000, 'large': 30000}
+    _populate_dependencies = ['animal']
+
+    def _populate_factories(self):
+        animal_ids = self.env.registry.populated_models['animal']
+        now = fields.Datetime.now().replace(microsecond=0)
+
+        def get_arrival(values=None, random=None, **kwargs):
+            # Los tickets abiertos son de hoy; los cerrados, del último año.
+            if values['state'] in ('waiting', 'called', 'in_consultation', 'paused'):
+                return now - timedelta(minutes=random.randint(0, 240))
+            return now - timedelta(days=random.randint(1, 365), minutes=random.randint(0, 600))
+
+        def get_called(values=None, random=None, **kwargs):
+            if values['state'] in ('called', 'in_consultation', 'paused', 'done'):
+                return values['arrival_time'] + timedelta(minutes=random.randint(1, 45))
+            return False
+
+        def get_start(values=None, random=None, **kwargs):
+            if values['state'] in ('in_consultation', 'paused', 'done'):
+                return values['called_time'] + timedelta(minutes=random.randint(0, 5))
+            return False
+
+        def get_end(values=None, random=None, **kwargs):
+            if values['state'] == 'done':
+                return values['start_time'] + timedelta(minutes=random.randint(10, 60))
+            return False
+
+        return [
+            ('animal_id', populate.randomize(animal_ids)),
+            ('state', populate.randomize(
+                ['waiting', 'called', 'in_consultation', 'paused', 'done', 'cancelled'],
+                [2, 1, 1, 1, 30, 3],
+            )),
+            ('priority', populate.randomize(['0', '1', '2', '3'], [2, 10, 3, 1])),
+            ('arrival_time', populate.compute(get_arrival)),
+            ('called_time', populate.compute(get_called)),
+            ('start_time', populate.compute(get_start)),
+            ('end_time', populate.compute(get_end)),
+            ('doctor', populate.randomize(DOCTORS)),
+            ('room', populate.randomize(['Box 1', 'Box 2', 'Box 3', 'Box 4'])),
+            ('reason', populate.randomize(REASONS)),
+        ]
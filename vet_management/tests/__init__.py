@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+from . import test_sync
+from . import test_document_cache
+from . import test_patient_context
+from . import test_lab_results
+from . import test_animal_merge
+from . import test_contraindications
+from . import test_waiting_room_stats
+from . import test_concurrency
+from . import test_cold_chain
+from . import test_stock
+from . import test_stock_valuation
+from . import test_appointments
@@ -0,0 +1,24 @@
+from odoo.tests import TransactionCase
+
+
+class VetTestCommon(TransactionCase):
+    """Datos mínimos compartidos: especie, animal y un producto de cada catálogo con stock."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.specie = cls.env['animal.specie'].create({'name': 'Canino'})
+        cls.animal = cls.env['animal'].create({'name': 'Firulais', 'species': cls.specie.id})
+        cls.location = cls.env['vet.stock.location']._default_location()
+        cls.vaccine = cls.env['animal.vaccine'].create({'name': 'Antirrábica', 'stock_doses': 10})
+        cls.dewormer = cls.env['animal.dewormer'].create({'name': 'Praziquantel', 'stock_units': 10})
+        cls.medicine = cls.env['animal.medicine'].create({'name': 'Meloxicam', 'stock_units': 10})
+
+    def _edit_later(self, record, values):
+        """Edición en una transacción posterior: write_date es la hora de la transacción."""
+        record.write(values)
+        self.env.flush_all()
+        self.env.cr.execute('UPDATE "%s" SET write_date = write_date + interval \'1 minute\' WHERE id = %%s'
+                            % record._table, [record.id])
+        record.invalidate_recordset(['write_date'])
@@ -0,0 +1,41 @@
+import base64
+
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAnimalMerge(VetTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.partner = self.env['res.partner'].create({'name': 'Seguidor'})
+        self.sources = self.env['animal'].create([
+            {'name': 'Firulais 2', 'species': self.specie.id, 'photo': base64.b64encode(b'foto-2')},
+            {'name': 'Firulais 3', 'species': self.specie.id, 'photo': base64.b64encode(b'foto-3')},
+        ])
+        self.animal.photo = base64.b64encode(b'foto-destino')
+
+    def _attachments(self, animal, **domain):
+        return self.env['ir.attachment'].search([
+            ('res_model', '=', 'animal'), ('res_id', '=', animal.id),
+        ] + [(name, '=', value) for name, value in domain.items()])
+
+    def test_followers_deduplicated_across_sources(self):
+        self.sources.message_subscribe(partner_ids=self.partner.ids)
+        (self.sources | self.animal)._merge_into(self.animal)
+        followers = self.env['mail.followers'].search([
+            ('res_model', '=', 'animal'), ('res_id', '=', self.animal.id), ('partner_id', '=', self.partner.id),
+        ])
+        self.assertEqual(len(followers), 1)
+
+    def test_photo_attachment_not_moved(self):
+        document = self.env['ir.attachment'].create({
+            'name': 'radiografia.png', 'res_model': 'animal', 'res_id': self.sources[0].id, 'raw': b'rx',
+        })
+        (self.sources | self.animal)._merge_into(self.animal)
+        self.assertEqual(document.res_id, self.animal.id)
+        self.assertEqual(len(self._attachments(self.animal, res_field='photo')), 1)
+        self.assertEqual(base64.b64decode(self.animal.photo), b'foto-destino')
+        self.assertFalse(self.sources.exists())
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from psycopg2 import IntegrityError
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestAppointments(VetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.doctor = cls.env['vet.doctor'].create({'name': 'Dra. Pérez', 'slot_minutes': 30})
+        cls.start = datetime(2030, 3, 4, 10, 0)
+
+    def _book(self, start):
+        return self.env['vet.appointment'].create({
+            'animal_id': self.animal.id, 'doctor_id': self.doctor.id, 'start': start,
+        })
+
+    def test_overlapping_booking_refused(self):
+        self._book(self.start)
+        # La restricción EXCLUDE puede adelantarse a _check_overlap al escribir.
+        with self.assertRaises((ValidationError, IntegrityError)), mute_logger('odoo.sql_db'):
+            self._book(datetime(2030, 3, 4, 10, 15))
+
+    def test_booking_clashes_with_surgery(self):
+        surgery = self.env['animal.surgery'].create({'name': 'OVH', 'default_duration_min': 90})
+        record = self.env['animal.surgery.record'].create({
+            'animal_id': self.animal.id, 'surgery_id': surgery.id,
+            'surgeon': self.doctor.name, 'date': self.start,
+        })
+        with self.assertRaises(ValidationError) as error:
+            self._book(datetime(2030, 3, 4, 11, 0))
+        self.assertIn(record.sequence, str(error.exception))
+        self._book(datetime(2030, 3, 4, 11, 30))
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestColdChain(VetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fridge = cls.env['vet.fridge'].create({'name': 'Heladera test', 'code': 'TEST-01', 'excursion_min_minutes': 10})
+        cls.Reading = cls.env['vet.fridge.reading']
+
+    def test_offsets_converted_to_utc(self):
+        self.Reading.ingest([{'fridge': 'TEST-01', 'points': [['2024-05-02T10:00:00-04:00', 4.0],
+                                                              ['2024-05-02T14:01:00Z', 4.1]]}])
+        readings = self.Reading.search([('fridge_id', '=', self.fridge.id)], order='measured_at')
+        self.assertEqual(readings.mapped('measured_at'), [datetime(2024, 5, 2, 14, 0), datetime(2024, 5, 2, 14, 1)])
+
+    def test_naive_and_aware_mix_rejected(self):
+        with self.assertRaises(UserError):
+            self.Reading.ingest([{'fridge': 'TEST-01', 'points': [['2024-05-02T10:00:00', 4.0],
+                                                                  ['2024-05-02T10:01:00+00:00', 4.1]]}])
+
+    def test_excursion_lasts_one_interval_per_reading(self):
+        start = datetime(2024, 5, 2, 10, 0)
+        # 10 lecturas fuera de rango, una por minuto, entre lecturas en rango: 10 minutos = la tolerancia.
+        temperatures = [4.0] * 5 + [9.5] * 10 + [4.0] * 5
+        result = self.Reading.ingest([{'fridge_id': self.fridge.id, 'points': [
+            [start + timedelta(minutes=minute), temperature] for minute, temperature in enumerate(temperatures)
+        ]}])
+        excursion = self.env['vet.fridge.excursion'].browse(result['excursions'])
+        self.assertEqual(len(excursion), 1)
+        self.assertEqual(excursion.readings, 10)
+        self.assertEqual(excursion.duration_minutes, 10)
@@ -0,0 +1,111 @@
+"""
+Carreras de transiciones con cursores reales: varios clientes, cada uno en su
+hilo y su transacción, intentan a la vez la misma transición sobre el mismo
+ticket o cirugía. Confirman datos en la base (y los eliminan al terminar), por
+eso no corren con la suite estándar::
+
+    odoo-bin -d <base> --test-tags /vet_management:concurrency
+"""
+import threading
+
+from odoo import api
+from odoo.tests import TransactionCase, tagged
+
+from ..models.concurrency import ConcurrentUpdateError
+
+CLIENTS = 8
+ROUNDS = 3
+# Tiempo máximo de espera de cada cliente en la barrera de arranque (segundos).
+BARRIER_TIMEOUT = 30
+
+
+@tagged('-standard', 'concurrency', 'post_install', '-at_install')
+class TestConcurrency(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.context = {'tracking_disable': True}
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.context)
+            specie = env['animal.specie'].create({'name': 'Concurrencia'})
+            animals = env['animal'].create([{'name': 'Carrera %s' % n, 'species': specie.id} for n in range(ROUNDS)])
+            surgery = env['animal.surgery'].create({'name': 'Carrera'})
+            self.ticket_ids = env['vet.waiting.ticket'].create([{'animal_id': animal.id} for animal in animals]).ids
+            self.surgery_ids = env['animal.surgery.record'].create([
+                {'animal_id': animal.id, 'surgery_id': surgery.id} for animal in animals
+            ]).ids
+            self.animal_ids, self.catalog_ids = animals.ids, (specie.id, surgery.id)
+        # El `with` confirma: los clientes ven los registros desde sus propias transacciones.
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.context)
+            env['animal.surgery.record'].browse(self.surgery_ids).unlink()
+            env['vet.waiting.ticket'].browse(self.ticket_ids).unlink()
+            env['animal.visit'].search([('animal_id', 'in', self.animal_ids)]).unlink()
+            env['animal'].browse(self.animal_ids).unlink()
+            env['animal.surgery'].browse(self.catalog_ids[1]).unlink()
+            env['animal.specie'].browse(self.catalog_ids[0]).unlink()
+
+    def _race(self, prepare):
+        """
+        Lanza un cliente por elemento de `prepare`: cada uno prepara su acción con
+        su propio entorno, espera a los demás y la ejecuta. Devuelve 'ok',
+        'conflict' o el error inesperado de cada cliente.
+        """
+        barrier = threading.Barrier(len(prepare))
+        outcomes = [None] * len(prepare)
+
+        def client(index, make_action):
+            try:
+                with self.registry.cursor() as cr:
+                    action = make_action(api.Environment(cr, self.env.uid, self.context))
+                    barrier.wait(BARRIER_TIMEOUT)
+                    try:
+                        with cr.savepoint():
+                            action()
+                        outcomes[index] = 'ok'
+                    except ConcurrentUpdateError:
+                        outcomes[index] = 'conflict'
+            except Exception as e:
+                outcomes[index] = repr(e)
+
+        threads = [threading.Thread(target=client, args=item) for item in enumerate(prepare)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def _assert_one_winner(self, outcomes):
+        self.assertEqual(sorted(outcomes), ['conflict'] * (len(outcomes) - 1) + ['ok'])
+
+    def test_start_consultation(self):
+        for ticket_id in self.ticket_ids:
+            def start(env, ticket_id=ticket_id):
+                ticket = env['vet.waiting.ticket'].browse(ticket_id)
+                versions = {ticket_id: ticket.version}
+                return lambda: ticket.action_start_consultation(versions=versions)
+            self._assert_one_winner(self._race([start] * CLIENTS))
+        with self.registry.cursor() as cr:
+            cr.execute("""
+                SELECT count(*) FROM vet_waiting_ticket_transition
+                 WHERE ticket_id IN %s AND to_state = 'in_consultation'
+            """, [tuple(self.ticket_ids)])
+            self.assertEqual(cr.fetchone()[0], len(self.ticket_ids))
+            cr.execute("SELECT count(*) FROM animal_visit WHERE animal_id IN %s", [tuple(self.animal_ids)])
+            self.assertEqual(cr.fetchone()[0], len(self.ticket_ids))
+
+    def test_surgery_start_against_cancel(self):
+        for surgery_id in self.surgery_ids:
+            def prepare(env, action, surgery_id=surgery_id):
+                record = env['animal.surgery.record'].browse(surgery_id)
+                record.state  # toma la instantánea antes de la barrera
+                return getattr(record, action)
+            self._assert_one_winner(self._race([
+                lambda env: prepare(env, 'action_start'), lambda env: prepare(env, 'action_cancel'),
+            ] * (CLIENTS // 2)))
+        with self.registry.cursor() as cr:
+            cr.execute("SELECT version FROM animal_surgery_record WHERE id IN %s", [tuple(self.surgery_ids)])
+            self.assertEqual({version for version, in cr.fetchall()}, {2})
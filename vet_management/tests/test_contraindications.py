@@ -0,0 +1,42 @@
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestContraindications(VetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.allergic = cls.env['animal'].create({'name': 'Alérgico', 'species': cls.specie.id})
+        cls.env['animal.allergy'].create({
+            'name': 'AINE', 'severity': 'high',
+            'animal_ids': [(6, 0, cls.allergic.ids)], 'medicine_ids': [(6, 0, cls.medicine.ids)],
+        })
+
+    def test_blocks_on_create(self):
+        with self.assertRaises(UserError):
+            self.env['animal.prescription'].create({
+                'animal_id': self.allergic.id, 'line_ids': [(0, 0, {'medicine_id': self.medicine.id})],
+            })
+
+    def test_parent_animal_change_rechecks_lines(self):
+        prescription = self.env['animal.prescription'].create({
+            'animal_id': self.animal.id, 'line_ids': [(0, 0, {'medicine_id': self.medicine.id})],
+        })
+        with self.assertRaises(UserError):
+            prescription.animal_id = self.allergic
+
+    def test_new_medicine_with_allergic_ingredient(self):
+        ingredient = self.env['animal.medicine.ingredient'].create({'name': 'Carprofeno'})
+        self.env['animal.allergy'].create({
+            'name': 'Carprofeno', 'severity': 'high',
+            'animal_ids': [(6, 0, self.allergic.ids)], 'ingredient_ids': [(6, 0, ingredient.ids)],
+        })
+        medicine = self.env['animal.medicine'].create({'name': 'Rimadyl', 'ingredient_ids': [(6, 0, ingredient.ids)]})
+        with self.assertRaises(UserError):
+            self.env['animal.prescription'].create({
+                'animal_id': self.allergic.id, 'line_ids': [(0, 0, {'medicine_id': medicine.id})],
+            })
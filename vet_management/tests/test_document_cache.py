@@ -0,0 +1,48 @@
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestDocumentCache(VetTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.prescription = self.env['animal.prescription'].create({
+            'animal_id': self.animal.id,
+            'state': 'issued',
+            'line_ids': [(0, 0, {'medicine_id': self.medicine.id, 'dose': 1, 'frequency_hours': 24, 'duration_days': 1})],
+        })
+
+    def test_related_changes_refresh_the_key(self):
+        name = self.prescription._document_cache_name('Receta')
+        self._edit_later(self.animal, {'name': 'Otro nombre'})
+        self.assertNotEqual(self.prescription._document_cache_name('Receta'), name)
+        name = self.prescription._document_cache_name('Receta')
+        self._edit_later(self.medicine, {'name': 'Meloxicam 2 mg'})
+        self.assertNotEqual(self.prescription._document_cache_name('Receta'), name)
+
+    def test_dispensing_keeps_the_cached_pdf(self):
+        name = self.prescription._document_cache_name('Receta')
+        self.prescription.write({'dispense_date': fields.Datetime.now()})
+        self.assertEqual(self.prescription._document_cache_name('Receta'), name)
+
+    def test_warm_render_not_counted(self):
+        report = self.env.ref('vet_management.action_report_prescription')
+        Stat = self.env['vet.report.cache.stat']
+        report.with_context(vet_document_cache_warm=True)._retrieve_attachment(self.prescription)
+        self.assertFalse(Stat.search([('report_id', '=', report.id)]))
+        report._retrieve_attachment(self.prescription)
+        self.assertEqual(Stat.search([('report_id', '=', report.id)]).misses, 1)
+
+    def test_purge_escapes_wildcards(self):
+        self.prescription.sequence = 'RX_1'
+        name = self.prescription._document_cache_name('Receta')
+        Attachment = self.env['ir.attachment']
+        values = {'res_model': 'animal.prescription', 'res_id': self.prescription.id, 'raw': b'pdf'}
+        stale = Attachment.create(dict(values, name='Receta-RX_1-0123456789abcdef.pdf'))
+        lookalike = Attachment.create(dict(values, name='Receta-RXa1-0123456789abcdef.pdf'))
+        self.prescription._document_cache_purge_stale(name)
+        self.assertFalse(stale.exists())
+        self.assertTrue(lookalike.exists())
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+import psycopg2
+
+from odoo.tests import tagged
+
+from odoo.addons.vet_management.models.lab_results import result_flag
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestLabResults(VetTestCommon):
+
+    def test_zero_is_a_valid_bound(self):
+        self.assertEqual(result_flag(-0.5, 0.0, 5.0), 'low')
+        self.assertEqual(result_flag(6.0, None, 5.0), 'high')
+        self.assertEqual(result_flag(1.0, 0.0, None), 'normal')
+        self.assertIsNone(result_flag(1.0, None, None))
+
+    def test_ingest_flags_against_zero_lower_bound(self):
+        order = self.env['animal.exam.order'].create({'animal_id': self.animal.id})
+        log = self.env['animal.lab.import'].ingest_file('resultados.csv', (
+            "orden;analito;valor;ref_min;ref_max\n%s;TEST0;-1;0;5\n" % order.sequence
+        ).encode())
+        self.assertEqual(log.state, 'done')
+        result = self.env['animal.lab.result'].search([('order_id', '=', order.id)])
+        self.assertEqual(result.flag, 'low')
+
+    def test_database_error_marks_file_as_error(self):
+        Import = self.env['animal.lab.import']
+        with patch.object(type(Import), '_ingest_rows', side_effect=psycopg2.DataError("valor fuera de rango")):
+            log = Import.ingest_file('roto.csv', b"orden;analito;valor\nX;GLU;1\n")
+        self.assertEqual(log.state, 'error')
@@ -0,0 +1,38 @@
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPatientContext(VetTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.PatientContext = self.env['vet.patient.context']
+        self.PatientContext._invalidate([self.animal.id])
+
+    def test_callers_get_copies(self):
+        data = self.PatientContext.get([self.animal.id])[self.animal.id]
+        data['name'] = 'Modificado'
+        data['tag_names'].append('Modificado')
+        again = self.PatientContext.get([self.animal.id])[self.animal.id]
+        self.assertEqual(again['name'], self.animal.name)
+        self.assertNotIn('Modificado', again['tag_names'])
+
+    def test_consent_unlink_invalidates(self):
+        consent = self.env['animal.consent'].create({
+            'animal_id': self.animal.id, 'date': fields.Datetime.now(), 'consent_type': 'surgery', 'state': 'signed',
+        })
+        self.assertEqual(self.PatientContext.get([self.animal.id])[self.animal.id]['consent_id'], consent.id)
+        consent.unlink()
+        self.assertFalse(self.PatientContext.get([self.animal.id])[self.animal.id]['consent_id'])
+
+    def test_cache_is_per_user(self):
+        self.PatientContext.get([self.animal.id])
+        user = self.env['res.users'].create({
+            'name': 'Sin acceso a consentimientos', 'login': 'vet_context_other',
+            'groups_id': [(6, 0, self.env.ref('base.group_user').ids)],
+        })
+        data = self.PatientContext.with_user(user).with_context(lang='en_US').get([self.animal.id])
+        self.assertIn(self.animal.id, data)
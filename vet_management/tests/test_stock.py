@@ -0,0 +1,63 @@
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStock(VetTestCommon):
+
+    def _quantity(self, location, medicine):
+        return sum(self.env['vet.stock.quant'].search([
+            ('location_id', '=', location.id), ('medicine_id', '=', medicine.id),
+        ]).mapped('quantity'))
+
+    def test_receipt_adds_lines_of_same_product(self):
+        self.env['vet.stock.transfer'].create({
+            'transfer_type': 'receipt',
+            'location_dest_id': self.location.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': self.medicine.id, 'quantity': qty})
+                         for qty in (3, 4)],
+        }).action_done()
+        self.assertEqual(self.medicine.stock_total_units, 17)
+        self.assertEqual(self._quantity(self.location, self.medicine), 17)
+
+    def test_dispense_from_doctor_location(self):
+        vehicle = self.env['vet.stock.location'].create({'name': 'Móvil', 'location_type': 'vehicle'})
+        self.env['vet.doctor'].create({'name': 'Dra. Móvil', 'stock_location_id': vehicle.id})
+        self.env['vet.stock.transfer'].create({
+            'transfer_type': 'internal',
+            'location_id': self.location.id,
+            'location_dest_id': vehicle.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': self.medicine.id, 'quantity': 5})],
+        }).action_done()
+        prescription = self.env['animal.prescription'].create({
+            'animal_id': self.animal.id,
+            'doctor_name': 'Dra. Móvil',
+            'line_ids': [(0, 0, {'medicine_id': self.medicine.id, 'quantity_units': 2})],
+        })
+        prescription.action_issue()
+        prescription.action_dispense()
+        self.assertEqual(self._quantity(vehicle, self.medicine), 3)
+        self.assertEqual(self._quantity(self.location, self.medicine), 5)
+        medication = self.env['animal.medication'].search([('prescription_line_id', 'in', prescription.line_ids.ids)])
+        self.assertEqual(medication.stock_location_id, vehicle)
+
+    def test_surgery_line_uses_surgeon_location(self):
+        vehicle = self.env['vet.stock.location'].create({'name': 'Quirófano móvil', 'location_type': 'vehicle'})
+        self.env['vet.doctor'].create({'name': 'Dr. Cirujano', 'stock_location_id': vehicle.id})
+        self.env['vet.stock.transfer'].create({
+            'transfer_type': 'internal',
+            'location_id': self.location.id,
+            'location_dest_id': vehicle.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': self.medicine.id, 'quantity': 5})],
+        }).action_done()
+        record = self.env['animal.surgery.record'].create({
+            'animal_id': self.animal.id,
+            'surgery_id': self.env['animal.surgery'].create({'name': 'OVH'}).id,
+            'surgeon': 'Dr. Cirujano',
+        })
+        line = self.env['animal.surgery.medication.line'].create({
+            'surgery_record_id': record.id, 'medicine_id': self.medicine.id, 'quantity_units': 2,
+        })
+        self.assertEqual(line.stock_location_id, vehicle)
+        self.assertEqual(self._quantity(vehicle, self.medicine), 3)
@@ -0,0 +1,44 @@
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStockValuation(VetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product = cls.env['animal.medicine'].create({'name': 'Amoxicilina'})
+
+    def _receive(self, quantity, unit_cost=0.0):
+        self.env['vet.stock.transfer'].create({
+            'transfer_type': 'receipt',
+            'location_dest_id': self.location.id,
+            'line_ids': [(0, 0, {'product_type': 'medicine', 'medicine_id': self.product.id,
+                                 'quantity': quantity, 'unit_cost': unit_cost})],
+        }).action_done()
+
+    def _layers(self):
+        return self.env['vet.stock.layer'].search([('medicine_id', '=', self.product.id)], order='date, id')
+
+    def test_fifo_consumes_oldest_layers(self):
+        self._receive(10, 100.0)
+        self._receive(10, 200.0)
+        self.env['animal.medication'].create({
+            'animal_id': self.animal.id, 'medicine_id': self.product.id, 'quantity_units': 15,
+        })
+        move = self.env['vet.stock.move'].search([
+            ('medicine_id', '=', self.product.id), ('move_type', '=', 'consumption'),
+        ])
+        self.assertAlmostEqual(move.value, 10 * 100.0 + 5 * 200.0)
+        self.assertEqual(self._layers().mapped('remaining_qty'), [0, 5])
+        self.assertAlmostEqual(sum(self._layers().mapped('remaining_value')), 5 * 200.0)
+
+    def test_receipt_without_cost_uses_standard_cost(self):
+        self._receive(10, 100.0)
+        self.assertEqual(self.product.standard_cost, 100.0)
+        self._receive(5)
+        layer = self._layers()[-1]
+        self.assertEqual(layer.unit_cost, 100.0)
+        self.assertAlmostEqual(layer.remaining_value, 500.0)
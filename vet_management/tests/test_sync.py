@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSync(VetTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.device = self.env['vet.sync.device']._get_device('tablet-1', name="Tablet 1")
+
+    def _without_lag(self):
+        """Entrega también los cambios de esta transacción (en las pruebas todos son recientes)."""
+        self.patch(type(self.env['vet.sync.device']), '_sync_horizon', lambda self: datetime.max)
+
+    def _vaccination_item(self, uuid, **values):
+        return dict({
+            'uuid': uuid,
+            'animal_id': self.animal.id,
+            'vaccine_id': self.vaccine.id,
+            'date': '2024-05-02',
+            'applied_doses': 1,
+        }, **values)
+
+    def test_push_is_idempotent(self):
+        payload = {'animal.vaccination': [self._vaccination_item('uuid-1')]}
+        first = self.device.sync_push(payload)
+        self.assertIn('uuid-1', first['created']['animal.vaccination'])
+        second = self.device.sync_push(payload)
+        self.assertFalse(second['created'])
+        self.assertIn('uuid-1', second['duplicates']['animal.vaccination'])
+        self.assertEqual(self.env['animal.vaccination'].search_count([('sync_uuid', '=', 'uuid-1')]), 1)
+        # El reenvío no descuenta la dosis de nuevo.
+        self.assertEqual(self.vaccine.stock_total_doses, 9)
+
+    def test_push_conflict_keeps_server_version(self):
+        self.device.sync_push({'animal.vaccination': [self._vaccination_item('uuid-2')]})
+        record = self.env['animal.vaccination'].search([('sync_uuid', '=', 'uuid-2')])
+        record.write({'notes': "Editado en la clínica"})
+        self.env.flush_all()
+        result = self.device.sync_push({'animal.vaccination': [
+            self._vaccination_item('uuid-2', notes="Editado offline", base_write_date='2000-01-01T00:00:00'),
+        ]})
+        self.assertEqual(len(result['conflicts']), 1)
+        self.assertEqual(record.notes, "Editado en la clínica")
+
+    def test_pull_advances_only_with_confirmed_cursors(self):
+        self._without_lag()
+        first = self.device.sync_pull(limit=1000)
+        self.assertIn(self.animal.id, [row[0] for row in first['changes']['animal']['rows']])
+        # Sin confirmar, la siguiente descarga repite los mismos cambios.
+        again = self.device.sync_pull(limit=1000)
+        self.assertEqual(again['changes']['animal']['rows'], first['changes']['animal']['rows'])
+        # Con los cursores confirmados, solo llega lo nuevo.
+        self._edit_later(self.animal, {'name': 'Firulais II'})
+        after = self.device.sync_pull(cursors=first['cursors'], limit=1000)
+        self.assertEqual([row[0] for row in after['changes']['animal']['rows']], [self.animal.id])
+
+    def test_catalog_deletion_leaves_tombstone(self):
+        self._without_lag()
+        vaccine = self.env['animal.vaccine'].create({'name': 'Sin uso'})
+        start = self.device.sync_pull(limit=1000)
+        vaccine.unlink()
+        result = self.device.sync_pull(cursors=start['cursors'], limit=1000)
+        self.assertIn(vaccine.id, result['deleted'].get('animal.vaccine', []))
+
+    def test_device_is_scoped_to_user(self):
+        other_user = self.env['res.users'].create({
+            'name': 'Otra tablet', 'login': 'vet_sync_other', 'groups_id': [(6, 0, self.env.ref('base.group_user').ids)],
+        })
+        other_device = self.env['vet.sync.device'].with_user(other_user)._get_device('tablet-1')
+        self.assertNotEqual(other_device, self.device)
+        self.assertEqual(other_device.user_id, other_user)
+
+    def test_pull_holds_back_recent_changes(self):
+        result = self.device.sync_pull(limit=1000)
+        self.assertNotIn(self.animal.id, [row[0] for row in result['changes'].get('animal', {}).get('rows', [])])
+
+    def test_archived_device_refused(self):
+        self.device.active = False
+        with self.assertRaises(UserError):
+            self.env['vet.sync.device']._get_device('tablet-1')
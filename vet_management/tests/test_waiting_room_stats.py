@@ -0,0 +1,29 @@
+from odoo.tests import tagged
+
+from .common import VetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestWaitingRoomStats(VetTestCommon):
+
+    def test_record_adds_to_existing_row(self):
+        Stat = self.env['vet.service.stat']
+        Stat._record([('Dr. Test', '1', 'Control', 10.0)])
+        Stat._record([('Dr. Test', '1', 'Control', 20.0), ('Dr. Test', '1', 'Control', 30.0)])
+        stat = Stat.search([('doctor', '=', 'Dr. Test'), ('priority', '=', '1'), ('reason_key', '=', 'control')])
+        self.assertEqual(stat.count, 3)
+        self.assertAlmostEqual(stat.mean_minutes, 20.0)
+
+    def test_predictions_follow_queue_order(self):
+        Ticket = self.env['vet.waiting.ticket']
+        normal, urgent = Ticket.create([
+            {'animal_id': self.animal.id, 'priority': '1'},
+            {'animal_id': self.animal.id, 'priority': '3'},
+        ])
+        self.assertLess(urgent.queue_position, normal.queue_position)
+        self.assertLessEqual(urgent.expected_call_time, normal.expected_call_time)
+        position = normal.queue_position
+        urgent.action_cancel()
+        (normal | urgent).invalidate_recordset(['queue_position'])
+        self.assertEqual(normal.queue_position, position - 1)
+        self.assertFalse(urgent.queue_position)